@@ -34,10 +34,16 @@ NOTHING_TO_FIX_FILE_NAME = "
 
 # COMMON CONFIG PATH
 WINMERGE_PATH =  os.getenv("WINMERGE_PATH", "")
+EXCEL_BACKEND = os.getenv("EXCEL_BACKEND", "xlwings")  # xlwings | openpyxl (no Excel needed)
 
 OUTPUT_EVIDENCE_EXCEL_NAME = "evidence.xlsx"
 RESOURCE_ROOT_PATH = os.getenv("RESOURCE_ROOT_PATH")
 FULL_EVIDENCE_INPUT_PATH = RESOURCE_ROOT_PATH + "/resources/evidence.xlsx" 
+EVIDENCE_INDEX_PATH = os.getenv("EVIDENCE_INDEX_PATH", FULL_EVIDENCE_INPUT_PATH + ".idx")
+COPY_STORE_PATH = os.getenv("COPY_STORE_PATH", "")  # empty: .copy_store in the output root folder
+ENCODING_CACHE_PATH = os.getenv("ENCODING_CACHE_PATH", RESOURCE_ROOT_PATH + "/resources/encoding_cache.sqlite")
+TIMING_LOG_PATH = os.getenv("TIMING_LOG_PATH", RESOURCE_ROOT_PATH + "/resources/timing.jsonl")  # empty: no timing log
+RULE_INVENTORY_PATH = os.getenv("RULE_INVENTORY_PATH", RESOURCE_ROOT_PATH + "/resources/rule_inventory")  # one manifest per source type
 
 TEMPLATE_FOLDER_PATH = f'{RESOURCE_ROOT_PATH}/resources/template'
 HTML_FILE_NAME, EXCEL_FILE_NAME = common_util.get_first_htm_and_xlsx(TEMPLATE_FOLDER_PATH)
@@ -57,6 +63,19 @@ C_ROOT_OUTPUT_PATH = os.getenv("C_ROOT_OUTPUT_PATH")
 C_SVN_ROOT_PATH = os.getenv("C_SVN_ROOT_PATH").replace('/','\\')
 # c# CONFIG
 
+# BATCH CONFIG
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", os.cpu_count() or 1))
+BATCH_WORKER_MEMORY_MB = int(os.getenv("BATCH_WORKER_MEMORY_MB", 0))  # 0: no limit
+BATCH_MAX_ITEMS_PER_WORKER = int(os.getenv("BATCH_MAX_ITEMS_PER_WORKER", 50))  # recycle worker process after N items
+MERGE_MAX_WORKERS = int(os.getenv("MERGE_MAX_WORKERS", 8))  # threads reading/writing files in the batch merge
+COPY_MAX_WORKERS = int(os.getenv("COPY_MAX_WORKERS", 8))  # threads creating item folders
+
+# BACKGROUND JOB CONFIG
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", RESOURCE_ROOT_PATH + "/resources/jobs.sqlite")
+JOB_RUNNER_THREADS = int(os.getenv("JOB_RUNNER_THREADS", 1))  # runners started by the app, 0: jobs only run in "python -m logic.jobs worker"
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 2))  # queue polling and UI refresh interval
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", 120))  # a running job without heartbeat for this long is interrupted
+
 
 SOURCE_TYPE_OPTIONS = ['java', 'c']
 FILE_EXCEL_NAME_TO_SHEET_TYPE_MAP_BY_SOURCE_TYPE = {
@@ -0,0 +1,303 @@
+"""Headless batch engine for the Auto Replace tool.
+
+Usage:
+    python -m logic.batch --source-type c --excel-file wbroot --sheet SELECT \
+        --daily-folder 2025_07_30 --items items.txt --workers 4
+"""
+import argparse
+import atexit
+import json
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import (
+    BATCH_MAX_ITEMS_PER_WORKER,
+    BATCH_MAX_WORKERS,
+    BATCH_WORKER_MEMORY_MB,
+    EXCEL_BACKEND,
+    FILE_EXCEL_NAME_TO_SHEET_TYPE_MAP_BY_SOURCE_TYPE,
+    get_configs_by_source_type,
+)
+from logic import handler
+from logic.evidence_index import EvidenceIndex
+from utils import common_util, excel_utils, item_parser, timing, workspace_catalog
+
+STATUS_OK = "ok"
+STATUS_SKIPPED = "skipped"
+STATUS_ERROR = "error"
+
+
+@dataclass
+class BatchJob:
+    source_type: str
+    excel_file_name: str
+    sheet_name: str
+    daily_folder: str
+    export_evidence: bool = True
+    excel_backend: str = EXCEL_BACKEND
+    profile: bool = False  # save a cProfile .prof file next to each item
+
+    @property
+    def daily_folder_path(self) -> str:
+        source_configs = get_configs_by_source_type(self.source_type)
+        return f'{source_configs.ROOT_OUTPUT_PATH}/{self.excel_file_name}/{self.sheet_name}/{self.daily_folder}'
+
+    @property
+    def system_types(self) -> List[int]:
+        return FILE_EXCEL_NAME_TO_SHEET_TYPE_MAP_BY_SOURCE_TYPE.get(self.source_type.lower(), {}).get(self.excel_file_name, [])
+
+    @property
+    def active_rule_set(self) -> set:
+        source_configs = get_configs_by_source_type(self.source_type)
+        return set(source_configs.RULE_CONFIGS.get(self.sheet_name.upper(), []))
+
+
+@dataclass
+class BatchItem:
+    item_no: str
+    file_name: str
+    code_block_lines: List[Tuple[int, int]]
+    extra_tables: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ItemResult:
+    item_no: str
+    file_name: str
+    status: str
+    file_path: str = ""
+    encoding: str = ""
+    code_block_lines: List[Tuple[int, int]] = field(default_factory=list)
+    replaced_count: int = 0
+    message: str = ""
+    elapsed: float = 0.0
+    stages: Dict[str, float] = field(default_factory=dict)  # timing span -> seconds
+    profile_path: str = ""
+
+
+# Excel apps of a pool worker process by backend, created on first use.
+# In-process batches use their own (see run_batch): other batches can run in the same process at the same time.
+_excel_apps: Dict[str, object] = {}
+
+
+def _get_excel_app(backend: str, excel_apps: Optional[Dict[str, object]] = None):
+    if excel_apps is None:
+        excel_apps = _excel_apps
+    app = excel_apps.get(backend)
+    if app is None:
+        app = excel_apps[backend] = excel_utils.create_excel_app(backend)
+    return app
+
+
+def _close_excel_apps(excel_apps: Dict[str, object]):
+    while excel_apps:
+        try:
+            excel_apps.popitem()[1].quit()
+        except Exception:
+            pass
+
+
+atexit.register(_close_excel_apps, _excel_apps)
+
+
+def memory_limit_supported() -> bool:
+    """The per-worker memory limit needs setrlimit, which Windows does not have."""
+    try:
+        import resource  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _init_worker(memory_limit_mb: int):
+    """Apply the per-worker address space limit (POSIX only, see memory_limit_supported)."""
+    if memory_limit_mb <= 0 or not memory_limit_supported():
+        return
+    import resource
+    limit = memory_limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def parse_items(text: str) -> Tuple[List[BatchItem], List[str]]:
+    items, errors = item_parser.parse_replace_item_list(text)
+    batch_items = [BatchItem(item_no, file_name, code_block_lines, extra_tables) for item_no, file_name, code_block_lines, extra_tables in items]
+    return batch_items, errors
+
+
+def process_item(job: BatchJob, item: BatchItem, file_path: str, evidence: Optional[EvidenceIndex] = None,
+                 excel_apps: Optional[Dict[str, object]] = None) -> ItemResult:
+    """Run encoding detection, replacement, rule detection and evidence export for one item.
+    evidence defaults to the index of the current evidence version of this process,
+    excel_apps (Excel app by backend) to the apps of this worker process."""
+    start = time.perf_counter()
+    result = ItemResult(item.item_no, item.file_name, STATUS_OK, file_path=file_path, code_block_lines=item.code_block_lines)
+    with timing.record_item(item.item_no, file_path, "auto_replace", profile=job.profile) as item_timing:
+        _process_item(job, item, file_path, evidence, excel_apps, result)
+    result.elapsed = time.perf_counter() - start
+    result.stages = item_timing.stages
+    result.profile_path = item_timing.profile_path
+    return result
+
+
+def _process_item(job: BatchJob, item: BatchItem, file_path: str, evidence: Optional[EvidenceIndex], excel_apps: Optional[Dict[str, object]],
+                  result: ItemResult):
+    try:
+        with timing.span("encoding"):
+            encoding = handler.get_encoded_file(file_path)
+        if not encoding:
+            result.status = STATUS_ERROR
+            result.message = f"Encoding could not be detected for {file_path}"
+            return
+        result.encoding = encoding
+        with timing.span("excel_app"):
+            app = _get_excel_app(job.excel_backend, excel_apps) if job.export_evidence else None
+        replaced_lines = handler.replace_lines_in_file(
+            app, file_path, item.code_block_lines, encoding, job.source_type,
+            job.active_rule_set, job.system_types, item.extra_tables, evidence=evidence
+        )
+        result.replaced_count = len(replaced_lines or [])
+    except Exception as e:
+        result.status = STATUS_ERROR
+        result.message = f"{type(e).__name__}: {e}"
+
+
+def resolve_items(job: BatchJob, items: List[BatchItem]) -> List[Tuple[str, str]]:
+    """Find the target file of each item in the daily folder. Returns (file_path, message) per item, file_path is empty if not found."""
+    source_configs = get_configs_by_source_type(job.source_type)
+    catalog = workspace_catalog.get_catalog(job.daily_folder_path)
+    resolved = []
+    for item in items:
+        selected_files = catalog.find(item.item_no, item.file_name, source_configs.SUFFIXES)
+        if not selected_files:
+            resolved.append(("", f"File for No.{item.item_no} not found. Skipping."))
+        elif len(selected_files) > 1:
+            resolved.append((selected_files[0], f"Multiple files found for No.{item.item_no}, using the first one: {selected_files}"))
+        else:
+            resolved.append((selected_files[0], ""))
+    return resolved
+
+
+def run_batch(
+    job: BatchJob,
+    items: List[BatchItem],
+    max_workers: int = BATCH_MAX_WORKERS,
+    memory_limit_mb: int = BATCH_WORKER_MEMORY_MB,
+    max_items_per_worker: int = BATCH_MAX_ITEMS_PER_WORKER,
+    on_start: Optional[Callable[[BatchItem], None]] = None,
+    on_result: Optional[Callable[[ItemResult], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> List[ItemResult]:
+    """Process items and return one ItemResult per item, in item number order.
+
+    With max_workers <= 1 items run in the current process (Streamlit output stays visible),
+    otherwise they are spread over a process pool.
+    When should_stop returns True no further item is started, and the items not started have no result.
+    """
+    items = sorted(items, key=lambda x: int(x.item_no))
+    results: List[Optional[ItemResult]] = [None] * len(items)
+    pending = []
+    for index, (item, (file_path, message)) in enumerate(zip(items, resolve_items(job, items))):
+        if not file_path:
+            results[index] = ItemResult(item.item_no, item.file_name, STATUS_SKIPPED, code_block_lines=item.code_block_lines, message=message)
+            if on_result:
+                on_result(results[index])
+        else:
+            pending.append((index, item, file_path, message))
+
+    if max_workers <= 1:
+        evidence = handler.get_evidence_index() if pending else None
+        excel_apps = {}  # created on first use and closed at the end of this batch only
+        try:
+            for index, item, file_path, message in pending:
+                if should_stop and should_stop():
+                    break
+                if on_start:
+                    on_start(item)
+                result = process_item(job, item, file_path, evidence, excel_apps)
+                result.message = result.message or message
+                results[index] = result
+                if on_result:
+                    on_result(result)
+        finally:
+            _close_excel_apps(excel_apps)
+    elif pending:
+        if memory_limit_mb > 0 and not memory_limit_supported():
+            warnings.warn(f"Worker memory limit of {memory_limit_mb} MB is not applied: not supported on this platform "
+                          "(workers are still recycled after max_items_per_worker items)", RuntimeWarning, stacklevel=2)
+        with ProcessPoolExecutor(
+            max_workers=min(max_workers, len(pending)),
+            initializer=_init_worker,
+            initargs=(memory_limit_mb,),
+            max_tasks_per_child=max_items_per_worker or None,
+        ) as executor:
+            futures = []
+            for index, item, file_path, message in pending:
+                if on_start:
+                    on_start(item)
+                futures.append((index, item, file_path, message, executor.submit(process_item, job, item, file_path)))
+            stopped = False
+            for index, item, file_path, message, future in futures:
+                if not stopped and should_stop and should_stop():
+                    # items already running in a worker are finished and reported
+                    stopped = True
+                    for *_, other in futures:
+                        other.cancel()
+                if future.cancelled():
+                    continue
+                try:
+                    result = future.result()
+                    result.message = result.message or message
+                except Exception as e:
+                    # worker died (e.g. memory limit reached)
+                    result = ItemResult(item.item_no, item.file_name, STATUS_ERROR, file_path=file_path,
+                                        code_block_lines=item.code_block_lines, message=f"{type(e).__name__}: {e}")
+                results[index] = result
+                if on_result:
+                    on_result(result)
+
+    return [result for result in results if result is not None]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Auto Replace tool on an item list without the UI.")
+    parser.add_argument("--source-type", required=True, choices=["java", "c"])
+    parser.add_argument("--excel-file", required=True, help="Excel file name, e.g. wbroot")
+    parser.add_argument("--sheet", required=True, help="Sheet name, e.g. SELECT")
+    parser.add_argument("--daily-folder", default=common_util.get_current_date_str())
+    parser.add_argument("--items", required=True, help="Item list file (same format as the Auto Replace tab), '-' for stdin")
+    parser.add_argument("--workers", type=int, default=BATCH_MAX_WORKERS)
+    parser.add_argument("--max-memory-mb", type=int, default=BATCH_WORKER_MEMORY_MB, help="Per-worker memory limit, 0 for no limit (POSIX only, ignored with a warning on Windows)")
+    parser.add_argument("--max-items-per-worker", type=int, default=BATCH_MAX_ITEMS_PER_WORKER)
+    parser.add_argument("--no-export-evidence", action="store_true", help="Skip evidence excel export")
+    parser.add_argument("--excel-backend", choices=excel_utils.EXCEL_BACKEND_OPTIONS, default=EXCEL_BACKEND)
+    parser.add_argument("--output", help="Write results as JSON lines to this file instead of stdout")
+    parser.add_argument("--profile", action="store_true", help="Save a cProfile .prof file next to each item")
+    args = parser.parse_args(argv)
+
+    text = sys.stdin.read() if args.items == "-" else Path(args.items).read_text(encoding="utf-8")
+    items, errors = parse_items(text)
+    if errors:
+        print("\n".join(errors), file=sys.stderr)
+        return 2
+
+    job = BatchJob(args.source_type, args.excel_file, args.sheet, args.daily_folder,
+                   export_evidence=not args.no_export_evidence, excel_backend=args.excel_backend, profile=args.profile)
+    results = run_batch(job, items, args.workers, args.max_memory_mb, args.max_items_per_worker)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for result in results:
+            out.write(json.dumps(asdict(result), ensure_ascii=False) + "\n")
+    finally:
+        if args.output:
+            out.close()
+    return 0 if all(r.status != STATUS_ERROR for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""Parallel merge of the item change files into the SVN working copy (Merge Source tab).
+
+Files are read and written by a thread pool, so a day's merge is bound by I/O bandwidth
+instead of the latency of each file on the (network) working copy.
+"""
+import hashlib
+import io
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import MERGE_MAX_WORKERS
+from logic import handler, merge_source
+from utils import encoding_cache, workspace_catalog
+
+STATUS_MERGED = "merged"
+STATUS_SKIPPED = "skipped"
+STATUS_ERROR = "error"
+
+
+@dataclass
+class MergeTask:
+    item_no: str
+    original_path: str
+    change_path: str
+    dest_path: str
+
+
+@dataclass
+class MergeResult:
+    item_no: str
+    change_path: str
+    dest_path: str = ""
+    status: str = STATUS_MERGED
+    encoding: str = ""
+    change_code: str = ""
+    message: str = ""
+    elapsed: float = 0.0
+
+
+def parse_items(text: str) -> Tuple[List[Tuple[str, str, str]], List[str]]:
+    """Parse the item list (tab-separated: NO, FILE_PATH, FILE_NAME, ...). Returns (item_no, file_path, file_name) rows and the errors."""
+    item_data = []
+    errors = []
+    for idx, raw_line in enumerate(text.strip().splitlines(), start=1):
+        parts = re.split(r'[\t]+', raw_line)
+        if len(parts) < 3:
+            errors.append(f"Line {idx} invalid: {raw_line}")
+            continue
+        item_data.append((parts[0], parts[1], parts[2]))
+    return item_data, errors
+
+
+def plan_merge(
+    item_data: List[Tuple[str, str, str]],
+    catalog: workspace_catalog.WorkspaceCatalog,
+    suffixes: List[str],
+    svn_root_path: str,
+) -> Tuple[List[MergeTask], List[MergeResult]]:
+    """Match the item list rows (item_no, file_path, file_name) with the change files of the daily folder catalog.
+    Returns the merge tasks and the results of the rows that can not be merged."""
+    tasks, results = [], []
+    for item_no, file_path, file_name in sorted(item_data, key=lambda x: int(x[0])):
+        change_path_files = catalog.item_files(item_no, suffixes)
+        if not change_path_files:
+            results.append(MergeResult(item_no, "", status=STATUS_SKIPPED, message=f"File for No.{item_no} not found. Skipping."))
+            continue
+        for change_path_file in change_path_files:
+            try:
+                after_file_name = file_name.split('.')[0] + '_after.' + file_name.split('.')[1]
+            except IndexError as e:
+                results.append(MergeResult(item_no, change_path_file, status=STATUS_ERROR, message=f"Invalid file name {file_name}: {e}"))
+                continue
+            if not change_path_file.endswith(after_file_name):
+                results.append(MergeResult(item_no, change_path_file, status=STATUS_SKIPPED, message=f"IGNORE MERGE SOURCE FOR: {change_path_file}"))
+                continue
+            original_path = str(Path(change_path_file).parent / file_name)
+            dest_path = (f"{svn_root_path}{file_path + file_name}").replace('/', '\\')
+            tasks.append(MergeTask(item_no, original_path, change_path_file, dest_path))
+    return tasks, results
+
+
+def _read(file_path: str) -> Tuple[str, bytes, str]:
+    """Returns (encoding, content, sha256) of a file."""
+    detected, raw = encoding_cache.get_or_detect(file_path, handler.detect_file_encoding, need_raw=True)
+    return detected.final_encoding, raw, hashlib.sha256(raw).hexdigest()
+
+
+def _lines(raw: bytes, encoding: str) -> List[str]:
+    # same line splitting as open(..., newline="").readlines()
+    return io.StringIO(raw.decode(encoding), newline="").readlines()
+
+
+def merge_task(task: MergeTask) -> MergeResult:
+    start = time.perf_counter()
+    result = MergeResult(task.item_no, task.change_path, task.dest_path)
+    try:
+        src_encoding, src_raw, src_hash = _read(task.original_path)
+        change_encoding, change_raw, change_hash = _read(task.change_path)
+        dest_encoding, dest_raw, dest_hash = _read(task.dest_path)
+        result.encoding = src_encoding
+
+        if src_encoding != change_encoding:
+            result.status = STATUS_ERROR
+            result.message = f"Encoding mismatch between original ({src_encoding}) and change ({change_encoding}) files."
+        elif src_encoding != dest_encoding:
+            result.status = STATUS_ERROR
+            result.message = f"Encoding mismatch between original ({src_encoding}) and destination ({dest_encoding}) files."
+        elif change_hash == dest_hash:
+            result.status = STATUS_SKIPPED
+            result.message = "Destination already matches the change file."
+        elif src_hash == change_hash:
+            result.status = STATUS_SKIPPED
+            result.message = "Change file has no changes."
+        else:
+            dest_lines, result.change_code = merge_source.merge_source_lines(
+                _lines(src_raw, src_encoding), _lines(change_raw, change_encoding), _lines(dest_raw, dest_encoding)
+            )
+            with open(task.dest_path, 'w', encoding=dest_encoding, newline="") as f:
+                f.writelines(dest_lines)
+    except Exception as e:
+        result.status = STATUS_ERROR
+        result.message = f"{type(e).__name__}: {e}"
+    finally:
+        result.elapsed = time.perf_counter() - start
+    return result
+
+
+def _merge_group(tasks: List[MergeTask]) -> List[MergeResult]:
+    return [merge_task(task) for task in tasks]
+
+
+def run_merge(
+    tasks: List[MergeTask],
+    max_workers: int = MERGE_MAX_WORKERS,
+    on_result: Optional[Callable[[MergeResult], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> List[MergeResult]:
+    """Merge all tasks and return one MergeResult per task, in task order. Errors do not stop the other tasks.
+
+    Tasks with the same destination file run one after another in the same thread.
+    on_result and should_stop are called from the calling thread; once should_stop returns True
+    the destination files not started yet are left as they are and their tasks have no result.
+    """
+    groups: Dict[str, List[int]] = {}
+    for index, task in enumerate(tasks):
+        groups.setdefault(task.dest_path, []).append(index)
+
+    results: List[Optional[MergeResult]] = [None] * len(tasks)
+    # named after the calling thread, so the pool threads of a job runner are covered by its log filter (logic.jobs)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix=f"{threading.current_thread().name}-merge") as executor:
+        futures = {executor.submit(_merge_group, [tasks[i] for i in indexes]): indexes for indexes in groups.values()}
+        stopped = False
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            for index, result in zip(futures[future], future.result()):
+                results[index] = result
+                if on_result:
+                    on_result(result)
+            if not stopped and should_stop and should_stop():
+                stopped = True
+                for other in futures:
+                    other.cancel()
+    return [result for result in results if result is not None]
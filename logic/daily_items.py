@@ -0,0 +1,107 @@
+"""Item folders of a daily folder ("Initialize Daily Items" tab and the create_items background job)."""
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from config import (
+    COPY_MAX_WORKERS,
+    EXCEL_FILE_NAME,
+    FULL_EVIDENCE_INPUT_PATH,
+    HTML_FILE_NAME,
+    OUTPUT_EVIDENCE_EXCEL_NAME,
+    TEMPLATE_EXCEL_PATH,
+    TEMPLATE_HTML_PATH,
+)
+from logic import handler
+from utils import copy_store
+
+
+def parse_items(text: str) -> Tuple[List[List[str]], List[str]]:
+    """Parse the item list (tab-separated: NO, FILE_PATH, FILE_NAME, START_LINE). Returns the items and the errors."""
+    items = []
+    errors = []
+    for idx, line in enumerate(text.strip().splitlines(), start=1):
+        parts = re.split(r'[\t]+', line.strip())
+        if len(parts) != 4:
+            errors.append(f"Line {idx} is invalid: {line}")
+            continue
+        items.append(parts)
+    return items, errors
+
+
+def create_item(source_configs, daily_folder_path: str, item_id: str, src_label: str, full_file_name: str,
+                store: Optional[copy_store.CopyStore] = None) -> dict:
+    store = store or copy_store.get_store(source_configs.ROOT_OUTPUT_PATH)
+    des_folder_name = f"{daily_folder_path}/No.{item_id}"
+    os.makedirs(des_folder_name, exist_ok=True)
+
+    # Extract file info
+    file_type = full_file_name.split('.')[-1]
+    file_name = full_file_name.rsplit('.', 1)[0]
+
+    src_path = source_configs.ROOT_APP_PATH + "/" +''.join((src_label, full_file_name))[1:]  # remove leading character
+    des_path = f'{des_folder_name}/{full_file_name}'
+    des_path_after = f'{des_folder_name}/{file_name}_after.{file_type}'
+    des_excel_path = f'{des_folder_name}/{EXCEL_FILE_NAME}'
+    des_html_path = f'{des_folder_name}/{HTML_FILE_NAME}'
+    des_evidence_path = f'{des_folder_name}/{OUTPUT_EVIDENCE_EXCEL_NAME}'
+
+    # Copy template files (shared content is linked from the copy store)
+    store.materialize(src_path, des_path)
+    store.materialize(src_path, des_path_after, editable=True)
+    os.chmod(des_path_after, 0o666)
+    store.materialize(TEMPLATE_EXCEL_PATH, des_excel_path, editable=True)
+    store.materialize(TEMPLATE_HTML_PATH, des_html_path, editable=True)
+    store.materialize(FULL_EVIDENCE_INPUT_PATH, des_evidence_path)
+    handler.cache_file_encodings([des_path, des_path_after])
+
+    return {
+        "No": item_id,
+        "Filename": full_file_name,
+        "Src": src_path[-50:],
+        "Dest": des_path
+    }
+
+
+def create_items(
+    source_configs,
+    daily_folder_path: str,
+    items: List[List[str]],
+    max_workers: int = COPY_MAX_WORKERS,
+    on_result: Optional[Callable[[str, Optional[dict], str], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> List[dict]:
+    """Create the folder of each item (NO, FILE_PATH, FILE_NAME, START_LINE) on a thread pool. Returns the created items in item list order.
+
+    on_result(item_id, created item or None, error message) is called from the calling thread.
+    Once should_stop returns True the items not started yet are not created.
+    """
+    item_map = {a: (b, c) for a, b, c, _ in items}
+    store = copy_store.get_store(source_configs.ROOT_OUTPUT_PATH)
+    created_items = []
+    # named after the calling thread, so the pool threads of a job runner are covered by its log filter (logic.jobs)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix=f"{threading.current_thread().name}-copy") as executor:
+        futures = {
+            item_id: executor.submit(create_item, source_configs, daily_folder_path, item_id, src_label, full_file_name, store)
+            for item_id, (src_label, full_file_name) in item_map.items()
+        }
+        stopped = False
+        for item_id, future in futures.items():
+            if not stopped and should_stop and should_stop():
+                stopped = True
+                for other in futures.values():
+                    other.cancel()
+            if future.cancelled():
+                continue
+            try:
+                created = future.result()
+                error = ""
+                created_items.append(created)
+            except Exception as e:
+                created = None
+                error = str(e)
+            if on_result:
+                on_result(item_id, created, error)
+    return created_items
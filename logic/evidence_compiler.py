@@ -0,0 +1,233 @@
+"""Compiles the evidence workbook into an on-disk index.
+
+The index file holds three pickled sections:
+    1. header: index version, workbook fingerprint (size, mtime, sha256) and one key per sheet
+    2. compiled evidence: mappings, valid column set and data-type tables (what the tools need)
+    3. raw sheet frames: only read when some sheets have to be rebuilt
+
+Usage:
+    python -m logic.evidence_compiler [--force]
+"""
+import argparse
+import hashlib
+import os
+import pickle
+import posixpath
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+from xml.etree import ElementTree
+
+import pandas as pd
+
+from config import EVIDENCE_INDEX_PATH, FULL_EVIDENCE_INPUT_PATH
+from logic.mapping import build_mappings, get_full_schema_table_and_column_names_from_sheets
+
+INDEX_VERSION = 2
+
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+@dataclass
+class CompiledEvidence:
+    fingerprint: dict
+    schema_dict: Dict[str, set]
+    table_dict: Dict[str, set]
+    column_dict: Dict[str, Dict[str, set]]
+    key_dict: Dict[str, set]
+    valid_columns: Set[str]
+    type_tables: Dict[str, pd.DataFrame] = field(default_factory=dict)  # sheet name -> data-type table
+
+
+def file_fingerprint(excel_path: str, with_hash: bool = True) -> dict:
+    stat = os.stat(excel_path)
+    fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": None}
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(excel_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        fingerprint["sha256"] = digest.hexdigest()
+    return fingerprint
+
+
+def _string_item_text(item) -> str:
+    """Text of a shared or inline string, without its phonetic runs (as read by openpyxl)."""
+    text = item.find(f"{_NS_MAIN}t")
+    if text is not None:
+        return text.text or ""
+    return "".join(run.findtext(f"{_NS_MAIN}t", "") for run in item.findall(f"{_NS_MAIN}r"))
+
+
+def _part_path(target: str) -> str:
+    """Zip path of a part from its target in the workbook relationships."""
+    return target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+
+
+def _shared_strings(zf: zipfile.ZipFile, part: Optional[str]) -> List[str]:
+    if part is None:
+        return []
+    root = ElementTree.fromstring(zf.read(part))
+    return [_string_item_text(item) for item in root.iter(f"{_NS_MAIN}si")]
+
+
+def _cell_formats(zf: zipfile.ZipFile, part: Optional[str]) -> List[str]:
+    """Number format of each cell style (it decides whether a number is read as a date)."""
+    if part is None:
+        return []
+    root = ElementTree.fromstring(zf.read(part))
+    codes = {fmt.get("numFmtId"): fmt.get("formatCode", "") for fmt in root.iter(f"{_NS_MAIN}numFmt")}
+    cell_xfs = root.find(f"{_NS_MAIN}cellXfs")
+    xfs = cell_xfs.findall(f"{_NS_MAIN}xf") if cell_xfs is not None else []
+    return [codes.get(xf.get("numFmtId", "0"), xf.get("numFmtId", "0")) for xf in xfs]
+
+
+def _sheet_key(zf: zipfile.ZipFile, part: str, shared_strings: List[str], formats: List[str]) -> str:
+    """Hash of the cells of a worksheet part with their shared strings and number formats resolved,
+    so editing another sheet does not change it even when the shared string indexes move."""
+    digest = hashlib.sha256()
+    with zf.open(part) as f:
+        for _, row in ElementTree.iterparse(f):
+            if row.tag != f"{_NS_MAIN}row":
+                continue
+            digest.update(f"\x1d{row.get('r', '')}".encode())
+            for cell in row.iter(f"{_NS_MAIN}c"):
+                cell_type = cell.get("t", "n")
+                if cell_type == "inlineStr":
+                    value = "".join(_string_item_text(item) for item in cell.iter(f"{_NS_MAIN}is"))
+                else:
+                    value = cell.findtext(f"{_NS_MAIN}v", "")
+                    if cell_type == "s" and value:
+                        value = shared_strings[int(value)]
+                style = int(cell.get("s", "0"))
+                number_format = formats[style] if style < len(formats) else ""
+                digest.update(f"\x1e{cell.get('r', '')}\x1f{cell_type}\x1f{number_format}\x1f{value}".encode())
+            row.clear()
+    return digest.hexdigest()
+
+
+def sheet_keys(excel_path: str) -> Dict[str, str]:
+    """Key per sheet from its resolved cell content, "" for a sheet whose part is missing."""
+    with zipfile.ZipFile(excel_path) as zf:
+        parts = set(zf.namelist())
+        workbook = ElementTree.fromstring(zf.read("xl/workbook.xml"))
+        rels = ElementTree.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+        rels = list(rels.iter(f"{_NS_PKG_REL}Relationship"))
+        targets = {rel.get("Id"): rel.get("Target") for rel in rels}
+        # shared strings and styles by relationship type, e.g. ".../relationships/sharedStrings"
+        shared_parts = {rel.get("Type", "").rsplit("/", 1)[-1]: _part_path(rel.get("Target")) for rel in rels}
+        shared_strings = _shared_strings(zf, shared_parts.get("sharedStrings"))
+        formats = _cell_formats(zf, shared_parts.get("styles"))
+
+        keys = {}
+        for sheet in workbook.iter(f"{_NS_MAIN}sheet"):
+            part = _part_path(targets.get(sheet.get(f"{_NS_REL}id"), ""))
+            keys[sheet.get("name")] = _sheet_key(zf, part, shared_strings, formats) if part in parts else ""
+    return keys
+
+
+def compile_sheets(fingerprint: dict, sheets: Dict[str, pd.DataFrame]) -> CompiledEvidence:
+    schema_dict, table_dict, column_dict, key_dict = build_mappings(sheets)
+    valid_columns = get_full_schema_table_and_column_names_from_sheets(sheets)
+    type_tables = {name: df for name, df in sheets.items() if name.startswith("type")}
+    return CompiledEvidence(fingerprint, schema_dict, table_dict, column_dict, key_dict, valid_columns, type_tables)
+
+
+def _read_index(index_path: str, with_sheets: bool = False):
+    """Returns (header, compiled, sheets); missing or outdated parts are None."""
+    try:
+        with open(index_path, "rb") as f:
+            header = pickle.load(f)
+            if header.get("version") != INDEX_VERSION:
+                return None, None, None
+            compiled = pickle.load(f)
+            sheets = pickle.load(f) if with_sheets else None
+        return header, compiled, sheets
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+        return None, None, None
+
+
+def _write_index(index_path: str, header: dict, compiled: CompiledEvidence, sheets: Dict[str, pd.DataFrame]):
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(compiled, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(sheets, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, index_path)  # readers never see a half written index
+
+
+def compile_evidence(excel_path: str = FULL_EVIDENCE_INPUT_PATH, index_path: str = EVIDENCE_INDEX_PATH, force: bool = False) -> CompiledEvidence:
+    """Return the compiled evidence, rebuilding only the sheets whose content changed since the last compile."""
+    fingerprint = file_fingerprint(excel_path, with_hash=False)
+    header, compiled, _ = (None, None, None) if force else _read_index(index_path)
+
+    if header:
+        old = header["fingerprint"]
+        if (old["size"], old["mtime_ns"]) == (fingerprint["size"], fingerprint["mtime_ns"]):
+            return compiled
+    fingerprint = file_fingerprint(excel_path)
+    if header and header["fingerprint"]["sha256"] == fingerprint["sha256"]:
+        # touched but not changed: only refresh the header
+        header["fingerprint"] = fingerprint
+        compiled.fingerprint = fingerprint
+        _, _, sheets = _read_index(index_path, with_sheets=True)
+        _write_index(index_path, header, compiled, sheets)
+        return compiled
+
+    keys = sheet_keys(excel_path)
+    sheets = {}
+    if header:
+        _, _, old_sheets = _read_index(index_path, with_sheets=True)
+        old_keys = header["sheet_keys"]
+        sheets = {name: df for name, df in (old_sheets or {}).items() if keys.get(name) and old_keys.get(name) == keys[name]}
+    changed = [name for name in keys if name not in sheets]
+    if changed:
+        sheets.update(pd.read_excel(excel_path, sheet_name=changed))
+    sheets = {name: sheets[name] for name in keys}  # keep workbook order
+
+    compiled = compile_sheets(fingerprint, sheets)
+    header = {"version": INDEX_VERSION, "fingerprint": fingerprint, "sheet_keys": keys, "rebuilt_sheets": changed}
+    _write_index(index_path, header, compiled, sheets)
+    return compiled
+
+
+# Per-process copy, reloaded when the workbook changes
+_loaded: Dict[str, CompiledEvidence] = {}
+
+
+def load_evidence(excel_path: str = FULL_EVIDENCE_INPUT_PATH, index_path: str = EVIDENCE_INDEX_PATH) -> CompiledEvidence:
+    fingerprint = file_fingerprint(excel_path, with_hash=False)
+    compiled: Optional[CompiledEvidence] = _loaded.get(excel_path)
+    if compiled is None or (compiled.fingerprint["size"], compiled.fingerprint["mtime_ns"]) != (fingerprint["size"], fingerprint["mtime_ns"]):
+        compiled = compile_evidence(excel_path, index_path)
+        _loaded[excel_path] = compiled
+    return compiled
+
+
+def unload_evidence(excel_path: Optional[str] = None):
+    """Forget the compiled evidence of this process (of one workbook), load_evidence reads the index again."""
+    if excel_path is None:
+        _loaded.clear()
+    else:
+        _loaded.pop(excel_path, None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile the evidence workbook into the evidence index.")
+    parser.add_argument("--excel", default=FULL_EVIDENCE_INPUT_PATH)
+    parser.add_argument("--index", default=EVIDENCE_INDEX_PATH)
+    parser.add_argument("--force", action="store_true", help="Rebuild all sheets")
+    args = parser.parse_args(argv)
+
+    compiled = compile_evidence(args.excel, args.index, force=args.force)
+    header, _, _ = _read_index(args.index)
+    print(f"Index: {Path(args.index).resolve()}")
+    print(f"Last rebuilt sheets: {', '.join(header.get('rebuilt_sheets', [])) or '-'}")
+    print(f"Valid columns: {len(compiled.valid_columns)}, tables: {len(compiled.table_dict)}")
+
+
+if __name__ == "__main__":
+    main()
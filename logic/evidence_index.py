@@ -0,0 +1,51 @@
+"""Read-only lookup structures of one evidence version, built once and shared by all items of the process."""
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterable, Mapping, Tuple
+
+import pandas as pd
+
+from logic.evidence_compiler import CompiledEvidence
+from logic.text_processing import KeyExtractor
+from logic.type_index import TypeIndex, build_type_index
+
+
+@dataclass(frozen=True)
+class EvidenceIndex:
+    version: str                                                 # sha256 of the evidence workbook
+    schema_dict: Mapping[str, FrozenSet[str]]
+    table_dict: Mapping[str, FrozenSet[str]]
+    column_dict: Mapping[str, Mapping[str, FrozenSet[str]]]      # table -> column -> new column names
+    key_dict: Mapping[str, FrozenSet[str]]
+    valid_columns: FrozenSet[str]
+    type_tables: Mapping[str, pd.DataFrame]
+    key_extractor: KeyExtractor
+    _type_indexes: Dict[Tuple[int, ...], TypeIndex] = field(default_factory=dict, compare=False, repr=False)
+
+    def type_index(self, system_types: Iterable[int]) -> TypeIndex:
+        """Data-type index of the system types, built on first use."""
+        key = tuple(system_types)
+        index = self._type_indexes.get(key)
+        if index is None:
+            index = self._type_indexes.setdefault(key, build_type_index(self.type_tables, key))
+        return index
+
+
+def _freeze(mapping: Dict[str, set]) -> Mapping[str, FrozenSet[str]]:
+    return MappingProxyType({key: frozenset(values) for key, values in mapping.items()})
+
+
+def build_evidence_index(evidence: CompiledEvidence) -> EvidenceIndex:
+    valid_columns = frozenset(evidence.valid_columns)
+    column_dict = MappingProxyType({table: _freeze(columns) for table, columns in evidence.column_dict.items()})
+    return EvidenceIndex(
+        version=evidence.fingerprint["sha256"],
+        schema_dict=_freeze(evidence.schema_dict),
+        table_dict=_freeze(evidence.table_dict),
+        column_dict=column_dict,
+        key_dict=_freeze(evidence.key_dict),
+        valid_columns=valid_columns,
+        type_tables=MappingProxyType(dict(evidence.type_tables)),
+        key_extractor=KeyExtractor(valid_columns),
+    )
+
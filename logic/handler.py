@@ -2,30 +2,39 @@
 
 from pathlib import Path
 import streamlit as st
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from config import OUTPUT_EVIDENCE_EXCEL_NAME
-from logic.mapping import build_full_mapping, build_mappings, get_full_schema_table_and_column_names_from_sheets
-from logic.text_processing import extract_full_keys, replace_by_mapping
-from utils import charset_util
+from logic.mapping import build_full_mapping
+from logic import evidence_compiler
+from logic.evidence_index import EvidenceIndex, build_evidence_index
+from logic.text_processing import replace_by_mapping
+from utils import charset_util, encoding_cache, line_file, timing
 from utils.excel_utils import filter_excel
 from typing import Dict
 
-import pandas as pd
 from config import FULL_EVIDENCE_INPUT_PATH
 import xlwings as xw
 from rules import detect_rules
 
-@st.cache_data()
+def detect_file_encoding(raw: bytes) -> encoding_cache.CachedEncoding:
+    encoding = charset_util.detect_encode(raw)
+    detect_encoding = charset_util.detect_encode_by_bytes(raw)
+
+    final_encoding = encoding or detect_encoding
+    try:
+        raw.decode(final_encoding)
+    except Exception:
+        final_encoding = charset_util.DEFAULT_ENCODING
+        raw.decode(final_encoding)
+    return encoding_cache.CachedEncoding(encoding, detect_encoding, final_encoding)
+
 def get_encoded_file(file_path: str | Path, return_content: bool = False):
     file_path = Path(file_path)
-    raw = file_path.read_bytes()
-
-    encoding = charset_util.detect_encode(raw)
-    detect_encoding = charset_util.detect_encode_use_lib(raw)
+    detected, raw = encoding_cache.get_or_detect(file_path, detect_file_encoding, need_raw=return_content)
+    encoding, detect_encoding = detected.encoding, detected.detected_encoding
 
     if encoding is None:
         st.warning(f"Failed to decode {file_path.name} with common encodings. Using chardet to detect encoding.")
-        encoding = detect_encoding
     elif charset_util.is_same_encodings(encoding, detect_encoding) is False:
         st.code(file_path)
         st.warning(
@@ -34,34 +43,33 @@ def get_encoded_file(file_path: str | Path, return_content: bool = False):
               "Please ensure that the Change file and Destination file use the same encoding before merging."
         )
 
-    try:
-        content = raw.decode(encoding)
-    except Exception:
-            encoding =  charset_util.DEFAULT_ENCODING
-            content = raw.decode(encoding)
+    encoding = detected.final_encoding
+    return (encoding, raw.decode(encoding)) if return_content else encoding
+
+def cache_file_encodings(file_paths: List[str]):
+    """Detect and store the encoding of newly created files so later tabs do not detect them again."""
+    for file_path in file_paths:
+        encoding_cache.get_or_detect(file_path, detect_file_encoding)
 
-    return (encoding, content) if return_content else encoding
+def load_evidence() -> evidence_compiler.CompiledEvidence:
+    return evidence_compiler.load_evidence(FULL_EVIDENCE_INPUT_PATH)
 
-@st.cache_data()
-def load_all_sheets() -> Dict[str, pd.DataFrame]:
-    return pd.read_excel(FULL_EVIDENCE_INPUT_PATH, sheet_name=None)
+# Index of the current evidence version
+_evidence_indexes: Dict[str, EvidenceIndex] = {}
 
-@st.cache_data()
-def extract_column_names_from_sheet() -> set:
-    sheets = load_all_sheets()
-    return get_full_schema_table_and_column_names_from_sheets(sheets)
+def invalidate_evidence():
+    """Drop the evidence loaded by this process, the next use reads the workbook (or its index) again."""
+    _evidence_indexes.clear()
+    evidence_compiler.unload_evidence()
 
-@st.cache_data()
-def get_full_type_df(system_types:List[int]) -> pd.DataFrame:
-    full_type_df = pd.DataFrame()
-    for name, df in load_all_sheets().items():
-        for system_type in system_types:
-            if name.startswith(f'type{system_type}'):
-                # print(f"Sheet: {name}: size: {len(df)} example:#n{df.head(2)}")
-                full_type_df = pd.concat([full_type_df, df], ignore_index=True)
-    full_type_df['table_name'] = full_type_df['table_name'].str.upper()
-    full_type_df['column_name'] = full_type_df['column_name'].str.upper()
-    return full_type_df
+def get_evidence_index() -> EvidenceIndex:
+    evidence = load_evidence()
+    version = evidence.fingerprint["sha256"]
+    index = _evidence_indexes.get(version)
+    if index is None:
+        _evidence_indexes.clear()
+        index = _evidence_indexes[version] = build_evidence_index(evidence)
+    return index
 
 
 def replace_lines_in_file(
@@ -72,15 +80,13 @@ def replace_lines_in_file(
     source_type: str, 
     active_rule_set: set,
     system_types: List[int],
-    extra_tables: List[str] = []
+    extra_tables: List[str] = [],
+    evidence: Optional[EvidenceIndex] = None
 ):
-    # Step 1: Read all lines
-    with open(file_path, 'r', encoding=encoding, newline="") as f:
-        lines = f.readlines()
     evidence_excel_path = str(Path(file_path).parent / OUTPUT_EVIDENCE_EXCEL_NAME)
 
     if not codeBlockLines:
-        return
+        return []
 
     # Step 1: collect all line indices to replace (in order)
     sorted_blocks = sorted(codeBlockLines, key=lambda x: x[0])
@@ -88,53 +94,57 @@ def replace_lines_in_file(
     for start, end in sorted_blocks:
         lines_to_replace_idx.extend(range(start - 1, end))  # 0-based indices
 
-    # Step 2: get all lines to replace in order
-    target_lines = [lines[i] for i in lines_to_replace_idx]
+    # Step 2: read only the lines to replace, in order
+    with timing.span("read_lines"):
+        target_lines = line_file.read_lines(file_path, encoding, lines_to_replace_idx)
 
     # Step 3: process the merged block
-    replaced_lines = process_and_replace_lines(app, target_lines, lines_to_replace_idx, evidence_excel_path, source_type, active_rule_set, system_types, extra_tables, encoding=encoding)
+    replaced_lines = process_and_replace_lines(app, target_lines, lines_to_replace_idx, evidence_excel_path, source_type, active_rule_set, system_types, extra_tables, encoding=encoding, evidence=evidence)
     if replaced_lines:
-        output_code = ''
-        for idx, line in enumerate(replaced_lines):
-             output_code += f'Line {lines_to_replace_idx[idx] + 1}: {line if line.endswith("\n") else line + "\n"}'
+        output_code = ''.join(
+            f'Line {lines_to_replace_idx[idx] + 1}: {line if line.endswith("\n") else line + "\n"}'
+            for idx, line in enumerate(replaced_lines)
+        )
         st.code(output_code)
 
-        # Replace the lines in the original list
-        for i in range(len(lines_to_replace_idx)):
-            idx = lines_to_replace_idx[i]
-            lines[idx] = replaced_lines[i]
-
-        # Write back to file
-        with open(file_path, 'w', encoding=encoding, newline="") as f:
-            f.writelines(lines)
+        # Write back only the replaced lines, the rest of the file is copied as is
+        with timing.span("write_lines"):
+            new_lines_by_idx = dict(zip(lines_to_replace_idx, replaced_lines))
+            line_file.splice_lines(file_path, encoding, [(idx, idx + 1, [line]) for idx, line in new_lines_by_idx.items()])
+    return replaced_lines
 
-def process_and_replace_lines(app: xw.App,lines: List[str], line_indexes: List[int], evidence_excel_path: str,  source_type: str, active_rule_set: set, system_types: List[int], extra_tables: List[str]=[], encoding='shift_jis') -> List[str]:
-    unused_keys, filter_keys, mapping, new_col_name_to_table_and_data_type_dict, column_set = show_data_type(lines, system_types, extra_tables, encoding=encoding, only_show=False)
+def process_and_replace_lines(app: xw.App,lines: List[str], line_indexes: List[int], evidence_excel_path: str,  source_type: str, active_rule_set: set, system_types: List[int], extra_tables: List[str]=[], encoding='shift_jis', evidence: Optional[EvidenceIndex] = None) -> List[str]:
+    with timing.span("show_data_type"):
+        unused_keys, filter_keys, mapping, new_col_name_to_table_and_data_type_dict, column_set = show_data_type(lines, system_types, extra_tables, encoding=encoding, only_show=False, evidence=evidence)
 
     # Export used keys to Excel
     if app:
-        filter_excel(
-            app,
-            excel_path=evidence_excel_path,
-            filter_values=filter_keys,
-            system_types=system_types
-        )
+        with timing.span("excel_export"):
+            filter_excel(
+                app,
+                excel_path=evidence_excel_path,
+                filter_values=filter_keys,
+                system_types=system_types
+            )
     else:
         st.warning("Skipping evidence data export.")
     
-    new_lines, output_mul_mapping, output_rule2_mapping = replace_by_mapping(lines, line_indexes, mapping, new_col_name_to_table_and_data_type_dict, column_set)
+    with timing.span("replace_by_mapping"):
+        new_lines, output_mul_mapping, output_rule2_mapping = replace_by_mapping(lines, line_indexes, mapping, new_col_name_to_table_and_data_type_dict, column_set)
 
-    detect_rules.detect_and_apply_rules(new_lines,  source_type, active_rule_set, unused_keys, output_mul_mapping, output_rule2_mapping)
+    with timing.span("rules"):
+        detect_rules.detect_and_apply_rules(new_lines,  source_type, active_rule_set, unused_keys, output_mul_mapping, output_rule2_mapping)
 
     return new_lines
 
-def show_data_type(lines: List[str],  system_types: List[int], extra_tables, only_show=False, encoding='shift_jis') -> Tuple[List[str], set, dict, dict]:
-    valid_columns = extract_column_names_from_sheet()
-    sheets = load_all_sheets()
-    schema_dict, table_dict, column_dict, key_dict = build_mappings(sheets)
+def show_data_type(lines: List[str],  system_types: List[int], extra_tables, only_show=False, encoding='shift_jis', evidence: Optional[EvidenceIndex] = None) -> Tuple[List[str], set, dict, dict]:
+    with timing.span("evidence_index"):
+        evidence = evidence or get_evidence_index()
+    schema_dict, table_dict, column_dict, key_dict = evidence.schema_dict, evidence.table_dict, evidence.column_dict, evidence.key_dict
 
     block = ''.join(lines)
-    (used_keys, unused_keys) = extract_full_keys(block, valid_columns, encoding)
+    with timing.span("key_extraction"):
+        (used_keys, unused_keys) = evidence.key_extractor.extract(block, encoding)
     if '' in  used_keys:
         used_keys.append("@@@@")
     if extra_tables:
@@ -147,26 +157,24 @@ def show_data_type(lines: List[str],  system_types: List[int], extra_tables, onl
     if table_list:
         st.write(f"Tables:")
         st.code(','.join(table_list))
-    full_type_df = get_full_type_df(system_types)
-    filtered_df  = full_type_df[full_type_df['table_name'].isin(filter_keys) & full_type_df['column_name'].isin(filter_keys)]
-
-    mapping, column_set = build_full_mapping(used_keys, schema_dict, table_dict, column_dict, key_dict)
-
-    new_col_name_to_table_and_data_type_dict : dict[str, list]= {}
-    for _, row in filtered_df.iterrows():
-        table_name = row["table_name"]
-        col_name = row["column_name"]
-        data_type = row['data_type']
-        new_table_names: set = mapping.get(table_name, {})
-        new_col_names: set = mapping.get(col_name, {})
-
-        for new_tbl_name in new_table_names:
-            for new_col_name in new_col_names:
-                if new_col_name not in new_col_name_to_table_and_data_type_dict:
-                    new_col_name_to_table_and_data_type_dict[new_col_name] = []
-                items = new_col_name_to_table_and_data_type_dict.get(new_col_name)
-                items.append((new_tbl_name, data_type))
+    with timing.span("mapping"):
+        mapping, column_set = build_full_mapping(used_keys, schema_dict, table_dict, column_dict, key_dict)
+
+    with timing.span("data_types"):
+        type_index = evidence.type_index(system_types)
+        new_col_name_to_table_and_data_type_dict : dict[str, list]= {}
+        for table_name, col_name, data_type in type_index.lookup(filter_keys):
+            new_table_names: set = mapping.get(table_name, {})
+            new_col_names: set = mapping.get(col_name, {})
+
+            for new_tbl_name in new_table_names:
+                for new_col_name in new_col_names:
+                    if new_col_name not in new_col_name_to_table_and_data_type_dict:
+                        new_col_name_to_table_and_data_type_dict[new_col_name] = []
+                    items = new_col_name_to_table_and_data_type_dict.get(new_col_name)
+                    items.append((new_tbl_name, data_type))
     if only_show:
+        filtered_df = type_index.frame.iloc[type_index.rows(filter_keys)].copy()
         filtered_df.loc[:, 'table_order'] = filtered_df['table_name'].apply(lambda x: used_keys.index(x))
         filtered_df.loc[:, 'column_order'] = filtered_df['column_name'].apply(lambda x: used_keys.index(x))
         filtered_df = filtered_df.sort_values(['column_order', 'table_order'])
@@ -0,0 +1,299 @@
+"""Background jobs: the long actions of the tabs, run by runner threads instead of the Streamlit rerun.
+
+Any session can queue a job in the job store (utils.job_store); it keeps running when the browser tab is
+closed. The app starts JOB_RUNNER_THREADS runners, and more can run in worker processes:
+
+    python -m logic.jobs worker                 # run queued jobs until stopped (--once: until the queue is empty)
+    python -m logic.jobs submit auto_replace params.json
+    python -m logic.jobs list
+    python -m logic.jobs cancel 12
+    python -m logic.jobs resume 12
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from dataclasses import asdict
+from typing import Callable, Dict, Iterable, List, Optional
+
+from config import (
+    BATCH_MAX_WORKERS,
+    COPY_MAX_WORKERS,
+    EXCEL_BACKEND,
+    JOB_POLL_SECONDS,
+    JOB_RUNNER_THREADS,
+    JOB_STALE_SECONDS,
+    MERGE_MAX_WORKERS,
+    get_configs_by_source_type,
+)
+from logic import batch, batch_merge, daily_items, source_c
+from utils import copy_store, job_store, workspace_catalog
+
+ITEM_STATUS_CREATED = "created"
+
+
+class JobContext:
+    """What a job kind sees of its job: the items finished by previous runs, progress recording and cancellation."""
+
+    def __init__(self, job: job_store.Job):
+        self.job = job
+        self.finished = job_store.finished_keys(job.id)
+        self.stopped = False
+
+    def set_total(self, total: int):
+        job_store.set_total(self.job.id, total)
+
+    def todo(self, keys: Iterable[str]) -> List[str]:
+        return [key for key in keys if str(key) not in self.finished]
+
+    def record(self, item_key, status: str, message: str = "", elapsed: float = 0.0, result: Optional[dict] = None):
+        job_store.record_item(self.job.id, str(item_key), status, message, elapsed, result)
+
+    def should_stop(self) -> bool:
+        """True once the job is cancelled; the kind then starts no further item."""
+        if not self.stopped and job_store.is_cancel_requested(self.job.id):
+            self.stopped = True
+        return self.stopped
+
+
+def _daily_folder_path(params: dict) -> str:
+    source_configs = get_configs_by_source_type(params["source_type"])
+    return f'{source_configs.ROOT_OUTPUT_PATH}/{params["excel_file_name"]}/{params["sheet_name"]}/{params["daily_folder"]}'
+
+
+def _check(errors: List[str]):
+    if errors:
+        raise ValueError("Some lines are invalid: " + "; ".join(errors))
+
+
+def run_create_items(ctx: JobContext, params: dict):
+    """Initialize Daily Items."""
+    source_configs = get_configs_by_source_type(params["source_type"])
+    items, errors = daily_items.parse_items(params["items"])
+    _check(errors)
+    ctx.set_total(len({item[0] for item in items}))
+    todo = set(ctx.todo(item[0] for item in items))
+
+    def record(item_id: str, created: Optional[dict], error: str):
+        ctx.record(item_id, job_store.ITEM_STATUS_ERROR if error else ITEM_STATUS_CREATED, error, result=created)
+
+    daily_items.create_items(
+        source_configs, _daily_folder_path(params), [item for item in items if item[0] in todo],
+        max_workers=params.get("workers", COPY_MAX_WORKERS), on_result=record, should_stop=ctx.should_stop,
+    )
+
+
+def run_auto_replace(ctx: JobContext, params: dict):
+    """Auto Replace Tool, on the batch engine."""
+    items, errors = batch.parse_items(params["items"])
+    _check(errors)
+    job = batch.BatchJob(params["source_type"], params["excel_file_name"], params["sheet_name"], params["daily_folder"],
+                         export_evidence=params.get("export_evidence", True), excel_backend=params.get("excel_backend", EXCEL_BACKEND),
+                         profile=params.get("profile", False))
+    ctx.set_total(len({item.item_no for item in items}))
+    todo = set(ctx.todo(item.item_no for item in items))
+
+    def record(result: batch.ItemResult):
+        ctx.record(result.item_no, result.status, result.message, result.elapsed, asdict(result))
+
+    batch.run_batch(
+        job, [item for item in items if item.item_no in todo], max_workers=params.get("workers", BATCH_MAX_WORKERS),
+        on_result=record, should_stop=ctx.should_stop,
+    )
+
+
+def _merge_key(item_no: str, change_path: str) -> str:
+    return f"No.{item_no}/{os.path.basename(change_path)}"
+
+
+def run_merge(ctx: JobContext, params: dict):
+    """Merge Source Files, on the batch merge."""
+    source_configs = get_configs_by_source_type(params["source_type"])
+    if not source_configs.SVN_ROOT_PATH:
+        raise ValueError("SVN_ROOT_PATH is not set")
+    item_data, errors = batch_merge.parse_items(params["items"])
+    _check(errors)
+    catalog = workspace_catalog.get_catalog(_daily_folder_path(params))
+    tasks, results = batch_merge.plan_merge(item_data, catalog, source_configs.SUFFIXES, source_configs.SVN_ROOT_PATH)
+    ctx.set_total(len(tasks) + len(results))
+
+    def record(result: batch_merge.MergeResult):
+        ctx.record(_merge_key(result.item_no, result.change_path), result.status, result.message, result.elapsed, asdict(result))
+
+    for result in results:
+        record(result)
+    todo = set(ctx.todo(_merge_key(task.item_no, task.change_path) for task in tasks))
+    batch_merge.run_merge(
+        [task for task in tasks if _merge_key(task.item_no, task.change_path) in todo],
+        max_workers=params.get("workers", MERGE_MAX_WORKERS), on_result=record, should_stop=ctx.should_stop,
+    )
+
+
+def run_source_c(ctx: JobContext, params: dict):
+    """Tools for source C."""
+    source_configs = get_configs_by_source_type("c")
+    items, errors = daily_items.parse_items(params["items"])
+    _check(errors)
+    item_map = {int(item_no): (src_label, full_file_name, data_line) for item_no, src_label, full_file_name, data_line in items}
+    ctx.set_total(len(item_map))
+    daily_folder_path = _daily_folder_path(dict(params, source_type="c"))
+    store = copy_store.get_store(source_configs.ROOT_OUTPUT_PATH)
+
+    for item_no in ctx.todo(sorted(item_map.keys())):
+        if ctx.should_stop():
+            break
+        src_label, full_file_name, data_line = item_map[item_no]
+        result = source_c.process_item(source_configs, daily_folder_path, params["sheet_name"], item_no, src_label, full_file_name,
+                                       data_line, store, profile=params.get("profile", False))
+        ctx.record(item_no, result.status, result.message, result.elapsed, asdict(result))
+
+
+JOB_KINDS: Dict[str, Callable[[JobContext, dict], None]] = {
+    "create_items": run_create_items,
+    "auto_replace": run_auto_replace,
+    "merge": run_merge,
+    "source_c": run_source_c,
+}
+
+
+def submit(kind: str, title: str, params: dict) -> int:
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return job_store.submit(kind, title, params)
+
+
+def format_seconds(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s"
+
+
+def describe(job: job_store.Job) -> str:
+    """Progress line of a job, e.g. '12/40 items, 1 errors, ETA 3m05s'."""
+    text = f"{job.done}/{job.total} items" if job.total else "-"
+    if job.errors:
+        text += f", {job.errors} errors"
+    eta = job.eta_seconds
+    if eta is not None:
+        text += f", ETA {format_seconds(eta)}"
+    elif job.finished_at and job.started_at:
+        text += f", {format_seconds(job.finished_at - job.started_at)}"
+    return text
+
+
+def _beat(job_id: int, finished: threading.Event):
+    while not finished.wait(JOB_POLL_SECONDS):
+        job_store.heartbeat(job_id)
+
+
+def run_job(job: job_store.Job):
+    ctx = JobContext(job)
+    finished = threading.Event()
+    # heartbeats are sent while an item runs, so the job is not taken for interrupted
+    threading.Thread(target=_beat, args=(job.id, finished), name=f"job-{job.id}-heartbeat", daemon=True).start()
+    try:
+        JOB_KINDS[job.kind](ctx, job.params)
+        job_store.finish(job.id, job.worker, job_store.STATUS_CANCELLED if ctx.stopped else job_store.STATUS_DONE)
+    except Exception as e:
+        job_store.finish(job.id, job.worker, job_store.STATUS_FAILED, f"{type(e).__name__}: {e}")
+    finally:
+        finished.set()
+
+
+def run_next(worker: str) -> bool:
+    """Run the oldest queued job. Returns False when the queue is empty."""
+    job_store.mark_interrupted(JOB_STALE_SECONDS)
+    job = job_store.claim_next(worker)
+    if job is None:
+        return False
+    run_job(job)
+    return True
+
+
+def work(stop: Optional[threading.Event] = None, once: bool = False):
+    """Runner loop: run queued jobs one after another, polling the queue every JOB_POLL_SECONDS."""
+    stop = stop or threading.Event()
+    worker = job_store.worker_name()
+    while not stop.is_set():
+        if not run_next(worker):
+            if once:
+                return
+            stop.wait(JOB_POLL_SECONDS)
+
+
+class _RunnerThreadFilter(logging.Filter):
+    """The st.* calls of the job kinds have no session in a runner thread (or in the thread pools it starts,
+    which are named after it), which Streamlit logs for every call."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not record.threadName.startswith("job-")
+
+
+def _filter_runner_warnings():
+    logger = logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context")
+    if not any(isinstance(f, _RunnerThreadFilter) for f in logger.filters):
+        logger.addFilter(_RunnerThreadFilter())
+
+
+# Runner threads of this process, started once (Streamlit runs the app script again on every interaction)
+_runners: List[threading.Thread] = []
+_runners_lock = threading.Lock()
+
+
+def start_runners(count: int = JOB_RUNNER_THREADS):
+    with _runners_lock:
+        if count > len(_runners):
+            _filter_runner_warnings()
+        while len(_runners) < count:
+            runner = threading.Thread(target=work, name=f"job-runner-{len(_runners) + 1}", daemon=True)
+            runner.start()
+            _runners.append(runner)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run and manage the background jobs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    worker_parser = commands.add_parser("worker", help="Run queued jobs")
+    worker_parser.add_argument("--threads", type=int, default=1, help="Jobs run at the same time")
+    worker_parser.add_argument("--once", action="store_true", help="Stop when the queue is empty")
+    submit_parser = commands.add_parser("submit", help="Queue a job")
+    submit_parser.add_argument("kind", choices=sorted(JOB_KINDS))
+    submit_parser.add_argument("params", help="JSON file with the job parameters, '-' for stdin")
+    submit_parser.add_argument("--title", default="")
+    list_parser = commands.add_parser("list", help="Print the last jobs as JSON lines")
+    list_parser.add_argument("--limit", type=int, default=20)
+    list_parser.add_argument("--items", type=int, metavar="JOB_ID", help="Print the items of this job instead")
+    for command in ("cancel", "resume"):
+        commands.add_parser(command).add_argument("job_id", type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == "worker":
+        _filter_runner_warnings()
+        threads = [threading.Thread(target=work, kwargs={"once": args.once}, name=f"job-runner-{i + 1}") for i in range(max(1, args.threads))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elif args.command == "submit":
+        params = json.load(sys.stdin if args.params == "-" else open(args.params, encoding="utf-8"))
+        print(submit(args.kind, args.title or f"{args.kind} {time.strftime('%Y-%m-%d %H:%M')}", params))
+    elif args.command == "list":
+        if args.items:
+            for item in job_store.items(args.items):
+                sys.stdout.write(json.dumps(asdict(item), ensure_ascii=False) + "\n")
+        else:
+            for job in job_store.list_jobs(args.limit):
+                row = {"id": job.id, "kind": job.kind, "title": job.title, "status": job.status, "progress": describe(job), "message": job.message}
+                sys.stdout.write(json.dumps(row, ensure_ascii=False) + "\n")
+    elif args.command == "cancel":
+        return 0 if job_store.request_cancel(args.job_id) else 1
+    elif args.command == "resume":
+        return 0 if job_store.resume(args.job_id) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 # -*- coding: euc_jp -*-
-from typing import Set, Tuple
+from collections import ChainMap
+from typing import Mapping, Set, Tuple
 from pandas import DataFrame
 
 def get_full_schema_table_and_column_names_from_sheets(sheets) -> Set[str]:
@@ -24,20 +25,23 @@ def build_mappings(sheets) -> tuple:
     schema_dict[''] = {'schm_kinko'}
     return schema_dict, table_dict, column_dict, key_dict
 
-def build_full_mapping(used_keys, schema_dict, table_dict, column_dict, key_dict) -> Tuple[dict[str, set], set]:
+def build_full_mapping(used_keys, schema_dict, table_dict, column_dict, key_dict) -> Tuple[Mapping[str, set], set]:
+    """Mapping of the block: the names of the used tables and of their columns, on top of the shared
+    key and schema mappings (read only, never copied)."""
     column_set = set()
-    full_mapping = schema_dict.copy()
-    full_mapping.update(key_dict)
-    
+    overlay = {}
+    merged = set()  # overlay keys whose set belongs to the overlay, the others are shared with the evidence
+
     for table in used_keys:
         if table in table_dict:
-            full_mapping[table] = table_dict[table]
+            overlay[table] = table_dict[table]
+            merged.discard(table)
             column_dict_by_table = column_dict.get(table, {})
             for column, values in column_dict_by_table.items():
                 column_set.update(values)
-                if column not in full_mapping:
-                    full_mapping[column] = set()
-                full_mapping[column].update(values)
-    return full_mapping, column_set
-
-
+                if column not in merged:
+                    base = overlay.get(column, key_dict.get(column, schema_dict.get(column, ())))
+                    overlay[column] = set(base)
+                    merged.add(column)
+                overlay[column].update(values)
+    return ChainMap(overlay, key_dict, schema_dict), column_set
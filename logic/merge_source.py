@@ -1,6 +1,6 @@
-import difflib
+from typing import List, Tuple
 
-from utils import file_utils
+from utils import file_utils, line_diff
 
 
 def merge_source_file(original_path: str, change_path: str, dest_path: str, encoding='shift_jis') -> str:
@@ -18,7 +18,18 @@ def merge_source_file(original_path: str, change_path: str, dest_path: str, enco
         changed_lines = f.readlines()
     with open(dest_path, 'r', encoding=encoding, newline="") as f:
         dest_lines = f.readlines()
-    
+
+    dest_lines, result = merge_source_lines(original_lines, changed_lines, dest_lines)
+
+    # Step 5: Save result
+    with open(dest_path, 'w', encoding=encoding, newline="") as f:
+        f.writelines(dest_lines)
+
+    return result
+
+
+def merge_source_lines(original_lines: List[str], changed_lines: List[str], dest_lines: List[str]) -> Tuple[List[str], str]:
+    """Applies the lines changed between original and changed to dest. Returns (new dest lines, change report)."""
     original_eol_format = file_utils.detect_eol_str_by_content(''.join(original_lines))
     dest_eol_format = file_utils.detect_eol_str_by_content(''.join(dest_lines))
     if original_eol_format != dest_eol_format:
@@ -27,29 +38,8 @@ def merge_source_file(original_path: str, change_path: str, dest_path: str, enco
         raise ValueError("Original and destination files must have the same number of lines")
 
     # Step 2: Diff original vs changed
-    diff = list(difflib.ndiff(original_lines, changed_lines))
-    changed_line_indices = []
-    new_lines_map = {}
-    orig_line_num = 0
-    changed_line_num = 0
-    for line in diff:
-        code = line[:2]
-        content = line[2:]
-
-        if code == '  ':
-            orig_line_num += 1
-            changed_line_num += 1
-        elif code == '- ':
-            orig_line_num += 1
-        elif code == '+ ':
-            changed_line_indices.append(changed_line_num)
-            new_lines_map[changed_line_num] = content
-            changed_line_num += 1
-        elif code == '? ':
-            # This line is a hint for a change, we can ignore it
-            continue
-        else:
-            raise ValueError(f"Unexpected diff code: {code}")
+    changed_line_indices = line_diff.inserted_indices(original_lines, changed_lines)
+    new_lines_map = {idx: changed_lines[idx] for idx in changed_line_indices}
     # Step 3: Check if dest matches original exactly
     for idx in changed_line_indices:
         if original_lines[idx] != dest_lines[idx] and changed_lines[idx] != dest_lines[idx]:
@@ -58,16 +48,12 @@ def merge_source_file(original_path: str, change_path: str, dest_path: str, enco
                              f"Dest    : {dest_lines[idx]!r}")
 
     # Step 4: Apply to dest
-    result = ''
+    result = []
     for idx in changed_line_indices:
-        result = result + f'Line {idx + 1}: {new_lines_map[idx]}'
+        result.append(f'Line {idx + 1}: {new_lines_map[idx]}')
         if idx < len(dest_lines):
             dest_lines[idx] = new_lines_map[idx]
         else:
             # append line if it's beyond the end
             dest_lines.append(new_lines_map[idx])
-    # Step 5: Save result
-    with open(dest_path, 'w', encoding=encoding, newline="") as f:
-        f.writelines(dest_lines)
-    
-    return result
\ No newline at end of file
+    return dest_lines, ''.join(result)
\ No newline at end of file
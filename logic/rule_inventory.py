@@ -0,0 +1,396 @@
+"""Rule inventory of a whole application folder: which line ranges of which files match which rules.
+
+Every file under the app root (ROOT_APP_PATH / C_ROOT_APP_PATH) with one of the source type
+suffixes is cut into statements (shell scripts into commands) and the rules are detected on each
+statement, as detect_c_rules / detect_java_rules do on an item block. Neighbouring matching
+statements are merged into one line range. Files are scanned in a process pool.
+
+The inventory is saved as a manifest (one JSON file per source type). A file is scanned again
+only when its size or mtime changed and then only when its content hash or the rules changed,
+so a rescan of an unchanged tree reads no file.
+
+Usage:
+    python -m logic.rule_inventory --source-type c [--workers 8] [--full] [--rules 22,28] [--items items.txt]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import BATCH_MAX_WORKERS, RULE_INVENTORY_PATH, get_configs_by_source_type
+from logic import handler
+from rules import common_detect_rules, detect_c_rules, detect_java_rules, rule22_engine, rule28_engine
+from rules.rule_set import get_rule_set
+from utils import encoding_cache, workspace_catalog
+
+INVENTORY_VERSION = 1       # bump when the detection or the manifest layout changes
+SCAN_CHUNK_FILES = 20       # files per worker task
+MAX_STATEMENT_LINES = 200   # an unbalanced comment or quote does not swallow the rest of the file
+
+_NEWLINE_RE = re.compile(r"\r\n?|\n")
+# statement scan: comments and string literals are skipped as a whole, ; { } and the closing
+# MyBatis statement tags end a statement, so does a blank line; a preprocessor line is one statement
+_STATEMENT_SCAN_RE = re.compile(
+    r"""(?=[/"'<;{}#\r\n])(?://[^\r\n]*|/\*[\s\S]*?(?:\*/|\Z)|"(?:\\.|[^"\\\r\n])*"|'(?:\\.|[^'\\\r\n])*'"""
+    r"""|(?P<end>[;{}]|</(?:select|insert|update|delete|sql)\s*>)|(?P<hash>#)|(?P<nl>\r\n?|\n))""",
+    re.IGNORECASE,
+)
+# a preprocessor line, with its continuation lines
+_DIRECTIVE_RE = re.compile(r"#(?:\\(?:\r\n?|\n)|[^\r\n])*(?:\r\n?|\n|\Z)")
+# the rest of a line after the end of a statement, when it is blank or a comment
+_LINE_REST_RE = re.compile(r"[ \t]*(?://[^\r\n]*|/\*(?:(?!\*/)[^\r\n])*\*/[ \t]*)?(?:\r\n?|\n)")
+
+
+@dataclass
+class InventoryRange:
+    start_line: int
+    end_line: int
+    rules: List[int] = field(default_factory=list)
+    values: List[str] = field(default_factory=list)  # detect_value of the matched rules
+
+
+@dataclass
+class FileEntry:
+    path: str  # relative to the app root, with forward slashes
+    size: int
+    mtime_ns: int
+    sha256: str
+    rules_hash: str
+    encoding: str = ""
+    ranges: List[InventoryRange] = field(default_factory=list)
+    error: str = ""
+
+
+@dataclass
+class Inventory:
+    source_type: str
+    root_path: str
+    scanned_at: str = ""
+    files: Dict[str, FileEntry] = field(default_factory=dict)
+
+
+@dataclass
+class ScanSummary:
+    files: int = 0
+    scanned: int = 0     # files read and detected
+    unchanged: int = 0   # files read whose content hash had not changed
+    reused: int = 0      # files not read (same size and mtime)
+    removed: int = 0
+    errors: int = 0
+    elapsed: float = 0.0
+
+
+def inventory_path_of(source_type: str) -> str:
+    return os.path.join(RULE_INVENTORY_PATH, f"{source_type.lower()}.json")
+
+
+def scan_suffixes(source_type: str) -> List[str]:
+    """Suffixes of the original files: the item copies are named <name>_after.<ext>."""
+    return sorted({suf.replace("_after", "", 1) for suf in get_configs_by_source_type(source_type).SUFFIXES})
+
+
+def rules_hash(source_type: str) -> str:
+    rules = common_detect_rules.load_all_rules(source_type)
+    payload = json.dumps([INVENTORY_VERSION, rules], sort_keys=True, ensure_ascii=False, default=dict)  # rules are read-only mappings
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def split_statements(text: str) -> List[Tuple[int, int]]:
+    """(start, stop) of the statements of a C / Java / SQL / XML text."""
+    statements = []
+    start = pos = lines = 0
+    line_start = 0  # start of the current line
+    while True:
+        m = _STATEMENT_SCAN_RE.search(text, pos)
+        if m is None:
+            break
+        pos = m.end()
+        if m.group("end"):
+            rest = _LINE_REST_RE.match(text, pos)
+            if rest:
+                pos = line_start = rest.end()
+            statements.append((start, pos))
+            start, lines = pos, 0
+        elif m.group("hash"):
+            if text[line_start:m.start()].strip():
+                continue  # not at the start of a line
+            if text[start:line_start].strip():
+                statements.append((start, line_start))
+                start = line_start
+            pos = line_start = _DIRECTIVE_RE.match(text, m.start()).end()
+            statements.append((start, pos))
+            start, lines = pos, 0
+        elif m.group("nl"):
+            lines += 1
+            blank = not text[line_start:m.start()].strip()
+            line_start = pos
+            if (blank and text[start:m.start()].strip()) or lines >= MAX_STATEMENT_LINES:
+                statements.append((start, pos))
+                start, lines = pos, 0
+        else:
+            lines += m.group().count("\n")
+    if start < len(text):
+        statements.append((start, len(text)))
+    return statements
+
+
+def _detect(source_type: str, statement: str) -> List[Tuple[int, str]]:
+    """(rule_no, detect_value) of the rules matching one statement."""
+    rule_set = get_rule_set(source_type)
+    detector = detect_c_rules if source_type == "c" else detect_java_rules
+    matched = [(rule.get("rule_no", 0), str(rule.get("detect_value", ""))) for rule in detector.detect_rules([statement], rule_set)[0]]
+    if source_type == "c":
+        # rules 22 and 28 are conversions without a detect pattern: they match when they change the text
+        if "SQLCODE" in statement and rule22_engine.transform_text(statement) != statement:
+            matched.append((22, "SQLCODE"))
+        engine = rule28_engine.get_engine(rule_set.by_no(28))
+        if engine.transform_text(statement) != statement:
+            rule = next(r for r in engine.rules if r.template_pattern.search(statement))
+            matched.append((28, str(rule.rule.get("detect_value", ""))))
+    return matched
+
+
+def detect_ranges(source_type: str, text: str, shell: bool = False) -> List[InventoryRange]:
+    """Line ranges of text with their matched rules, neighbouring matching statements merged."""
+    line_starts = [0] + [m.end() for m in _NEWLINE_RE.finditer(text)]
+    units = rule28_engine.split_commands(text) if shell else split_statements(text)
+    ranges: List[InventoryRange] = []
+    for start, stop in units:
+        statement = text[start:stop]
+        stripped = statement.strip()
+        if not stripped:
+            continue
+        matched = _detect(source_type, statement)
+        if not matched:
+            continue
+        first = start + statement.index(stripped[0])
+        last = start + statement.rindex(stripped[-1])
+        start_line, end_line = bisect_right(line_starts, first), bisect_right(line_starts, last)
+        if ranges and start_line <= ranges[-1].end_line + 1:
+            current = ranges[-1]
+            current.end_line = max(current.end_line, end_line)
+        else:
+            current = InventoryRange(start_line, end_line)
+            ranges.append(current)
+        for rule_no, value in matched:
+            if (rule_no, value) not in zip(current.rules, current.values):
+                current.rules.append(rule_no)
+                current.values.append(value)
+    return ranges
+
+
+def scan_file(source_type: str, root_path: str, rel_path: str, known_sha256: str, current_rules_hash: str) -> Optional[FileEntry]:
+    """Entry of one file, None when its content and the rules did not change since known_sha256."""
+    path = os.path.join(root_path, rel_path)
+    stat = os.stat(path)
+    detected, raw = encoding_cache.get_or_detect(path, handler.detect_file_encoding, need_raw=True)
+    sha256 = hashlib.sha256(raw).hexdigest()
+    if sha256 == known_sha256:
+        return None
+    entry = FileEntry(rel_path, stat.st_size, stat.st_mtime_ns, sha256, current_rules_hash, detected.final_encoding)
+    try:
+        text = raw.decode(detected.final_encoding)
+        entry.ranges = detect_ranges(source_type, text, shell=rel_path.lower().endswith(".sh"))
+    except Exception as e:
+        entry.error = f"{type(e).__name__}: {e}"
+    return entry
+
+
+def _scan_chunk(source_type: str, root_path: str, chunk: List[Tuple[str, str]], current_rules_hash: str) -> List[Tuple[str, Optional[FileEntry], str]]:
+    results = []
+    for rel_path, known_sha256 in chunk:
+        try:
+            results.append((rel_path, scan_file(source_type, root_path, rel_path, known_sha256, current_rules_hash), ""))
+        except Exception as e:
+            results.append((rel_path, None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def load_inventory(source_type: str, path: Optional[str] = None) -> Optional[Inventory]:
+    path = path or inventory_path_of(source_type)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    files = {}
+    for rel_path, entry in data.get("files", {}).items():
+        entry["ranges"] = [InventoryRange(**r) for r in entry.get("ranges", [])]
+        files[rel_path] = FileEntry(**entry)
+    return Inventory(data["source_type"], data["root_path"], data.get("scanned_at", ""), files)
+
+
+def save_inventory(inventory: Inventory, path: Optional[str] = None):
+    path = path or inventory_path_of(inventory.source_type)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(asdict(inventory), f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def scan_inventory(
+    source_type: str,
+    root_path: Optional[str] = None,
+    max_workers: int = BATCH_MAX_WORKERS,
+    full: bool = False,
+    path: Optional[str] = None,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> Tuple[Inventory, ScanSummary]:
+    """Bring the inventory of the app root up to date and save it. full scans every file again.
+
+    on_progress(done, total) is called after every chunk of scanned files.
+    """
+    start_time = time.perf_counter()
+    source_type = source_type.lower()
+    root_path = str(Path(root_path or get_configs_by_source_type(source_type).ROOT_APP_PATH).resolve())
+    current_rules_hash = rules_hash(source_type)
+    previous = None if full else load_inventory(source_type, path)
+    if previous is not None and previous.root_path != root_path:
+        previous = None
+    inventory = Inventory(source_type, root_path)
+    summary = ScanSummary()
+
+    todo: List[Tuple[str, str]] = []
+    catalog = workspace_catalog.get_catalog(root_path)
+    for file_path in catalog.files(scan_suffixes(source_type)):
+        rel_path = Path(os.path.relpath(file_path, root_path)).as_posix()
+        old = previous.files.get(rel_path) if previous else None
+        if old is not None and old.rules_hash == current_rules_hash and not old.error:
+            stat = os.stat(file_path)
+            if (old.size, old.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                inventory.files[rel_path] = old
+                summary.reused += 1
+                continue
+        inventory.files[rel_path] = old  # kept until the file is scanned
+        known_sha256 = old.sha256 if old is not None and old.rules_hash == current_rules_hash and not old.error else ""
+        todo.append((rel_path, known_sha256))
+    summary.files = len(inventory.files)
+    if previous:
+        summary.removed = len(set(previous.files) - set(inventory.files))
+
+    def collect(results: List[Tuple[str, Optional[FileEntry], str]]):
+        for rel_path, entry, error in results:
+            if error:
+                summary.errors += 1
+                inventory.files[rel_path] = FileEntry(rel_path, 0, 0, "", "", error=error)
+            elif entry is None:
+                summary.unchanged += 1
+                old = inventory.files[rel_path]
+                stat = os.stat(os.path.join(root_path, rel_path))
+                old.size, old.mtime_ns = stat.st_size, stat.st_mtime_ns
+            else:
+                summary.scanned += 1
+                summary.errors += bool(entry.error)
+                inventory.files[rel_path] = entry
+
+    chunks = [todo[i:i + SCAN_CHUNK_FILES] for i in range(0, len(todo), SCAN_CHUNK_FILES)]
+    done = 0
+    try:
+        if max_workers <= 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                collect(_scan_chunk(source_type, root_path, chunk, current_rules_hash))
+                done += len(chunk)
+                if on_progress:
+                    on_progress(done, len(todo))
+        else:
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+                futures = {executor.submit(_scan_chunk, source_type, root_path, chunk, current_rules_hash): chunk for chunk in chunks}
+                for future in as_completed(futures):
+                    chunk = futures[future]
+                    try:
+                        collect(future.result())
+                    except Exception as e:
+                        # worker died: the files of the chunk are scanned again next time
+                        collect([(rel_path, None, f"{type(e).__name__}: {e}") for rel_path, _ in chunk])
+                    done += len(chunk)
+                    if on_progress:
+                        on_progress(done, len(todo))
+    finally:
+        # an interrupted scan keeps what it has done, the files not reached keep their old entries
+        inventory.files = {rel_path: entry for rel_path, entry in inventory.files.items() if entry is not None}
+        inventory.scanned_at = datetime.now().isoformat(timespec="seconds")
+        save_inventory(inventory, path)
+    summary.elapsed = time.perf_counter() - start_time
+    return inventory, summary
+
+
+def _matches(entry_range: InventoryRange, rule_nos: Optional[Iterable[int]]) -> bool:
+    return rule_nos is None or any(rule_no in entry_range.rules for rule_no in rule_nos)
+
+
+def rows(inventory: Inventory, rule_nos: Optional[Iterable[int]] = None) -> List[dict]:
+    """One row per line range, for display."""
+    rule_nos = None if rule_nos is None else set(rule_nos)
+    return [
+        {
+            "file": entry.path,
+            "start_line": r.start_line,
+            "end_line": r.end_line,
+            "rules": ", ".join(str(rule_no) for rule_no in sorted(set(r.rules))),
+            "values": " / ".join(r.values),
+        }
+        for entry in sorted(inventory.files.values(), key=lambda e: e.path)
+        for r in entry.ranges
+        if _matches(r, rule_nos)
+    ]
+
+
+def item_list(inventory: Inventory, rule_nos: Optional[Iterable[int]] = None, first_no: int = 1) -> str:
+    """Item list in the Auto Replace format (NO, FILE_PATH, FILE_NAME, START_LINE, END_LINE, ...), one item per file."""
+    rule_nos = None if rule_nos is None else set(rule_nos)
+    lines = []
+    for entry in sorted(inventory.files.values(), key=lambda e: e.path):
+        ranges = [r for r in entry.ranges if _matches(r, rule_nos)]
+        if not ranges:
+            continue
+        folder, _, file_name = entry.path.rpartition("/")
+        file_path = f"/{folder}/" if folder else "/"
+        parts = [str(first_no + len(lines)), file_path, file_name]
+        for r in ranges:
+            parts.extend((str(r.start_line), str(r.end_line)))
+        lines.append("\t".join(parts))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detect the rules on every file of the application folder.")
+    parser.add_argument("--source-type", required=True, choices=["java", "c"])
+    parser.add_argument("--root", help="Folder to scan (default: the app root of the source type)")
+    parser.add_argument("--workers", type=int, default=BATCH_MAX_WORKERS)
+    parser.add_argument("--full", action="store_true", help="Scan every file again, ignoring the manifest")
+    parser.add_argument("--manifest", help="Manifest file (default: RULE_INVENTORY_PATH/<source type>.json)")
+    parser.add_argument("--rules", default="", help="Only report ranges matching one of these rule numbers, e.g. 22,28")
+    parser.add_argument("--items", help="Write an Auto Replace item list to this file ('-' for stdout) instead of JSON lines")
+    parser.add_argument("--first-no", type=int, default=1, help="Item number of the first item of --items")
+    args = parser.parse_args(argv)
+
+    rule_nos = [int(n) for n in args.rules.split(",") if n.strip()] or None
+    inventory, summary = scan_inventory(args.source_type, args.root, args.workers, args.full, args.manifest)
+    print(json.dumps(asdict(summary)), file=sys.stderr)
+
+    if args.items:
+        text = item_list(inventory, rule_nos, args.first_no) + "\n"
+        if args.items == "-":
+            sys.stdout.write(text)
+        else:
+            Path(args.items).write_text(text, encoding="utf-8")
+    else:
+        for row in rows(inventory, rule_nos):
+            sys.stdout.write(json.dumps(row, ensure_ascii=False) + "\n")
+    return 0 if summary.errors == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""Per-item processing of the "Tools for source C" tab, also run by the source_c background job.
+
+Messages are written with st like the rest of the tab; outside a Streamlit session they are only logged
+and the outcome of the item is in its SourceCResult.
+"""
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import streamlit as st
+
+from config import HTML_FILE_NAME, NOTHING_TO_FIX_FILE_NAME, TEMPLATE_HTML_PATH
+from logic import handler
+from rules import detect_c_rules
+from utils import common_util, copy_store, line_file, timing, winmerge_util
+
+DEFAULT_SEPARATOR = "\x1f"
+
+STATUS_OK = "ok"
+STATUS_NOTHING_TO_FIX = "nothing_to_fix"
+STATUS_ERROR = "error"
+
+
+@dataclass
+class SourceCResult:
+    item_no: int
+    file_name: str
+    status: str = STATUS_OK
+    encoding: str = ""
+    matched_rules: int = 0
+    message: str = ""
+    elapsed: float = 0.0
+    stages: Dict[str, float] = field(default_factory=dict)  # timing span -> seconds
+    profile_path: str = ""
+
+
+def process_item(
+    source_configs,
+    daily_folder_path: str,
+    sheet_name: str,
+    item_no: int,
+    src_label: str,
+    full_file_name: str,
+    data_line: str,
+    store: Optional[copy_store.CopyStore] = None,
+    profile: bool = False,
+) -> SourceCResult:
+    """Copy the item file into its folder, apply the C rules to its line range and write the WinMerge report."""
+    store = store or copy_store.get_store(source_configs.ROOT_OUTPUT_PATH)
+    des_folder_name = f"{daily_folder_path}/No.{item_no}"
+    os.makedirs(des_folder_name, exist_ok=True)
+
+    result = SourceCResult(item_no, full_file_name)
+    with timing.record_item(item_no, f"{des_folder_name}/{full_file_name}", "source_c", profile=profile) as item_timing:
+        try:
+            _process_item(source_configs, des_folder_name, sheet_name, item_no, src_label, full_file_name, data_line,
+                          store, result)
+        except Exception as e:
+            st.error(f"Failed to create item No.{item_no}: {e}")
+            result.status = STATUS_ERROR
+            result.message = f"{type(e).__name__}: {e}"
+    result.elapsed = item_timing.total
+    result.stages = item_timing.stages
+    result.profile_path = item_timing.profile_path
+    return result
+
+
+def _fail(result: SourceCResult, message: str):
+    st.error(message)
+    result.status = STATUS_ERROR
+    result.message = message
+
+
+def _process_item(source_configs, des_folder_name, sheet_name, item_no, src_label, full_file_name, data_line,
+                  store, result: SourceCResult):
+    # Extract file info
+    file_type = full_file_name.split('.')[-1]
+    file_name = full_file_name.rsplit('.', 1)[0]
+    svn_path = source_configs.SVN_ROOT_PATH + "/" +''.join((src_label, full_file_name))[1:]  # remove leading character
+    src_path = source_configs.ROOT_APP_PATH + "/" +''.join((src_label, full_file_name))[1:]  # remove leading character
+    des_path = f'{des_folder_name}/{full_file_name}'
+    des_path_after = f'{des_folder_name}/{file_name}_after.{file_type}'
+    des_html_path = f'{des_folder_name}/{HTML_FILE_NAME}'
+    nothing_to_fix_file_path = f"{des_folder_name}/{NOTHING_TO_FIX_FILE_NAME}"
+
+    st.markdown(f"## Start process for No.{item_no}")
+    # Copy template files
+    with timing.span("copy_files"):
+        if os.path.exists(des_path):
+            st.warning(f"File already exists, skipping copy: {des_path}")
+        else:
+            store.materialize(src_path, des_path, editable=True)  # made writable, so never a link to the store
+            os.chmod(des_path, 0o666)
+
+        if os.path.exists(des_path_after):
+            os.remove(des_path_after)
+            st.warning(f"File already exists, removed old file: {des_path_after}")
+
+        store.materialize(src_path, des_path_after, editable=True)
+
+        os.chmod(des_path_after, 0o666)
+        store.materialize(TEMPLATE_HTML_PATH, des_html_path, editable=True)
+        os.chmod(des_html_path, 0o666)
+
+    # Process it
+    st.code(f"File: {des_path_after}")
+    with timing.span("encoding"):
+        encoding = handler.get_encoded_file(des_path_after)
+    if not encoding:
+        return _fail(result, f"Encoding could not be detected for {des_path_after}")
+    result.encoding = encoding
+    with timing.span("read_lines"), line_file.LineFile(des_path_after, encoding) as after_file:
+        line_count = after_file.line_count
+        if not line_count:
+            return _fail(result, f"No lines read from {des_path_after}")
+
+        start_line = data_line.split(",")[0].strip()
+        end_line = data_line.split(",")[1].strip() if len(data_line.split(",")) > 1 else start_line
+        start_line_index = common_util.parse_int(start_line) - 1
+        end_line_index = common_util.parse_int(end_line) -  1
+        if start_line_index == -1 or start_line_index < 0 or start_line_index > line_count:
+            return _fail(result, f"Invalid start line {start_line} for file with {line_count} lines.")
+        if end_line_index == -1 or start_line_index < 0 or start_line_index > line_count and end_line_index < start_line_index:
+            return _fail(result, f"Invalid end line {end_line} for file with {line_count} lines.")
+
+        # only the processed line range is read
+        range_lines = after_file.lines(start_line_index, end_line_index+1)
+
+    if sheet_name == "db2SQL":
+        with timing.span("read_lines"), line_file.LineFile(svn_path, encoding) as svn_file:
+            if not svn_file.line_count:
+                return _fail(result, f"No lines read from {svn_path}")
+
+            # copy from start_line to end_line
+            if end_line_index >= line_count:
+                raise IndexError("list assignment index out of range")
+            range_lines = [svn_file.line(i) for i in range(start_line_index, end_line_index+1)]
+
+    query_line =  DEFAULT_SEPARATOR.join(range_lines)
+    if not query_line:
+        return _fail(result, f"No lines to process from line {start_line} onwards. value: {query_line}")
+
+    with timing.span("rules"):
+        new_lines, matched_rules = detect_c_rules.detect_and_apply_rules(
+            query_line,
+            "c",
+            set(source_configs.RULE_CONFIGS.get(sheet_name, []))
+        )
+    result.matched_rules = len(matched_rules)
+
+    st.markdown("### Check rules")
+    if len(matched_rules) == 0 :
+        st.success("No rules matched")
+    old_rule = None
+    for rule in matched_rules:
+        if old_rule != rule["rule_no"]:
+            st.markdown(f"##### Rule {rule['rule_no']}:")
+            old_rule = rule["rule_no"]
+        st.warning(f"{rule['detect_value']} -> {rule['replace_value']}")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("##### Original line")
+        st.code(query_line.replace(DEFAULT_SEPARATOR, ""))
+    with col2:
+        st.markdown("##### Processed line")
+        if new_lines:
+            st.code(new_lines.replace(DEFAULT_SEPARATOR, ""))
+
+    if query_line != new_lines:
+        new_lines_list = new_lines.split(DEFAULT_SEPARATOR)
+        with timing.span("write_lines"):
+            line_file.splice_lines(des_path_after, encoding, [(start_line_index, end_line_index+1, new_lines_list)])
+        st.warning(des_html_path)
+        with timing.span("winmerge"):
+            winmerge_util.run_winmerge(des_path, des_path_after, des_html_path)
+    else:
+        st.error("Nothing to fix")
+        result.status = STATUS_NOTHING_TO_FIX
+        if sheet_name != "db2SQL":
+            open(nothing_to_fix_file_path, "w").close()
+            copy_store.remove_link(des_path)  # may be a linked original created by "Initialize Daily Items"
+            os.remove(des_path_after)
+            os.remove(des_html_path)
+    st.success(f"Finished No.{item_no}: Lines {start_line}, Encoding: {encoding}")
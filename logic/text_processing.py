@@ -1,8 +1,10 @@
 import re
-from typing import List, Tuple
+from typing import Dict, List, Tuple
+
+WORD_PATTERN = re.compile(r'[\u3040-\u30ff\u4e00-\u9fff\w:]+', re.UNICODE)
 
 def extract_japanese_alphanum(text: str) -> List[str]:
-    return re.findall(r'[\u3040-\u30ff\u4e00-\u9fff\w:]+', text, re.UNICODE)
+    return WORD_PATTERN.findall(text)
 
 
 def remove_comments(text: str) -> str:
@@ -27,51 +29,102 @@ def remove_system_out_print(text: str) -> str:
     pattern = r'System\.out\.(print|println|printf)\s*\((?:[^)(]*|\([^)(]*\))*?\)\s*;'
     return re.sub(pattern, '', text, flags=re.DOTALL)
 
+SQL_CONDITION_PATTERNS = [
+    r"\s*=\s*",          # equals
+    r"\s*!=\s*",         # not equal (ANSI)
+    r"<>",               # not equal (SQL standard)
+    r"\s*>=\s*",         # greater or equal
+    r"\s*<=\s*",         # less or equal
+    r"\s*>\s*",          # greater
+    r"\s*<\s*",          # less
+    r"\bIN\b",           # IN (...)
+    r"\bNOT\s+IN\b",     # NOT IN (...)
+    r"\bLIKE\b",         # LIKE
+    r"\bNOT\s+LIKE\b",   # NOT LIKE
+    r"\bBETWEEN\b",      # BETWEEN
+    r"\bIS\s+NULL\b",    # IS NULL
+    r"\bIS\s+NOT\s+NULL\b",  # IS NOT NULL
+    r"\bEXISTS\b",       # EXISTS
+    r"\bANY\b",          # = ANY(...)
+    r"\bALL\b",          # = ALL(...)
+    r"\bCASE\b",         # CASE ... WHEN ... THEN ... END
+    r"\bWHEN\b"          # CASE A.COLUMN WHEN THEN ... END
+]
+SQL_CONDITION_PATTERN = re.compile("|".join(SQL_CONDITION_PATTERNS), re.IGNORECASE)
+
 def has_sql_condition(sql_line: str) -> bool:
     """
     Detect if a SQL line contains common condition operators.
     Covers comparison, range, null checks, pattern matching, set membership.
     """
-    condition_patterns = [
-        r"\s*=\s*",          # equals
-        r"\s*!=\s*",         # not equal (ANSI)
-        r"<>",               # not equal (SQL standard)
-        r"\s*>=\s*",         # greater or equal
-        r"\s*<=\s*",         # less or equal
-        r"\s*>\s*",          # greater
-        r"\s*<\s*",          # less
-        r"\bIN\b",           # IN (...)
-        r"\bNOT\s+IN\b",     # NOT IN (...)
-        r"\bLIKE\b",         # LIKE
-        r"\bNOT\s+LIKE\b",   # NOT LIKE
-        r"\bBETWEEN\b",      # BETWEEN
-        r"\bIS\s+NULL\b",    # IS NULL
-        r"\bIS\s+NOT\s+NULL\b",  # IS NOT NULL
-        r"\bEXISTS\b",       # EXISTS
-        r"\bANY\b",          # = ANY(...)
-        r"\bALL\b",          # = ALL(...)
-        r"\bCASE\b",         # CASE ... WHEN ... THEN ... END
-        r"\bWHEN\b"          # CASE A.COLUMN WHEN THEN ... END
-    ]
-
-    pattern = "|".join(condition_patterns)
-    return re.search(pattern, sql_line, re.IGNORECASE) is not None
+    return SQL_CONDITION_PATTERN.search(sql_line) is not None
 
-def extract_full_keys(text: str, valid_columns: set, encoding: str) -> Tuple[List[str], List[str]]:
-    used_keys = []
-    unused_keys = []
-    text = remove_comments(text)
-    text = remove_system_out_print(text)
-    for line in text.splitlines():
-        for word in extract_japanese_alphanum(line):
+class KeyExtractor:
+    """
+    Splits a code block into identifiers and sorts them into used keys (known by the evidence)
+    and unused keys (multi-byte words unknown by the evidence). Build once per evidence version.
+    """
+
+    def __init__(self, valid_columns: set):
+        self.valid_columns = valid_columns
+        self._multibyte_cache: Dict[Tuple[str, str], bool] = {}  # (word, encoding) -> encoded length differs
+        self._ascii_compatible: Dict[str, bool] = {}
+
+    def is_multibyte_word(self, word: str, encoding: str) -> bool:
+        ascii_compatible = self._ascii_compatible.get(encoding)
+        if ascii_compatible is None:
+            ascii_compatible = self._ascii_compatible[encoding] = len("A".encode(encoding)) == 1
+        if ascii_compatible and word.isascii():
+            return False
+        key = (word, encoding)
+        result = self._multibyte_cache.get(key)
+        if result is None:
+            result = len(word.encode("utf-8")) != len(word.encode(encoding))
+            self._multibyte_cache[key] = result
+        return result
+
+    def extract(self, text: str, encoding: str) -> Tuple[List[str], List[str]]:
+        used_keys = {}  # dict keeps insertion order
+        unused_keys = {}
+        valid_columns = self.valid_columns
+        text = remove_comments(text)
+        text = remove_system_out_print(text)
+        # words never span lines, so one pass over the whole block gives the same order as line by line
+        for word in WORD_PATTERN.findall(text):
             word_upper = word.upper()
             if word_upper in valid_columns:
-                if  word_upper not in used_keys:
-                    used_keys.append(word_upper)
-            else:
-                if len(word_upper.encode("utf-8")) != len(word_upper.encode(encoding)) and word_upper not in unused_keys:
-                    unused_keys.append(word_upper)
-    return (used_keys, unused_keys)
+                used_keys[word_upper] = None
+            elif word_upper not in unused_keys and self.is_multibyte_word(word_upper, encoding):
+                unused_keys[word_upper] = None
+        return (list(used_keys), list(unused_keys))
+
+
+def extract_full_keys(text: str, valid_columns: set, encoding: str) -> Tuple[List[str], List[str]]:
+    return KeyExtractor(valid_columns).extract(text, encoding)
+
+SYSTEM_OUT_LINE_PATTERN = re.compile(r'^\s*System\.out\.(print|println|printf)\s*\(')
+IDENTIFIER_RUN_PATTERN = re.compile(r'\w+')
+
+def substitute_words(code: str, replacements: Dict[str, Tuple[str, str]]) -> str:
+    """
+    Replace whole words (case-insensitive) in one pass over the code.
+    replacements: WORD (upper) -> (word, replacement).
+    A word made of word characters only can only match a complete run of word characters,
+    so one lookup per run gives the same result as one regex substitution per word.
+    Words with other characters (e.g. ':') fall back to the regex substitution.
+    """
+    run_replacements = {}
+    other_words = []
+    for key, (word, replacement) in replacements.items():
+        if IDENTIFIER_RUN_PATTERN.fullmatch(word):
+            run_replacements[key] = replacement
+        else:
+            other_words.append((word, replacement))
+    if run_replacements:
+        code = IDENTIFIER_RUN_PATTERN.sub(lambda m: run_replacements.get(m.group().upper(), m.group()), code)
+    for word, replacement in other_words:
+        code = re.sub(rf'\b{re.escape(word)}\b', lambda m: replacement, code, flags=re.IGNORECASE)
+    return code
 
 def replace_by_mapping(lines: List[str],  line_indexes: List[int], mapping: dict, new_col_name_to_table_and_data_type_dict: dict[str, Tuple], column_set: set) -> Tuple[List[str], List[str]]:
     output_lines = []
@@ -99,21 +152,22 @@ def replace_by_mapping(lines: List[str],  line_indexes: List[int], mapping: dict
             output_lines.append(line)
             continue
         # Skip System.out.print-like lines
-        if re.match(r'^\s*System\.out\.(print|println|printf)\s*\(', original_line):
+        if SYSTEM_OUT_LINE_PATTERN.match(original_line):
             output_lines.append(line)
             continue
 
         # Split code and comment
         if '//' in line:
-            code_part, comment_part = re.split(r'//', line, maxsplit=1)
+            code_part, _, comment_part = line.partition('//')
             comment_part = '//' + comment_part  # keep the //
         # Then check for /* ... */ comments
         elif '/*' in line and '*/' in line:
-            code_part, comment_part = re.split(r'/\*', line, maxsplit=1)
+            code_part, _, comment_part = line.partition('/*')
             comment_part = '/*' + comment_part  # keep the opening /*
         else:
             code_part, comment_part = line, ''
         raw_line = code_part
+        line_replacements = {}  # WORD -> replacement, applied in one pass below
         # Replace by mapping
         for word in extract_japanese_alphanum(code_part):
             if pre_word == 'INSERT' and word.upper() == 'INTO':
@@ -139,10 +193,12 @@ def replace_by_mapping(lines: List[str],  line_indexes: List[int], mapping: dict
                     output_mul_mapping.append(f'{word} -> {list(replacements)}')
                 replacement = next(iter(replacements)) if len(replacements) == 1 else "\n".join(replacements)
                 if replacement.lower() != word.lower():
-                    raw_line = re.sub(rf'\b{re.escape(word)}\b', replacement, raw_line, flags=re.IGNORECASE)
+                    line_replacements[word.upper()] = (word, replacement)
             
             if insert_flag and word.upper() == 'VALUES':
                 insert_flag = False
+        if line_replacements:
+            raw_line = substitute_words(raw_line, line_replacements)
         # Reattach comment
         final_line = f"{raw_line}{comment_part}" if comment_part else raw_line
         if len(table_and_data_types) > 0 and (insert_flag or has_sql_condition(raw_line)):
@@ -0,0 +1,47 @@
+"""(table, column) -> data type index over the evidence type sheets of a set of system types."""
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+import pandas as pd
+
+TYPE_COLUMNS = ["table_name", "column_name", "data_type"]
+
+
+@dataclass(frozen=True)
+class TypeIndex:
+    frame: pd.DataFrame                                  # type rows of the system types, table/column names upper-cased
+    by_table: Dict[str, Tuple[Tuple[int, str], ...]]     # table -> ((row position, column), ...)
+
+    def rows(self, keys: set) -> List[int]:
+        """Row positions (frame order) whose table and column are both in keys."""
+        return sorted(
+            row
+            for table in keys if table in self.by_table
+            for row, column in self.by_table[table] if column in keys
+        )
+
+    def lookup(self, keys: set) -> List[Tuple[str, str, object]]:
+        """(table, column, data type) of the rows whose table and column are both in keys, in frame order."""
+        rows = self.rows(keys)
+        if not rows:
+            return []
+        found = self.frame.iloc[rows]
+        return list(zip(found["table_name"], found["column_name"], found["data_type"]))
+
+
+def build_type_index(type_tables: Dict[str, pd.DataFrame], system_types: Iterable[int]) -> TypeIndex:
+    frames = [
+        df
+        for name, df in type_tables.items()
+        for system_type in system_types
+        if name.startswith(f'type{system_type}')
+    ]
+    frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=TYPE_COLUMNS)
+    frame['table_name'] = frame['table_name'].str.upper()
+    frame['column_name'] = frame['column_name'].str.upper()
+
+    by_table: Dict[str, List[Tuple[int, str]]] = {}
+    for row, (table, column) in enumerate(zip(frame['table_name'].to_numpy(), frame['column_name'].to_numpy())):
+        if isinstance(table, str) and isinstance(column, str):
+            by_table.setdefault(table, []).append((row, column))
+    return TypeIndex(frame, {table: tuple(entries) for table, entries in by_table.items()})
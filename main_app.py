@@ -5,20 +5,27 @@ from config import *
 from logic import handler
 import pandas as pd
 import re
-import os
 import shutil
-from utils import winmerge_util
-from rules import detect_c_rules
+from rules import rule_set
 from utils import common_util
-import xlwings as xw
 from utils import file_utils
+from utils import excel_utils
+from utils import workspace_catalog
+from utils import copy_store
+from utils import timing
 from logic import merge_source
+from logic import batch
+from logic import batch_merge
+from logic import rule_inventory
+from logic import daily_items
+from logic import source_c
+from logic import jobs
+from utils import job_store
+from dataclasses import asdict
 from tools import validate_rule_tool
 import difflib
 from streamlit.components.v1 import html
 
-DEFAULT_SEPARATOR = "\x1f"
-
 def show_diff(lines, new_lines):
     # Generate side-by-side diff
     differ = difflib.HtmlDiff(wrapcolumn=80)
@@ -50,6 +57,51 @@ def show_diff(lines, new_lines):
 
 st.set_page_config(page_title="Code Checker", layout="wide")
 
+with st.sidebar:
+    # rules and evidence are shared by all sessions and reloaded when their files change
+    if st.button("Reload rules and evidence", key="btn_reload_shared"):
+        handler.invalidate_evidence()
+        rule_set.invalidate_rule_sets()
+        st.success("Rules and evidence will be read again.")
+
+# background jobs are shared by all sessions and keep running when the browser tab is closed
+jobs.start_runners()
+
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_jobs():
+    job_list = job_store.list_jobs(limit=10)
+    if not job_list:
+        st.caption("No background jobs.")
+        return
+    for job in job_list:
+        st.markdown(f"**#{job.id} {job.title}**  \n`{job.kind}` {job.status}")
+        st.progress(job.progress, text=jobs.describe(job))
+        if job.message:
+            st.caption(job.message)
+        if job.status in (job_store.STATUS_QUEUED, job_store.STATUS_RUNNING):
+            if st.button("Cancel", key=f"btn_cancel_job_{job.id}"):
+                job_store.request_cancel(job.id)
+        elif job.status in job_store.RESUMABLE_STATUSES:
+            if st.button("Resume", key=f"btn_resume_job_{job.id}"):
+                job_store.resume(job.id)
+    selected_job_id = st.selectbox("Items of job", [job.id for job in job_list], key="selected_job_id")
+    job_items = job_store.items(selected_job_id)
+    if job_items:
+        st.dataframe(pd.DataFrame([
+            {"item": item.item_key, "status": item.status, "seconds": round(item.elapsed, 2), "message": item.message} for item in job_items
+        ]))
+
+
+def submit_job(kind: str, title: str, params: dict):
+    job_id = jobs.submit(kind, title, params)
+    st.success(f"Queued background job #{job_id}. Progress is shown in the sidebar, the job keeps running if this tab is closed.")
+
+
+with st.sidebar:
+    st.markdown("### Background jobs")
+    show_jobs()
+
 # === UI INPUT ===
 tab_titles = [
     "Initialize Daily Items",
@@ -89,9 +141,10 @@ with tab1:
 
     txt_items = st.text_area("Input list (tab-separated: NO, FILE_PATH, FILE_NAME, START_LINE):", height=300, key="input_list_tab1")
 
-    btn_col1, = st.columns(1)
+    btn_col1, btn_col2 = st.columns(2)
     btn_init = btn_col1.button("Create daily items")
-    if btn_init:
+    btn_init_job = btn_col2.button("Create in background", key="btn_job_tab1")
+    if btn_init or btn_init_job:
         if not selected_excel_file_name:
             st.warning(" Please select excel file name")
         elif not selected_sheet_name:
@@ -105,57 +158,22 @@ with tab1:
             FULL_ITEM_ROOT_PATH = f'{source_configs.ROOT_OUTPUT_PATH}/{selected_excel_file_name}/{selected_sheet_name}'
             FULL_DAILY_FOLDER_PATH = f"{FULL_ITEM_ROOT_PATH}/{DAILY_FOLDER_STR}" if DAILY_FOLDER_STR else None
 
-            raw_lines = txt_items.strip().splitlines()
-            items = []
-            errors = []
-            for idx, line in enumerate(raw_lines, start=1):
-                parts = re.split(r'[\t]+', line.strip())
-                if len(parts) != 4:
-                    errors.append(f"Line {idx} is invalid: {line}")
-                    continue
-                items.append(parts)
+            items, errors = daily_items.parse_items(txt_items)
 
             if errors:
                 st.error("Some lines are invalid:")
                 st.code("\n".join(errors))
+            elif btn_init_job:
+                submit_job("create_items", f"Create {len(items)} items {selected_excel_file_name}/{selected_sheet_name}/{DAILY_FOLDER_STR}", {
+                    "source_type": SOURCE_TYPE, "excel_file_name": selected_excel_file_name, "sheet_name": selected_sheet_name,
+                    "daily_folder": DAILY_FOLDER_STR, "items": txt_items,
+                })
             else:
-                item_map = {a: (b, c, d) for a, b, c, d in items}
-                created_items = []
-
-                for item_id in item_map.keys():
-                    (src_label, full_file_name, _) = item_map.get(item_id)
-                    des_folder_name = f"{FULL_DAILY_FOLDER_PATH}/No.{item_id}"
-                    os.makedirs(des_folder_name, exist_ok=True)
-
-                    # Extract file info
-                    try:
-                        file_type = full_file_name.split('.')[-1]
-                        file_name = full_file_name.rsplit('.', 1)[0]
+                def show_create_error(item_id: str, created, error: str):
+                    if error:
+                        st.error(f"Failed to create item No.{item_id}: {error}")
 
-                        src_path = source_configs.ROOT_APP_PATH + "/" +''.join((src_label, full_file_name))[1:]  # remove leading character
-                        des_path = f'{des_folder_name}/{full_file_name}'
-                        des_path_after = f'{des_folder_name}/{file_name}_after.{file_type}'
-                        des_excel_path = f'{des_folder_name}/{EXCEL_FILE_NAME}'
-                        des_html_path = f'{des_folder_name}/{HTML_FILE_NAME}'
-                        des_evidence_path = f'{des_folder_name}/{OUTPUT_EVIDENCE_EXCEL_NAME}'
-
-                        # Copy template files
-                        shutil.copy(src_path, des_path)
-                        shutil.copy(src_path, des_path_after)
-                        os.chmod(des_path_after, 0o666)
-                        shutil.copy(TEMPLATE_EXCEL_PATH, des_excel_path)
-                        shutil.copy(TEMPLATE_HTML_PATH, des_html_path)
-                        shutil.copy(FULL_EVIDENCE_INPUT_PATH, des_evidence_path)
-
-                        created_items.append({
-                            "No": item_id,
-                            "Filename": full_file_name,
-                            "Src": src_path[-50:],
-                            "Dest": des_path
-                        })
-
-                    except Exception as e:
-                        st.error(f"Failed to create item No.{item_id}: {e}")
+                created_items = daily_items.create_items(source_configs, FULL_DAILY_FOLDER_PATH, items, on_result=show_create_error)
 
                 if created_items:
                     st.success(f"Created {len(created_items)} items successfully!")
@@ -192,6 +210,34 @@ with tab2:
         key="daily_folder_tab2"
     )
 
+    with st.expander("Rule inventory (scan the app folder for rule candidates)"):
+        col_inv_workers, col_inv_full, col_inv_rules = st.columns(3)
+        num_inv_workers2 = col_inv_workers.number_input("Worker processes", min_value=1, max_value=max(BATCH_MAX_WORKERS, 1), value=max(BATCH_MAX_WORKERS, 1), key="inventory_workers_tab2")
+        is_full_scan2 = col_inv_full.checkbox("Full rescan (ignore the manifest)", value=False, key="inventory_full_tab2")
+        inv_rules2 = col_inv_rules.text_input("Rule numbers (empty: all)", placeholder="Example: 22,28", key="inventory_rules_tab2")
+        btn_scan2 = st.button("Scan", key="btn_inventory_scan_tab2")
+
+        inventory2 = None
+        if btn_scan2:
+            progress2 = st.progress(0.0, text="Listing files...")
+            def show_scan_progress(done: int, total: int):
+                progress2.progress(done / total, text=f"Scanned {done}/{total} files")
+            inventory2, summary2 = rule_inventory.scan_inventory(
+                SOURCE_TYPE2, max_workers=int(num_inv_workers2), full=is_full_scan2, on_progress=show_scan_progress)
+            progress2.progress(1.0, text="Done")
+            st.success(f"{summary2.files} files: {summary2.scanned} scanned, {summary2.unchanged + summary2.reused} unchanged, "
+                       f"{summary2.removed} removed, {summary2.errors} errors ({summary2.elapsed:.1f}s)")
+        else:
+            inventory2 = rule_inventory.load_inventory(SOURCE_TYPE2)
+
+        if inventory2 is None:
+            st.info("No inventory yet, press Scan.")
+        else:
+            inv_rule_nos2 = [common_util.parse_int(n) for n in inv_rules2.split(",") if n.strip()] or None
+            st.caption(f"Inventory of {inventory2.root_path} ({inventory2.scanned_at})")
+            st.dataframe(pd.DataFrame(rule_inventory.rows(inventory2, inv_rule_nos2)))
+            st.code(rule_inventory.item_list(inventory2, inv_rule_nos2))
+
     txt_items2 = st.text_area(
         "Input list (tab-separated: NO, FILE_PATH, FILE_NAME, START_LINE, END_LINE,TABLE_NAMES[option],COLUMN_NAMES[option]):", 
         height=300, 
@@ -199,9 +245,23 @@ with tab2:
         key="input_list_tab2"
     )
 
-    btn_process = st.button("Process & Replace")
+    col_workers, col_export, col_backend, col_profile = st.columns(4)
+    num_workers2 = col_workers.number_input("Worker processes", min_value=1, max_value=max(BATCH_MAX_WORKERS, 1), value=1, key="num_workers_tab2")
+    is_export_excel2 = col_export.checkbox("Export evidence excel", value=True, key="export_excel_tab2")
+    excel_backend2 = col_backend.radio(
+        "Evidence backend",
+        excel_utils.EXCEL_BACKEND_OPTIONS,
+        index=common_util.get_index_from_list(excel_utils.EXCEL_BACKEND_OPTIONS, EXCEL_BACKEND),
+        horizontal=True,
+        key="excel_backend_tab2"
+    )
+    is_profile2 = col_profile.checkbox("Profile items (cProfile)", value=False, key="profile_tab2")
+
+    btn_col_process2, btn_col_job2 = st.columns(2)
+    btn_process = btn_col_process2.button("Process & Replace")
+    btn_process_job = btn_col_job2.button("Process in background", key="btn_job_tab2")
 
-    if btn_process:
+    if btn_process or btn_process_job:
         if sub_excel_file_name_to_sheet_type_map.get(selected_excel_file_name2, None) is None:
             st.warning("Please select valid excel file name")
         if not DAILY_FOLDER_STR2:
@@ -210,90 +270,52 @@ with tab2:
             st.warning("Please input item list.")
         else:
             st.info("SOURCE CODE: " + SOURCE_TYPE2.upper())
-            source_configs = get_configs_by_source_type(SOURCE_TYPE2)
-            active_rule_set = set(source_configs.RULE_CONFIGS.get(selected_sheet_name2.upper(), []))
-
-            FULL_ITEM_ROOT_PATH2 = f'{source_configs.ROOT_OUTPUT_PATH}/{selected_excel_file_name2}/{selected_sheet_name2}'
-            FULL_DAILY_FOLDER_PATH = f"{FULL_ITEM_ROOT_PATH2}/{DAILY_FOLDER_STR2}" if DAILY_FOLDER_STR2 else None
-
-            raw_lines = txt_items2.strip().splitlines()
-            item_data = []
-            errors = []
-            # Parse and validate lines
-            for idx, raw_line in enumerate(raw_lines, start=1):
-                line = raw_line.strip().replace('\t', ',')
-                parts = re.split(r'[,]+', line)
-                if len(parts) < 5:
-                    errors.append(f"Line {idx} invalid: {raw_line}")
-                    continue
-                try:
-                    item_no = parts[0]
-                    file_name = parts[2]
-                    codeBlockLines = []
-                    # parsing line ranges
-                    i = 3
-                    while i + 1 < len(parts):
-                        start_line = common_util.parse_int(parts[i])
-                        end_line =common_util.parse_int(parts[i + 1])
-                        if start_line == -1 or end_line == -1:
-                            break
-                        if start_line > end_line:
-                            errors.append(f"Line {idx} has invalid, start_line {start_line} > end_line {end_line}: {raw_line}")
-                            break
-
-                        codeBlockLines.append((start_line, end_line))
-                        i += 2
-                    if not codeBlockLines:
-                        errors.append(f"Line {idx} has no valid line ranges: {raw_line}")
-                        continue
-                    extra_tables = []
-                    for table_name in parts[i:]:
-                        extra_tables.append(str(table_name))
-                    item_data.append((item_no, file_name, codeBlockLines, extra_tables))
-                except ValueError:
-                    errors.append(f"Line {idx} has non-integer line numbers: {raw_line}")
+            items2, errors = batch.parse_items(txt_items2)
 
             if errors:
                 st.error("Some lines are invalid:")
                 st.code("\n".join(errors))
+            elif btn_process_job:
+                submit_job("auto_replace", f"Auto replace {len(items2)} items {selected_excel_file_name2}/{selected_sheet_name2}/{DAILY_FOLDER_STR2}", {
+                    "source_type": SOURCE_TYPE2, "excel_file_name": selected_excel_file_name2, "sheet_name": selected_sheet_name2,
+                    "daily_folder": DAILY_FOLDER_STR2, "items": txt_items2, "workers": int(num_workers2),
+                    "export_evidence": is_export_excel2, "excel_backend": excel_backend2, "profile": is_profile2,
+                })
             else:
-                if not FULL_DAILY_FOLDER_PATH:
-                    st.warning("Folder path not resolved")
+                job = batch.BatchJob(SOURCE_TYPE2, selected_excel_file_name2, selected_sheet_name2, DAILY_FOLDER_STR2,
+                                     export_evidence=is_export_excel2, excel_backend=excel_backend2, profile=is_profile2)
+                daily_files = workspace_catalog.get_catalog(job.daily_folder_path).files(get_configs_by_source_type(SOURCE_TYPE2).SUFFIXES)
+                if not daily_files:
+                    st.info("Folder path: " + job.daily_folder_path)
+                    st.warning("?No files found in the target folder. Did you create items?")
                 else:
-                    daily_files = file_utils.get_target_files(FULL_DAILY_FOLDER_PATH, source_configs.SUFFIXES)
-                    if not daily_files:
-                        st.info("Folder path: " + FULL_DAILY_FOLDER_PATH)
-                        st.warning("?No files found in the target folder. Did you create items?")
-                    else:
-
-                        item_data.sort(key=lambda x: int(x[0]))
-                        try:
-                            app = xw.App(visible=False)
-                            for item_no, file_name, codeBlockLines, extra_tables in item_data:
-                                st.markdown(f"### Start process for No.{item_no}")
-
-                                selected_files = common_util.get_files_by_no_and_name(daily_files, item_no, file_name)
-                                if not selected_files:
-                                    st.warning(f"File for No.{item_no} not found. Skipping.")
-                                    continue
-                                if len(selected_files) > 1:
-                                    st.warning(f"Multiple files found for No.{item_no}, using the first one: {selected_files}")
-                                selected_file = selected_files[0]
-                                st.code(f"File: {selected_file}")
-                                if True:
-                                    encoding = handler.get_encoded_file(selected_file)
-                                    if not encoding:
-                                        st.error(f"Encoding could not be detected for {selected_file}")
-                                        continue
-                                    system_types: List[int] = sub_excel_file_name_to_sheet_type_map.get(selected_excel_file_name2, [])
-                                    handler.replace_lines_in_file(app, selected_file,codeBlockLines, encoding, SOURCE_TYPE2, active_rule_set, system_types, extra_tables)
-                                    st.success(f"Finished No.{item_no}: Lines {start_line}-{end_line}, Encoding: {encoding}")
-                                # except Exception as e:
-                                #     st.error(f"Error processing No.{item_no}: {str(e)}")
-                        finally:
-                            if 'app' in locals():
-                                app.quit()
-                                del app
+                    def show_item_start(item: batch.BatchItem):
+                        st.markdown(f"### Start process for No.{item.item_no}")
+
+                    def show_item_result(result: batch.ItemResult):
+                        if result.status == batch.STATUS_SKIPPED:
+                            st.warning(result.message)
+                            return
+                        if result.message and result.status == batch.STATUS_OK:
+                            st.warning(result.message)
+                        st.code(f"File: {result.file_path}")
+                        if result.status == batch.STATUS_ERROR:
+                            st.error(f"Error processing No.{result.item_no}: {result.message}")
+                        else:
+                            st.success(f"Finished No.{result.item_no}: Lines {result.code_block_lines}, Encoding: {result.encoding}")
+                        with st.expander(f"Timing No.{result.item_no}: {result.elapsed:.2f}s"):
+                            st.dataframe(pd.DataFrame(timing.breakdown_rows(result.stages, result.elapsed)))
+                            if result.profile_path:
+                                st.info(f"Profile saved: {result.profile_path}")
+
+                    results = batch.run_batch(
+                        job,
+                        items2,
+                        max_workers=int(num_workers2),
+                        on_start=show_item_start if num_workers2 <= 1 else None,
+                        on_result=show_item_result,
+                    )
+                    st.dataframe(pd.DataFrame([asdict(r) for r in results]))
 
 
 # === DELETE UNUSED FILES ===
@@ -406,9 +428,15 @@ with tab4:
         key="input_list_tab4"
     )
 
-    btn_merge = st.button("Merge sources")
+    col_batch4, col_threads4 = st.columns(2)
+    is_batch_merge4 = col_batch4.checkbox("Batch merge (parallel, skip items already merged)", value=True, key="batch_merge_tab4")
+    num_threads4 = col_threads4.number_input("Threads", min_value=1, max_value=64, value=MERGE_MAX_WORKERS, key="num_threads_tab4")
 
-    if btn_merge:
+    btn_col_merge4, btn_col_job4 = st.columns(2)
+    btn_merge = btn_col_merge4.button("Merge sources")
+    btn_merge_job = btn_col_job4.button("Merge in background (batch merge)", key="btn_job_tab4")
+
+    if btn_merge or btn_merge_job:
         st.info("source_type: " + SOURCE_TYPE4)
         source_configs = get_configs_by_source_type(SOURCE_TYPE4)
 
@@ -424,54 +452,48 @@ with tab4:
             FULL_ITEM_ROOT_PATH4 = f'{source_configs.ROOT_OUTPUT_PATH}/{selected_excel_file_name4}/{selected_sheet_name4}'
             FULL_DAILY_FOLDER_PATH4 = f"{FULL_ITEM_ROOT_PATH4}/{DAILY_FOLDER_STR4}" if DAILY_FOLDER_STR4 else None
 
-            raw_lines = txt_items4.strip().splitlines()
-            item_data = []
-            errors = []
-
-            # Parse and validate lines
-            for idx, raw_line in enumerate(raw_lines, start=1):
-                # line = raw_line.strip().replace('\t', ',')
-                parts = re.split(r'[\t]+', raw_line)
-                if len(parts) < 3:
-                    errors.append(f"Line {idx} invalid: {raw_line}")
-                    continue
-                try:
-                    item_no = parts[0]
-                    file_path = parts[1]
-                    file_name = parts[2]
-                    item_data.append((item_no, file_path, file_name))
-                except ValueError:
-                    errors.append(f"Line {idx} has non-integer line numbers: {raw_line}")
+            item_data, errors = batch_merge.parse_items(txt_items4)
 
             if errors:
                 st.error("Some lines are invalid:")
                 st.code("\n".join(errors))
+            elif btn_merge_job:
+                submit_job("merge", f"Merge {len(item_data)} items {selected_excel_file_name4}/{selected_sheet_name4}/{DAILY_FOLDER_STR4}", {
+                    "source_type": SOURCE_TYPE4, "excel_file_name": selected_excel_file_name4, "sheet_name": selected_sheet_name4,
+                    "daily_folder": DAILY_FOLDER_STR4, "items": txt_items4, "workers": int(num_threads4),
+                })
             else:
                 if not FULL_DAILY_FOLDER_PATH4:
                     st.warning("Folder path not resolved")
                 else:
-                    daily_files = file_utils.get_target_files(FULL_DAILY_FOLDER_PATH4, source_configs.SUFFIXES)
-                    if not daily_files:
+                    catalog4 = workspace_catalog.get_catalog(FULL_DAILY_FOLDER_PATH4)
+                    if not catalog4.files(source_configs.SUFFIXES):
                         st.warning("?No files found in the target folder. Did you create items?")
+                    elif is_batch_merge4:
+                        merge_tasks, merge_results = batch_merge.plan_merge(item_data, catalog4, source_configs.SUFFIXES, source_configs.SVN_ROOT_PATH)
+                        for merge_result in merge_results:
+                            st.warning(merge_result.message)
+
+                        def show_merge_result(result: batch_merge.MergeResult):
+                            if result.status == batch_merge.STATUS_ERROR:
+                                st.error(f"Error processing No.{result.item_no}: {result.message}")
+                            elif result.status == batch_merge.STATUS_SKIPPED:
+                                st.info(f"No.{result.item_no}: {result.message}")
+                            else:
+                                st.code(f"Change code:{result.encoding}\n\n {result.change_code}")
+                                st.success(f"Merge source for No.{result.item_no} completed successfully")
+
+                        merge_results += batch_merge.run_merge(merge_tasks, max_workers=int(num_threads4), on_result=show_merge_result)
+                        merge_results.sort(key=lambda x: int(x.item_no))
+                        st.dataframe(pd.DataFrame([asdict(r) for r in merge_results]).drop(columns=["change_code"]))
+                        st.success(f"Total merged files: {sum(r.status == batch_merge.STATUS_MERGED for r in merge_results)}")
                     else:
-                        no_to_paths = {}
-                        for f in daily_files:
-                            no = None
-                            if re.search(r'No\.(\d+)', f):
-                                no = re.search(r'No\.(\d+)', f).group(1)
-                            if no:
-                                if no not in no_to_paths:
-                                    no_to_paths[no] = []
-                                paths: List = no_to_paths.get(no)
-                                paths.append(f)
-                                no_to_paths[no] = paths
-
                         item_data.sort(key=lambda x: int(x[0]))
 
                         count = 0
                         for item_no, file_path, file_name in item_data:
                             st.markdown(f"### Start merge source for No.{item_no}")
-                            change_path_files = no_to_paths.get(item_no, None)
+                            change_path_files = catalog4.item_files(item_no, source_configs.SUFFIXES)
                             if not change_path_files:
                                 st.warning(f"File for No.{item_no} not found. Skipping.")
                                 continue
@@ -582,6 +604,12 @@ with tab6:
         pass
 
     is_export_excel = col2.checkbox("Export evidence excel", value=False, key="export_excel_tab6")
+    excel_backend6 = col3.radio(
+        "Evidence backend",
+        excel_utils.EXCEL_BACKEND_OPTIONS,
+        index=common_util.get_index_from_list(excel_utils.EXCEL_BACKEND_OPTIONS, EXCEL_BACKEND),
+        key="excel_backend_tab6"
+    )
     if col2.button("Export full Code"):
         if sub_excel_file_name_to_sheet_type_map.get(selected_excel_file_name, None) is None:
             st.warning("Please select valid excel file name")
@@ -593,7 +621,7 @@ with tab6:
                 app = None
                 if is_export_excel:
                     shutil.copy(FULL_EVIDENCE_INPUT_PATH, evidence_excel_path)
-                    app = xw.App(visible=False)
+                    app = excel_utils.create_excel_app(excel_backend6)
                 extra_tables = common_util.convert_and_upper_str_to_list(txt_tables)
                 code_by_line = code_input.splitlines()
                 lines = [line if line.startswith("\n") else f"{line}\n" for line in code_by_line]
@@ -641,10 +669,12 @@ with tab7:
 
     txt_items = st.text_area("Input list (tab-separated: NO, FILE_PATH, FILE_NAME, START_LINE):", height=300, key="input_list_tab7")
 
-    btn_col1, = st.columns(1)
+    btn_col1, btn_col2, btn_col3 = st.columns(3)
     btn_init = btn_col1.button("Run", key="btn_init_tab7")
+    btn_init_job = btn_col2.button("Run in background", key="btn_job_tab7")
+    is_profile7 = btn_col3.checkbox("Profile items (cProfile)", value=False, key="profile_tab7")
 
-    if btn_init:
+    if btn_init or btn_init_job:
         if not DAILY_FOLDER_STR:
             st.warning(" Please input daily folder name")
         elif not txt_items.strip():
@@ -654,143 +684,33 @@ with tab7:
             FULL_ITEM_ROOT_PATH = f'{source_configs.ROOT_OUTPUT_PATH}/{selected_excel_file_name7}/{selected_sheet_name}'
             FULL_DAILY_FOLDER_PATH = f"{FULL_ITEM_ROOT_PATH}/{DAILY_FOLDER_STR}" if DAILY_FOLDER_STR else None
 
-            raw_lines = txt_items.strip().splitlines()
-            items = []
-            errors = []
-            for idx, line in enumerate(raw_lines, start=1):
-                parts = re.split(r'[\t]+', line.strip())
-                if len(parts) != 4:
-                    errors.append(f"Line {idx} is invalid: {line}")
-                    continue
-                items.append(parts)
+            items, errors = daily_items.parse_items(txt_items)
 
             if errors:
                 st.error("Some lines are invalid:")
                 st.code("\n".join(errors))
+            elif btn_init_job:
+                submit_job("source_c", f"Source C {len(items)} items {selected_excel_file_name7}/{selected_sheet_name}/{DAILY_FOLDER_STR}", {
+                    "excel_file_name": selected_excel_file_name7, "sheet_name": selected_sheet_name,
+                    "daily_folder": DAILY_FOLDER_STR, "items": txt_items, "profile": is_profile7,
+                })
             else:
                 item_map = {int(item_no): (src_label, full_file_name, data_line) for item_no, src_label, full_file_name, data_line in items}
-                created_items = []
+                store7 = copy_store.get_store(source_configs.ROOT_OUTPUT_PATH)
+                results7 = []
 
                 for item_no in sorted(item_map.keys()):
                     src_label, full_file_name, data_line = item_map.get(item_no)
-                    des_folder_name = f"{FULL_DAILY_FOLDER_PATH}/No.{item_no}"
-                    os.makedirs(des_folder_name, exist_ok=True)
-
-                    # Extract file info
-                    try:
-                        file_type = full_file_name.split('.')[-1]
-                        file_name = full_file_name.rsplit('.', 1)[0]
-                        svn_path = source_configs.SVN_ROOT_PATH + "/" +''.join((src_label, full_file_name))[1:]  # remove leading character
-                        src_path = source_configs.ROOT_APP_PATH + "/" +''.join((src_label, full_file_name))[1:]  # remove leading character
-                        des_path = f'{des_folder_name}/{full_file_name}'
-                        des_path_after = f'{des_folder_name}/{file_name}_after.{file_type}'
-                        des_excel_path = f'{des_folder_name}/{EXCEL_FILE_NAME}'
-                        des_html_path = f'{des_folder_name}/{HTML_FILE_NAME}'
-                        des_evidence_path = f'{des_folder_name}/{OUTPUT_EVIDENCE_EXCEL_NAME}'
-                        nothing_to_fix_file_path = f"{des_folder_name}/{NOTHING_TO_FIX_FILE_NAME}"
-
-                        st.markdown(f"## Start process for No.{item_no}")
-                        # Copy template files
-                        if os.path.exists(des_path):
-                            st.warning(f"File already exists, skipping copy: {des_path}")
-                        else:
-                            shutil.copy(src_path, des_path)
-                            os.chmod(des_path, 0o666)
-
-                        if os.path.exists(des_path_after):
-                            os.remove(des_path_after)
-                            st.warning(f"File already exists, removed old file: {des_path_after}")
-                        
-                        shutil.copy(src_path, des_path_after)
-
-                        os.chmod(des_path_after, 0o666)
-                        # shutil.copy(TEMPLATE_EXCEL_PATH, des_excel_path)
-                        shutil.copy(TEMPLATE_HTML_PATH, des_html_path)
-                        os.chmod(des_html_path, 0o666)
-                        # shutil.copy(FULL_EVIDENCE_INPUT_PATH, des_evidence_path)
-                        
-                        # Process it
-                        st.code(f"File: {des_path_after}")
-                        encoding = handler.get_encoded_file(des_path_after)
-                        if not encoding:
-                            st.error(f"Encoding could not be detected for {des_path_after}")
-                            continue
-                        lines = None
-                        with open(des_path_after, 'r', encoding=encoding, newline="") as f:
-                            lines = f.readlines()
-                        if not lines:
-                            st.error(f"No lines read from {des_path_after}")
-                            continue
-                        
-                        start_line = data_line.split(",")[0].strip()
-                        end_line = data_line.split(",")[1].strip() if len(data_line.split(",")) > 1 else start_line
-                        start_line_index = common_util.parse_int(start_line) - 1
-                        end_line_index = common_util.parse_int(end_line) -  1
-                        if start_line_index == -1 or start_line_index < 0 or start_line_index > len(lines):
-                            st.error(f"Invalid start line {start_line} for file with {len(lines)} lines.")
-                            continue
-                        if end_line_index == -1 or start_line_index < 0 or start_line_index > len(lines) and end_line_index < start_line_index:
-                            st.error(f"Invalid end line {end_line} for file with {len(lines)} lines.")
-                            continue
-                        
-                        if selected_sheet_name == "db2SQL":
-                            with open(svn_path, 'r', encoding=encoding, newline="") as f:
-                                svn_lines = f.readlines()
-                            if not svn_lines:
-                                st.error(f"No lines read from {svn_path}")
-                                continue
-
-                            # copy from start_line to end_line
-                            for i in range(start_line_index, end_line_index+1):
-                                lines[i] = svn_lines[i]
-
-                        query_line =  DEFAULT_SEPARATOR.join(lines[start_line_index:end_line_index+1])
-                        if not query_line:
-                            st.error(f"No lines to process from line {start_line} onwards. value: {query_line}")
-                            continue
-                        
-                        new_lines, matched_rules = detect_c_rules.detect_and_apply_rules(
-                            query_line, 
-                            SOURCE_TYPE7,
-                            set(source_configs.RULE_CONFIGS.get(selected_sheet_name, []))
-                        )
-
-                        st.markdown("### Check rules")
-                        if len(matched_rules) == 0 :
-                            st.success("No rules matched")
-                        old_rule = None
-                        for rule in matched_rules:
-                            if old_rule != rule["rule_no"]:
-                                st.markdown(f"##### Rule {rule['rule_no']}:")
-                                old_rule = rule["rule_no"]
-                            st.warning(f"{rule['detect_value']} -> {rule['replace_value']}")
-                        
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.markdown("##### Original line")
-                            st.code(query_line.replace(DEFAULT_SEPARATOR, ""))
-                        with col2:
-                            st.markdown("##### Processed line")
-                            if new_lines:
-                                st.code(new_lines.replace(DEFAULT_SEPARATOR, ""))
-                        
-                        if query_line != new_lines:
-                            new_lines_list = new_lines.split(DEFAULT_SEPARATOR)
-                            lines[start_line_index:end_line_index+1] = new_lines_list
-                            with open(des_path_after, 'w', encoding=encoding, newline="") as f:
-                                f.writelines(lines)
-                            st.warning(des_html_path)
-                            winmerge_util.run_winmerge(des_path, des_path_after, des_html_path)
-                        else:
-                            st.error("Nothing to fix")
-                            if selected_sheet_name != "db2SQL":
-                                open(nothing_to_fix_file_path, "w").close()
-                                os.remove(des_path)
-                                os.remove(des_path_after)
-                                os.remove(des_html_path)
-                        st.success(f"Finished No.{item_no}: Lines {start_line}, Encoding: {encoding}")
-                    except Exception as e:
-                        st.error(f"Failed to create item No.{item_no}: {e}")
+                    results7.append(source_c.process_item(source_configs, FULL_DAILY_FOLDER_PATH, selected_sheet_name, item_no, src_label,
+                                                          full_file_name, data_line, store7, profile=is_profile7))
+
+                if results7:
+                    st.markdown("### Timing")
+                    for result7 in results7:
+                        with st.expander(f"No.{result7.item_no}: {result7.elapsed:.2f}s"):
+                            st.dataframe(pd.DataFrame(timing.breakdown_rows(result7.stages, result7.elapsed)))
+                            if result7.profile_path:
+                                st.info(f"Profile saved: {result7.profile_path}")
                     
 with tab8:
     SOURCE_TYPE8 = st.radio("Source Type", SOURCE_TYPE_OPTIONS ,  index= 1,horizontal=True, key="source_type_tab8")
@@ -836,7 +756,7 @@ with tab8:
                         st.write(str(svn_path))
                         encoding = handler.get_encoded_file(svn_path)
                         if not encoding:
-                            st.error(f"Encoding could not be detected for {des_path_after}")
+                            st.error(f"Encoding could not be detected for {svn_path}")
                             continue
 
                         src_content = None
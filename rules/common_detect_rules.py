@@ -1,21 +1,52 @@
 import json
-from typing import List
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
 from config import RULES_ROOT_PATH, C_RULES_ROOT_PATH
 from pathlib import Path
 import streamlit as st
 
 
-@st.cache_data()
-def load_all_rules(source_type: str):
-    rules = []
+# Rules of each source type, shared read-only by the whole process: (rule files fingerprint, rules)
+_rules: Dict[str, Tuple[tuple, Tuple[Mapping, ...]]] = {}
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _files_fingerprint(files: List[Path]) -> tuple:
+    fingerprint = []
+    for file in files:
+        stat = file.stat()
+        fingerprint.append((str(file), stat.st_size, stat.st_mtime_ns))
+    return tuple(fingerprint)
+
+
+def rules_path_of(source_type: str) -> Path:
     if source_type.lower() == 'c':
-        rules_path = Path(C_RULES_ROOT_PATH)
+        return Path(C_RULES_ROOT_PATH)
     elif source_type.lower() == 'java':
-        rules_path = Path(RULES_ROOT_PATH)
-    else:
-        raise ValueError(f"value source_type: {source_type}, source_type must be either 'java' or 'c'")
+        return Path(RULES_ROOT_PATH)
+    raise ValueError(f"value source_type: {source_type}, source_type must be either 'java' or 'c'")
 
-    for json_file in rules_path.glob("*.json"):
+
+def load_all_rules(source_type: str) -> Tuple[Mapping, ...]:
+    """Rules of the source type sorted by rule_no, read-only and shared by all callers.
+
+    The rule files are read again when one of them is added, removed or changed (size or mtime).
+    """
+    json_files = list(rules_path_of(source_type).glob("*.json"))
+    fingerprint = _files_fingerprint(json_files)
+    cached = _rules.get(source_type.lower())
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    rules = []
+    for json_file in json_files:
         with open(json_file, "r", encoding="utf-8") as f:
             try:
                 data = json.load(f)
@@ -28,7 +59,17 @@ def load_all_rules(source_type: str):
     
     # sort by rule_no
     rules.sort( key= lambda r: r.get('rule_no', 0))
-    return rules
+    frozen = tuple(_freeze(rule) for rule in rules)
+    _rules[source_type.lower()] = (fingerprint, frozen)
+    return frozen
+
+
+def invalidate_rules(source_type: Optional[str] = None):
+    """Forget the loaded rules (of one source type), the next load_all_rules reads the files again."""
+    if source_type is None:
+        _rules.clear()
+    else:
+        _rules.pop(source_type.lower(), None)
 
 def get_type_mapping(data_type: str, query: str, default_value: str="") -> str:
     if '?' in query:
@@ -326,7 +326,8 @@ def replace_log_output_old(line: str) -> str:
 
 def transform_line_for_rule22(line: str) -> str:
     """
-    Apply all transformations (define + conditions).
+    Apply all transformations (define + conditions) to one line.
+    rule22_engine.transform_text applies them to whole texts with a lexer.
     """
     line = replace_defines(line)
     line = replace_conditions(line)
@@ -1,6 +1,8 @@
 import re
 from typing import List
 
+from rules.rule_set import CompiledRule
+
 options_map = {
     "OF DEL": "DELIMITER ','",
     "OF WSF": "DELIMITER E'\\t'",
@@ -49,15 +51,15 @@ def format_log_redirection(existing_redir: str) -> str:
     return f'>> "{logfile}"{rest}'
 
 
-def transform_line_for_rule28(command: str, rules: List[dict]) -> str:
+def transform_line_for_rule28(command: str, rules: List[CompiledRule]) -> str:
     for r in rules:
-        if "pattern_detect" not in r:
+        if r.template_pattern is None:
             continue
-        m = re.search(r["pattern_detect"], command, flags=re.IGNORECASE | re.DOTALL)
+        m = r.template_pattern.search(command)
         if not m:
             continue
 
-        template = r.get("replace_template")
+        template = r.template
 
         # ==== EXPORT ====
         if template == "psql_block":
@@ -86,7 +88,7 @@ def transform_line_for_rule28(command: str, rules: List[dict]) -> str:
             )
         
         elif template == "psql_block_short":
-            pattern = re.compile(r["pattern_detect"], flags=re.IGNORECASE)
+            pattern = r.apply_pattern
 
             def repl(m):
                 outputfile, of_type, select_sql = m.groups()
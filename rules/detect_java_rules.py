@@ -1,30 +1,29 @@
-import re
 from typing import List
 from logic import text_processing
+from rules.rule_set import RuleSet
+from utils import timing
 
 
-def detect_rules(lines: List[str], rules, active_rule_set: set):
-    raw_query = ''.join(lines)
-    querySQL = text_processing.extract_sql_fragments(raw_query)
-    query_text = text_processing.extract_query_text(querySQL)
-    aliasSet = text_processing.find_aliases(query_text)
+def detect_rules(lines: List[str], rule_set: RuleSet):
+    with timing.span("prepare"):
+        raw_query = ''.join(lines)
+        querySQL = text_processing.extract_sql_fragments(raw_query)
+        query_text = text_processing.extract_query_text(querySQL)
+        aliasSet = text_processing.find_aliases(query_text)
 
+    with timing.span("scan"):
+        detected = rule_set.scan(querySQL)
     matched_rules = []
-    for rule in rules:
-        rule_no = rule["rule_no"]
-        # Skip rule_no not in the list
-        if active_rule_set and rule_no not in active_rule_set:
-            continue
-        match rule_no:
+    for index, compiled in enumerate(rule_set):
+        rule = compiled.rule
+        match compiled.rule_no:
             case 5:
-                pattern = re.compile(rule["pattern_detect"], re.IGNORECASE | re.MULTILINE)
-                if pattern.search(querySQL) and len(aliasSet) > 0:
+                if index in detected and len(aliasSet) > 0:
                     matched_rules.append(rule)
             case 7:
                 if rule["detect_value"] in aliasSet:
                     matched_rules.append(rule)
             case _:
-                pattern = re.compile(rule["pattern_detect"], re.IGNORECASE | re.MULTILINE)
-                if pattern.search(querySQL):
+                if index in detected:
                     matched_rules.append(rule)
     return matched_rules, query_text, aliasSet
\ No newline at end of file
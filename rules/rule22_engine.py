@@ -0,0 +1,319 @@
+"""Rule 22 (SQLCODE -> SQLSTATE) over whole source texts, driven by a C lexer.
+
+One scan of the text finds the statements: the lines of the text, where a line break inside
+parentheses continues the statement (a log call written over several lines is one statement).
+Only statements containing SQLCODE are cut into tokens (comment, string, char, identifier,
+number, operator, blank, line break), and the rewrites of detect_c_rule22 are applied to them:
+
+    #define X_SQLCODE_Y -803          ->  #define X_SQLSTATE_Y   "23505"
+    SQLCODE == -803 / != SQL_REP_RECORD ->  SQLSTATE_CHECK(23505) / !SQLSTATE_CHECK(...)
+    LOG("SQLCODE=%d", SQLCODE)          ->  LOG("SQLSTATE=%s", SQLSTATE_GET())
+
+For a statement on one line the result is the one of detect_c_rule22.transform_line_for_rule22,
+except that the rewrites only apply to code tokens: text in comments and in strings other than
+the format string, and parts of longer identifiers, are left as they are, and a condition is
+rewritten even when a string or comment comes before it on the line.
+"""
+import re
+from typing import Iterator, List, Optional, Tuple
+
+from rules.detect_c_rule22 import code_map, find_format_specifiers
+
+MAX_STATEMENT_LINES = 32   # an unbalanced '(' does not swallow the rest of the file
+
+_COMMENT = r'//[^\r\n]*|/\*[\s\S]*?(?:\*/|\Z)'
+_STRING = r'"(?:\\[\s\S]|[^"\\\r\n])*"?'
+_CHAR = r"'(?:\\[\s\S]|[^'\\\r\n])*'?"
+_NEWLINE = r'\r\n?|\n'
+
+# statement scan: comments, literals and simple parentheses that close on the same line are skipped
+# as a whole, the other parentheses are seen; inside parentheses also line breaks and statement ends
+_SCAN = f'{_COMMENT}|{_STRING}|{_CHAR}|\\([^()"\'/;{{}}\\r\\n]*\\)|(?P<open>\\()|(?P<close>\\))'
+_SCAN_RE = re.compile(f'(?=[/"\'()])(?:{_SCAN})')  # the lookahead rejects the other positions fast
+_SCAN_OPEN_RE = re.compile(f'(?=[/"\'()\r\n;{{}}])(?:{_SCAN}|(?P<nl>{_NEWLINE})|(?P<end>[;{{}}]))')
+_NEWLINE_RE = re.compile(_NEWLINE)
+
+_TOKEN_RE = re.compile(
+    f'(?P<comment>{_COMMENT})|(?P<string>{_STRING})|(?P<char>{_CHAR})|(?P<nl>{_NEWLINE})'
+    r'|(?P<ws>[^\S\r\n]+)|(?P<ident>[^\W\d]\w*)|(?P<number>\d\w*)|(?P<op>[=!]=|.)'
+)
+_DEFINE_NAME_RE = re.compile(r'(\w+)_SQLCODE_(\w+)')
+
+_BLANK = ("ws", "nl")
+_CONDITION_MACROS = ("SQL_REP_RECORD", "WCOM_SQLCODE_NOT_UNUQUE")
+_INT_CONVERSIONS = set('diouxX')
+
+Token = Tuple[str, str]          # (kind, text)
+Edit = Tuple[int, int, str]      # replace tokens [start, stop) by text
+
+
+def _line_end(text: str, start: int, stop: int) -> int:
+    """Position after the first line break in text[start:stop], -1 if there is none."""
+    m = _NEWLINE_RE.search(text, start, stop)
+    return m.end() if m else -1
+
+
+def _last_line_start(text: str, start: int, stop: int) -> int:
+    """Position after the last line break in text[start:stop], -1 if there is none."""
+    at = max(text.rfind("\n", start, stop), text.rfind("\r", start, stop))
+    return at + 1 if at != -1 else -1
+
+
+def _statements(text: str) -> Iterator[Tuple[int, int]]:
+    """(start, stop) of the statements that contain SQLCODE."""
+    hit = text.find("SQLCODE")
+    start = pos = depth = lines = 0
+    while hit != -1:
+        m = (_SCAN_OPEN_RE if depth else _SCAN_RE).search(text, pos)
+        event_at = m.start() if m else len(text)
+        if depth == 0:
+            # code without parentheses up to the event: every line break ends a statement
+            if hit < pos:
+                end = _line_end(text, pos, event_at)
+            elif hit < event_at:
+                line_start = _last_line_start(text, pos, hit)
+                if line_start != -1:
+                    start = line_start
+                end = _line_end(text, hit, event_at)
+            else:
+                line_start = _last_line_start(text, pos, event_at)
+                if line_start != -1:
+                    start = line_start
+                end = -1
+            if end != -1:
+                yield start, end
+                start = pos = end
+                hit = text.find("SQLCODE", end)
+                continue
+        if m is None:
+            yield start, len(text)
+            return
+        pos = m.end()
+        kind = m.lastgroup
+        if kind == "open":
+            depth += 1
+        elif kind == "close":
+            if depth:
+                depth -= 1
+        elif kind == "end":
+            depth = 0
+        elif kind == "nl":
+            lines += 1
+            if lines >= MAX_STATEMENT_LINES:
+                depth = 0
+            if depth == 0:
+                lines = 0
+                if hit < pos:
+                    yield start, pos
+                    hit = text.find("SQLCODE", pos)
+                start = pos
+        if depth == 0:
+            lines = 0
+
+
+def tokenize(text: str) -> List[Token]:
+    return [(m.lastgroup, m.group()) for m in _TOKEN_RE.finditer(text)]
+
+
+def _next(tokens: List[Token], i: int) -> int:
+    """Index of the first non-blank token at or after i."""
+    while i < len(tokens) and tokens[i][0] in _BLANK:
+        i += 1
+    return i
+
+
+def _is(tokens: List[Token], i: int, kind: str, text: Optional[str] = None) -> bool:
+    return i < len(tokens) and tokens[i][0] == kind and (text is None or tokens[i][1] == text)
+
+
+def _is_cast(tokens: List[Token], i: int) -> bool:
+    """(int) directly written, as the regular expression \\(int\\) of the line rewrite."""
+    return _is(tokens, i, "op", "(") and _is(tokens, i + 1, "ident", "int") and _is(tokens, i + 2, "op", ")")
+
+
+def _define_edits(tokens: List[Token], used: List[bool]) -> List[Edit]:
+    edits = []
+    for i, (kind, text) in enumerate(tokens):
+        if kind != "op" or text != "#" or not _is(tokens, i + 1, "ident", "define"):
+            continue
+        name_at = _next(tokens, i + 2)
+        if name_at == i + 2 or not _is(tokens, name_at, "ident"):
+            continue
+        name = _DEFINE_NAME_RE.fullmatch(tokens[name_at][1])
+        code_at = _next(tokens, name_at + 1)
+        if name is None or code_at == name_at + 1:
+            continue
+        sign = ""
+        if _is(tokens, code_at, "op", "-"):
+            sign, code_at = "-", code_at + 1
+        if not _is(tokens, code_at, "number") or not tokens[code_at][1].isdigit():
+            continue
+        code = sign + tokens[code_at][1]
+        if code in code_map:
+            prefix = "".join(t for _, t in tokens[i:name_at])
+            edits.append((i, code_at + 1, f'{prefix}{name.group(1)}_SQLSTATE_{name.group(2)}   "{code_map[code]}"'))
+            used[i:code_at + 1] = [True] * (code_at + 1 - i)
+    return edits
+
+
+def _condition_edits(tokens: List[Token], used: List[bool]) -> List[Edit]:
+    edits = []
+    for i, (kind, text) in enumerate(tokens):
+        if kind != "ident" or text != "SQLCODE" or used[i]:
+            continue
+        op_at = _next(tokens, i + 1)
+        if not (_is(tokens, op_at, "op", "==") or _is(tokens, op_at, "op", "!=")):
+            continue
+        code_at = _next(tokens, op_at + 1)
+        if _is(tokens, code_at, "op", "-") and _is(tokens, code_at + 1, "number"):
+            code, end = "-" + tokens[code_at + 1][1], code_at + 2
+        elif _is(tokens, code_at, "number") or (_is(tokens, code_at, "ident") and tokens[code_at][1] in _CONDITION_MACROS):
+            code, end = tokens[code_at][1], code_at + 1
+        else:
+            continue
+        if code not in code_map:
+            continue
+        quote = '"' if code.strip().isnumeric() else ''
+        check = f'SQLSTATE_CHECK({quote}{code_map[code]}{quote})'
+        edits.append((i, end, check if tokens[op_at][1] == "==" else "!" + check))
+        used[i:end] = [True] * (end - i)
+    return edits
+
+
+def _sqlcode_edits(tokens: List[Token], used: List[bool], start: int, stop: int) -> List[Edit]:
+    """SQLCODE -> SQLSTATE_GET() in tokens[start:stop]: the (int) casts when there are any, else every SQLCODE."""
+    casts, plain = [], []
+    for i in range(start, stop):
+        if tokens[i] != ("ident", "SQLCODE") or used[i]:
+            continue
+        cast_at = i - 1
+        while cast_at >= start and tokens[cast_at][0] in _BLANK:
+            cast_at -= 1
+        if cast_at - 2 >= start and _is_cast(tokens, cast_at - 2) and not any(used[cast_at - 2:i]):
+            casts.append((cast_at - 2, i + 1, "SQLSTATE_GET()"))
+        else:
+            plain.append((i, i + 1, "SQLSTATE_GET()"))
+    return casts or plain
+
+
+def _fallback_edits(tokens: List[Token], used: List[bool]) -> List[Edit]:
+    """No format string: replace the (int) casts of SQLCODE and SQLCODE written as an argument."""
+    edits = [edit for edit in _sqlcode_edits(tokens, used, 0, len(tokens)) if edit[1] - edit[0] > 1]
+    for start, stop, _ in edits:
+        used[start:stop] = [True] * (stop - start)
+    consumed_to = 0  # the argument matches of the regular expression do not overlap
+    for i, token in enumerate(tokens):
+        if token != ("ident", "SQLCODE") or used[i] or i - 1 < consumed_to:
+            continue
+        before = tokens[i - 1] if i else None
+        if before is None or not (before[0] in _BLANK or before in (("op", ","), ("op", "("))):
+            continue
+        after = _next(tokens, i + 1)
+        if _is(tokens, after, "op", ",") or _is(tokens, after, "op", ")"):
+            edits.append((i, i + 1, "SQLSTATE_GET()"))
+            consumed_to = after + 1
+    return edits
+
+
+def _log_output_edits(tokens: List[Token], used: List[bool]) -> List[Edit]:
+    if not any("SQLCODE" in text for (_, text), done in zip(tokens, used) if not done):
+        return []
+    first_string = next((i for i, (kind, _) in enumerate(tokens) if kind == "string"), None)
+    if first_string is None:
+        return _fallback_edits(tokens, used)
+    open_at = next((i for i in range(first_string - 1, -1, -1) if tokens[i] == ("op", "(")), None)
+    if open_at is None:
+        return _fallback_edits(tokens, used)
+
+    # arguments of the call, as token ranges
+    args = []
+    depth = 0
+    arg_start = open_at + 1
+    close_at = None
+    for i in range(open_at, len(tokens)):
+        kind, text = tokens[i]
+        if kind != "op":
+            continue
+        if text == "(":
+            depth += 1
+        elif text == ")":
+            depth -= 1
+            if depth == 0:
+                close_at = i
+                break
+        elif text == "," and depth == 1:
+            args.append((arg_start, i))
+            arg_start = i + 1
+    if close_at is None:
+        return []
+    if arg_start < close_at:
+        args.append((arg_start, close_at))
+
+    fmt_idx = None
+    for idx, (start, stop) in enumerate(args):
+        text = "".join(t for _, t in tokens[start:stop]).strip()
+        if len(text) >= 2 and text[0] == '"' and text[-1] == '"':
+            fmt_idx = idx
+            fmt_content = text[1:-1]
+            break
+    if fmt_idx is None:
+        return _fallback_edits(tokens, used)
+    fmt_content = fmt_content.replace("SQLCODE", "SQLSTATE")
+
+    edits = []
+    sqlcode_positions = []
+    for idx, (start, stop) in enumerate(args):
+        if idx == fmt_idx:
+            continue
+        arg_edits = _sqlcode_edits(tokens, used, start, stop)
+        if arg_edits:
+            edits.extend(arg_edits)
+            sqlcode_positions.append(idx)
+
+    if sqlcode_positions:
+        specs = find_format_specifiers(fmt_content)
+        for pos in sqlcode_positions:
+            spec_index = pos - (fmt_idx + 1)
+            if 0 <= spec_index < len(specs) and specs[spec_index][2] in _INT_CONVERSIONS:
+                conv_idx = specs[spec_index][1]
+                fmt_content = fmt_content[:conv_idx] + 's' + fmt_content[conv_idx + 1:]
+
+    start, stop = args[fmt_idx]
+    start = _next(tokens, start)
+    while tokens[stop - 1][0] in _BLANK:
+        stop -= 1
+    edits.append((start, stop, f'"{fmt_content}"'))
+    return edits
+
+
+def transform_statement(text: str) -> str:
+    """Rule 22 rewrites of one statement."""
+    tokens = tokenize(text)
+    used = [False] * len(tokens)
+    edits = _define_edits(tokens, used)
+    edits += _condition_edits(tokens, used)
+    edits += _log_output_edits(tokens, used)
+    if not edits:
+        return text
+    out = []
+    pos = 0
+    for start, stop, replacement in sorted(edits):
+        out.extend(t for _, t in tokens[pos:start])
+        out.append(replacement)
+        pos = stop
+    out.extend(t for _, t in tokens[pos:])
+    return "".join(out)
+
+
+def transform_text(text: str) -> str:
+    """Rule 22 rewrites of a whole source text (a file, a block of lines or one line)."""
+    if "SQLCODE" not in text:
+        return text
+    out = []
+    pos = 0
+    for start, stop in _statements(text):
+        out.append(text[pos:start])
+        out.append(transform_statement(text[start:stop]))
+        pos = stop
+    out.append(text[pos:])
+    return "".join(out)
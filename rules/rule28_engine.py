@@ -0,0 +1,276 @@
+"""Rule 28 (db2 EXPORT / IMPORT -> psql \\copy) over whole shell scripts.
+
+Rule28Engine is built once per rule set from the rule 28 entries: their template patterns are
+compiled by rule_set, the templates are looked up in TEMPLATES and the options of options_map are
+matched by one scanner. transform_text cuts a script into its commands in one pass (a line break
+inside quotes, backquotes or $( ) or after a backslash continues the command, here documents
+belong to their command) and converts every command that a rule 28 pattern matches. For one
+command the result is the one of detect_c_rule28.transform_line_for_rule28: the patterns are tried
+in rule order and the first one that matches is used.
+"""
+import re
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse, sre_constants
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from rules.detect_c_rule28 import options_map
+from rules.rule_set import CompiledRule, fold_text
+
+MAX_COMMAND_LINES = 200  # an unbalanced quote does not swallow the rest of the script
+
+_PSQL = 'PGPASSWORD="${ECOM_DB_PASSWD}" psql -U "${ECOM_DB_USERID}" -d "${ECOM_DB_NAME}"'
+_WHITESPACE_RE = re.compile(r"\s+")
+_REDIRECTION_RE = re.compile(r"\s*(\S+)(.*)", flags=re.IGNORECASE)
+
+# command scan: quoted text, comments and escapes are skipped as a whole, a quote without its
+# closing quote is an ordinary character
+_COMMAND_SCAN_RE = re.compile(
+    r"""(?=['"`\\#<$()\r\n])(?:(?P<quoted>'[^']*'|"(?:\\[\s\S]|[^"\\])*"|`(?:\\[\s\S]|[^`\\])*`)|\\[\s\S]|(?:(?<=[\s;|&(])|^)#[^\r\n]*"""
+    r"""|(?P<heredoc>(?<!<)<<-?[ \t]*(?P<quote>['"]?)(?P<delimiter>[A-Za-z_]\w*)(?P=quote))"""
+    r"""|(?P<open>\$\()|(?P<paren>\()|(?P<close>\))|(?P<nl>\r\n?|\n))""",
+    re.MULTILINE,
+)
+
+
+def _first_chars(patterns: Sequence[str]) -> str:
+    """Character class of the first characters of the patterns, "" when one does not start with a literal."""
+    chars = set()
+    for pattern in patterns:
+        try:
+            # the parse tree of the private sre parser can change between Python versions
+            op, av = list(sre_parse.parse(pattern, re.IGNORECASE))[0]
+            if op is not sre_constants.LITERAL:
+                return ""
+            c = chr(av)
+        except Exception:
+            return ""
+        chars.update((c.lower(), c.upper()))
+    return "[" + "".join(re.escape(c) for c in sorted(chars)) + "]" if chars else ""
+
+
+class OptionsMatcher:
+    """All options_map entries in one scanner, with the result of one re.search per entry."""
+
+    def __init__(self, options: Dict[str, str]):
+        self.options = list(options.items())
+        # every match of an entry starts at a position the scanner stops at
+        first = _first_chars([db2_opt for db2_opt, _ in self.options])
+        any_entry = "|".join(f"(?:{db2_opt})" for db2_opt, _ in self.options)
+        self.scanner = re.compile(f"(?={first})(?={any_entry})" if first else f"(?={any_entry})", re.IGNORECASE)
+        # at such a position, group i is set when entry i matches there
+        self.entries_at = re.compile("".join(f"(?:(?=({db2_opt})))?" for db2_opt, _ in self.options), re.IGNORECASE)
+        if self.entries_at.groups != len(self.options):  # an entry with its own groups
+            patterns = [re.compile(db2_opt, re.IGNORECASE) for db2_opt, _ in self.options]
+            self.entries_at = None
+            self._match_at = lambda text, pos: tuple(pattern.match(text, pos) for pattern in patterns)
+
+    def _matched(self, db2_cmd: str) -> List[bool]:
+        matched = [False] * len(self.options)
+        for m in self.scanner.finditer(db2_cmd):
+            groups = self.entries_at.match(db2_cmd, m.start()).groups() if self.entries_at else self._match_at(db2_cmd, m.start())
+            matched = [done or group is not None for done, group in zip(matched, groups)]
+        return matched
+
+    def convert(self, db2_cmd: str) -> List[str]:
+        pg_opts = [pg_opt for (_, pg_opt), matched in zip(self.options, self._matched(db2_cmd)) if pg_opt and matched]
+        if not any(opt.startswith("FORMAT") for opt in pg_opts):
+            pg_opts.insert(0, "FORMAT csv")
+        return pg_opts
+
+
+_options = OptionsMatcher(options_map)
+
+
+def normalize_select(sql: str) -> str:
+    return _WHITESPACE_RE.sub(" ", sql.strip())
+
+
+def format_log_redirection(existing_redir: str) -> str:
+    if not existing_redir:
+        return ""
+    m = _REDIRECTION_RE.search(existing_redir.strip())
+    if not m:
+        return existing_redir.strip()
+    logfile, rest = m.groups()
+    logfile = logfile.strip("\"'")
+    return f'>> "{logfile}"{rest}'
+
+
+@dataclass
+class Command:
+    """One db2 command and what is derived from it once."""
+    text: str
+    _pg_opts: Optional[str] = field(default=None, repr=False)
+
+    @property
+    def pg_opts(self) -> str:
+        if self._pg_opts is None:
+            self._pg_opts = ", ".join(_options.convert(self.text))
+        return self._pg_opts
+
+
+def _copy_to(space_block: str, select_sql: str, outputfile: str, pg_opts: str) -> str:
+    return f"{space_block}\\copy ({normalize_select(select_sql)}) TO '{outputfile}' WITH ({pg_opts});\n"
+
+
+def _psql_block(m: re.Match, command: Command, rule: CompiledRule) -> str:
+    space_block, outputfile, of_type, select_sql, logfile = m.groups()
+    return (
+        f'{space_block}{_PSQL} {format_log_redirection(logfile)} <<EOF\n'
+        f'{_copy_to(space_block, select_sql, outputfile, command.pg_opts)}'
+        f'{space_block}EOF\n'
+    )
+
+
+def _psql_block_xo(m: re.Match, command: Command, rule: CompiledRule) -> str:
+    space_block, outputfile, of_type, select_sql = m.groups()
+    return (
+        f"{space_block}{_PSQL}  -q -A -F $'\\t' -t <<EOF\n"
+        f'{_copy_to(space_block, select_sql, outputfile, command.pg_opts)}'
+        f'{space_block}EOF\n'
+    )
+
+
+def _psql_block_short(m: re.Match, command: Command, rule: CompiledRule) -> str:
+    def repl(short: re.Match) -> str:
+        outputfile, of_type, select_sql = short.groups()
+        return f'"\\\\copy ({normalize_select(select_sql)}) TO \'{outputfile}\' WITH ({command.pg_opts})"'
+
+    return rule.apply_pattern.sub(repl, command.text)
+
+
+def _psql_var_block(m: re.Match, command: Command, rule: CompiledRule) -> str:
+    space_block, varname, outputfile, of_type, select_sql, logfile = m.groups()
+    return (
+        f'{space_block}{varname}=$({_PSQL} {format_log_redirection(logfile)} <<EOF\n'
+        f'{_copy_to(space_block, select_sql, outputfile, command.pg_opts)}'
+        f'{space_block}EOF\n'
+        f'{space_block})\n'
+    )
+
+
+def _import_block(pg_opts: str, truncate: bool, var_block: bool):
+    def render(m: re.Match, command: Command, rule: CompiledRule) -> str:
+        if var_block:
+            space_block, varname, infile, table = m.groups()
+            head = f'{space_block}{varname}=$({_PSQL} <<EOF\n'
+        else:
+            space_block, infile, table, logfile = m.groups()
+            head = f'{space_block}{_PSQL} {format_log_redirection(logfile)} <<EOF\n'
+        return (
+            head
+            + (f'{space_block}TRUNCATE TABLE {table};\n' if truncate else '')
+            + f"{space_block}\\copy {table} FROM '{infile}' WITH ({pg_opts});\n"
+            + f'{space_block}EOF\n'
+            + (f'{space_block})\n' if var_block else '')
+        )
+    return render
+
+
+_IMPORT_OPTS = "FORMAT csv, DELIMITER ','"
+_IMPORT_REPLACE_OPTS = "FORMAT csv, DELIMITER ',', ENCODING 'EUC_JP'"
+
+# replace_template of a rule 28 entry -> renderer of its match
+TEMPLATES: Dict[str, Callable[[re.Match, Command, CompiledRule], str]] = {
+    "psql_block": _psql_block,
+    "psql_block_xo": _psql_block_xo,
+    "psql_block_short": _psql_block_short,
+    "psql_var_block": _psql_var_block,
+    "psql_block_import": _import_block(_IMPORT_OPTS, truncate=False, var_block=False),
+    "psql_var_block_import": _import_block(_IMPORT_OPTS, truncate=False, var_block=True),
+    "psql_block_import_replace": _import_block(_IMPORT_REPLACE_OPTS, truncate=True, var_block=False),
+    "psql_var_block_import_replace": _import_block(_IMPORT_REPLACE_OPTS, truncate=True, var_block=True),
+}
+
+
+def split_commands(text: str) -> List[Tuple[int, int]]:
+    """(start, stop) of the shell commands of text, each with its line break and here documents."""
+    commands = []
+    start = pos = depth = lines = 0
+    heredocs: List[str] = []
+    while True:
+        m = _COMMAND_SCAN_RE.search(text, pos)
+        if m is None:
+            break
+        pos = m.end()
+        kind = m.lastgroup
+        if kind == "quoted":
+            if lines + m.group().count("\n") >= MAX_COMMAND_LINES:
+                pos = m.start() + 1  # most likely an unbalanced quote: go on after it
+        elif kind == "heredoc":
+            heredocs.append(m.group("delimiter"))
+        elif kind == "open":
+            depth += 1
+        elif kind == "paren":
+            if depth:
+                depth += 1
+        elif kind == "close":
+            if depth:
+                depth -= 1
+        elif kind == "nl":
+            lines += 1
+            for delimiter in heredocs:  # the here documents of the line belong to the command
+                end = re.compile(rf"^[ \t]*{re.escape(delimiter)}[ \t]*(?:\r\n?|\n|\Z)", re.MULTILINE).search(text, pos)
+                if end:
+                    pos = end.end()
+            heredocs = []
+            if depth == 0 or lines >= MAX_COMMAND_LINES:
+                commands.append((start, pos))
+                start, depth, lines = pos, 0, 0
+    if start < len(text):
+        commands.append((start, len(text)))
+    return commands
+
+
+class Rule28Engine:
+    def __init__(self, rules: Sequence[CompiledRule]):
+        # entries with a pattern and a known template, in rule order
+        self.rules: Tuple[CompiledRule, ...] = tuple(
+            r for r in rules if r.template_pattern is not None and r.template in TEMPLATES
+        )
+        literals = [r.required_literal for r in self.rules]
+        # None: some pattern has no required literal, every command has to be tried
+        self.literals: Optional[Tuple[str, ...]] = None if None in literals else tuple(set(literals))
+
+    def _may_match(self, text: str) -> bool:
+        if not self.rules:
+            return False
+        if self.literals is None:
+            return True
+        folded = fold_text(text)
+        return any(literal in folded for literal in self.literals)
+
+    def transform_command(self, text: str) -> str:
+        if not self._may_match(text):
+            return text
+        command = Command(text)
+        for r in self.rules:
+            m = r.template_pattern.search(text)
+            if m:
+                return TEMPLATES[r.template](m, command, r)
+        return text
+
+    def transform_text(self, text: str) -> str:
+        """Convert every db2 command of a script (or a block of lines, or one command)."""
+        if not self._may_match(text):
+            return text
+        out = []
+        for start, stop in split_commands(text):
+            out.append(self.transform_command(text[start:stop]))
+        return "".join(out)
+
+
+_engines: Dict[Tuple[int, ...], Tuple[Tuple[CompiledRule, ...], Rule28Engine]] = {}
+
+
+def get_engine(rules: Sequence[CompiledRule]) -> Rule28Engine:
+    """Engine of the rule 28 entries of a rule set, built once per set of compiled rules."""
+    rules = tuple(rules)
+    key = tuple(id(r) for r in rules)
+    cached = _engines.get(key)
+    if cached is None:
+        cached = _engines[key] = (rules, Rule28Engine(rules))  # keeps the rules alive, so the ids stay theirs
+    return cached[1]
@@ -0,0 +1,159 @@
+import re
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse, sre_constants
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+from config import get_configs_by_source_type
+from rules import common_detect_rules
+
+DETECT_FLAGS = re.IGNORECASE | re.MULTILINE
+APPLY_FLAGS = re.IGNORECASE
+TEMPLATE_FLAGS = re.IGNORECASE | re.DOTALL
+
+# Shortest literal worth using as a prefilter, shorter ones are in almost every query
+MIN_REQUIRED_LITERAL_LENGTH = 3
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    rule: Mapping                                    # read-only rule of common_detect_rules.load_all_rules
+    rule_no: int
+    detect_pattern: Optional[re.Pattern] = None      # detection only (detect_rules)
+    apply_pattern: Optional[re.Pattern] = None       # detect and replace (detect_and_apply_rules, rule 28 short block)
+    template_pattern: Optional[re.Pattern] = None    # rule with replace_template
+    template: Optional[str] = None
+    table_patterns: Tuple[Tuple[str, str, re.Pattern], ...] = ()   # rule 8: (key, value, pattern)
+    column_patterns: Tuple[Tuple[str, str, re.Pattern], ...] = ()  # rule 8: (key, value, pattern)
+    required_literal: Optional[str] = None          # casefolded text every detect_pattern match contains
+
+
+def _literal_runs(items, runs: List[str]):
+    """Collect the runs of ASCII literals that every match of the parsed items must contain."""
+    run = []
+    for op, av in items:
+        if op is sre_constants.LITERAL and isinstance(av, int) and av < 128:
+            run.append(chr(av))
+            continue
+        if run:
+            runs.append(''.join(run))
+            run = []
+        if op is sre_constants.SUBPATTERN:
+            _literal_runs(av[-1], runs)  # groups are mandatory, branches/repeats/lookarounds are not
+    if run:
+        runs.append(''.join(run))
+
+
+def required_literal(pattern: str, flags: int = DETECT_FLAGS) -> Optional[str]:
+    """Longest literal every match contains, None (no prefilter) when there is none or the pattern can not be analysed."""
+    runs = []
+    try:
+        # the parse tree of the private sre parser can change between Python versions
+        _literal_runs(list(sre_parse.parse(pattern, flags)), runs)
+    except Exception:
+        return None
+    literal = max(runs, key=len, default="")
+    return literal.casefold() if len(literal) >= MIN_REQUIRED_LITERAL_LENGTH else None
+
+
+def fold_text(text: str) -> str:
+    """Casefold so that every ASCII literal a case-insensitive pattern matches in text is a substring of the result."""
+    folded = text.casefold()
+    if not folded.isascii():
+        # 'ı' and 'İ' match 'i' with re.IGNORECASE but do not casefold to it
+        folded = folded.replace('\u0131', 'i').replace('\u0307', '')
+    return folded
+
+
+def _compile_word_patterns(mapping: Mapping) -> Tuple[Tuple[str, str, re.Pattern], ...]:
+    return tuple((key, value, re.compile(rf'\b{key}\b', re.IGNORECASE)) for key, value in mapping.items())
+
+
+def compile_rule(rule: Mapping) -> CompiledRule:
+    pattern = rule.get("pattern_detect")
+    detect_value = rule.get("detect_value")
+    table_patterns = column_patterns = ()
+    if rule.get("rule_no") == 8 and isinstance(detect_value, Mapping):
+        table_patterns = _compile_word_patterns(detect_value.get("tables", {}))
+        column_patterns = _compile_word_patterns(detect_value.get("columns", {}))
+    template = rule.get("replace_template")
+    return CompiledRule(
+        rule=rule,
+        rule_no=rule.get("rule_no", 0),
+        detect_pattern=re.compile(pattern, DETECT_FLAGS) if pattern else None,
+        apply_pattern=re.compile(pattern, APPLY_FLAGS) if pattern else None,
+        template_pattern=re.compile(pattern, TEMPLATE_FLAGS) if pattern and template else None,
+        template=template,
+        table_patterns=table_patterns,
+        column_patterns=column_patterns,
+        required_literal=required_literal(pattern) if pattern else None,
+    )
+
+
+class RuleSet:
+    """Rules of one source type restricted to the active rule numbers, with all patterns compiled once."""
+
+    def __init__(self, source_type: str, rules: Iterable[dict], active_rule_set: Iterable[int] = ()):
+        self.source_type = source_type.lower()
+        self.active_rule_set: FrozenSet[int] = frozenset(active_rule_set)
+        # An empty active rule set means every rule is active
+        self.rules: Tuple[CompiledRule, ...] = tuple(
+            compile_rule(rule) for rule in rules
+            if not self.active_rule_set or rule.get("rule_no") in self.active_rule_set
+        )
+        self._by_no: Dict[int, List[CompiledRule]] = {}
+        for compiled in self.rules:
+            self._by_no.setdefault(compiled.rule_no, []).append(compiled)
+
+    def __iter__(self):
+        return iter(self.rules)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def is_active(self, rule_no: int) -> bool:
+        return not self.active_rule_set or rule_no in self.active_rule_set
+
+    def by_no(self, rule_no: int) -> List[CompiledRule]:
+        return self._by_no.get(rule_no, [])
+
+    def scan(self, text: str) -> FrozenSet[int]:
+        """Positions (in rule order) of the rules whose detect_pattern matches text.
+
+        The text is folded once; a rule whose required literal is not in it cannot match and its
+        regex is never run, only the remaining candidates are confirmed with detect_pattern.
+        """
+        folded = fold_text(text)
+        return frozenset(
+            index for index, compiled in enumerate(self.rules)
+            if compiled.detect_pattern
+            and (compiled.required_literal is None or compiled.required_literal in folded)
+            and compiled.detect_pattern.search(text)
+        )
+
+
+# (rules the set was built from, rule set): rebuilt when load_all_rules returns other rules
+_rule_sets: Dict[Tuple[str, FrozenSet[int]], Tuple[tuple, RuleSet]] = {}
+
+
+def get_rule_set(source_type: str, active_rule_set: Iterable[int] = ()) -> RuleSet:
+    key = (source_type.lower(), frozenset(active_rule_set))
+    rules = common_detect_rules.load_all_rules(source_type)
+    cached = _rule_sets.get(key)
+    if cached is None or cached[0] is not rules:
+        cached = _rule_sets[key] = (rules, RuleSet(source_type, rules, key[1]))
+    return cached[1]
+
+
+def invalidate_rule_sets():
+    """Read the rule files again on the next get_rule_set, even if they look unchanged."""
+    common_detect_rules.invalidate_rules()
+    _rule_sets.clear()
+
+
+def get_rule_set_for_sheet(source_type: str, sheet_name: str) -> RuleSet:
+    source_configs = get_configs_by_source_type(source_type)
+    rule_configs = source_configs.RULE_CONFIGS
+    return get_rule_set(source_type, rule_configs.get(sheet_name, rule_configs.get(sheet_name.upper(), [])))
@@ -0,0 +1,9 @@
+"""config reads the paths of .env when imported (through the rule modules): placeholders where they are not set."""
+import os
+import tempfile
+
+from dotenv import load_dotenv
+
+load_dotenv()
+for name in ("RESOURCE_ROOT_PATH", "SVN_ROOT_PATH", "C_SVN_ROOT_PATH"):
+    os.environ.setdefault(name, os.path.join(tempfile.gettempdir(), "migration_tool_tests"))
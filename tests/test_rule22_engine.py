@@ -0,0 +1,83 @@
+"""rule22_engine against the line rewrite of detect_c_rule22 (the reference for single lines)."""
+import pytest
+
+from rules.detect_c_rule22 import transform_line_for_rule22
+from rules.rule22_engine import transform_text
+from tools import benchmark_data
+
+SINGLE_LINES = [
+    '#define WCOM_SQLCODE_DUP -803\n',
+    '#define  X_SQLCODE_NOTFOUND   -204\n',
+    '#define X_SQLCODE_Y 100\n',
+    '    if (SQLCODE == -803) {\n',
+    '    if (sqlca.sqlcode == -803 || SQLCODE != -911) {\n',
+    '    if (SQLCODE == SQL_REP_RECORD) {\n',
+    '    if (SQLCODE!=WCOM_SQLCODE_NOT_UNUQUE) return;\n',
+    '    if (SQLCODE == -999) {\n',
+    '    if (SQLCODE == -803) { /* dup */\n',
+    '    LOG_ERROR("insert error SQLCODE=%d", SQLCODE);\n',
+    '    LOG_ERROR("insert error SQLCODE=%d key=%s", (int)SQLCODE, key);\n',
+    '    LOG_ERROR("insert SQLCODE=%d", SQLCODE); LOG_INFO("retry SQLCODE=%d", SQLCODE);\n',
+    '    sprintf(buf, "%s SQLCODE[%ld]", name, SQLCODE);\n',
+    '    printf("SQLCODE=%d\\n", SQLCODE);\n',
+    '    log_write(LOG_ERR, SQLCODE, "failed");\n',
+    '    x = f(SQLCODE);\n',
+    '    rc = SQLCODE;\n',
+    '    rc = 0;\n',
+    '',
+]
+
+
+@pytest.mark.parametrize("line", SINGLE_LINES)
+def test_single_line_same_as_line_rewrite(line):
+    assert transform_text(line) == transform_line_for_rule22(line)
+
+
+def test_benchmark_source_same_as_line_rewrite():
+    lines = benchmark_data.c_source_lines()
+    assert [transform_text(line) for line in lines] == [transform_line_for_rule22(line) for line in lines]
+
+
+# documented deviations from the line rewrite
+
+@pytest.mark.parametrize("line", [
+    '    /* SQLCODE == -803 */\n',
+    '    // LOG_ERROR("SQLCODE=%d", SQLCODE);\n',
+])
+def test_comments_are_not_rewritten(line):
+    assert transform_text(line) == line
+    assert transform_line_for_rule22(line) != line
+
+
+def test_strings_other_than_the_format_are_not_rewritten():
+    line = '    LOG("a", "b SQLCODE", SQLCODE);\n'
+    assert transform_text(line) == '    LOG("a", "b SQLCODE", SQLSTATE_GET());\n'
+    assert transform_line_for_rule22(line) == '    LOG("a", "b SQLSTATE_GET()", SQLSTATE_GET());\n'
+
+
+def test_condition_after_a_string_is_rewritten():
+    line = '    msg = "SQLCODE == -803"; if (SQLCODE == -803) {\n'
+    assert transform_text(line) == '    msg = "SQLCODE == -803"; if (SQLSTATE_CHECK(23505)) {\n'
+    assert transform_line_for_rule22(line) == line
+
+
+def test_multi_line_call_is_rewritten_as_a_whole():
+    text = '    LOG_ERROR("insert error SQLCODE=%d key=%s",\n              SQLCODE, key);\n'
+    assert transform_text(text) == '    LOG_ERROR("insert error SQLSTATE=%s key=%s",\n              SQLSTATE_GET(), key);\n'
+    assert "".join(transform_line_for_rule22(line) for line in text.splitlines(True)) == (
+        '    LOG_ERROR("insert error SQLCODE=%d key=%s",\n              SQLSTATE_GET(), key);\n')
+
+
+def test_every_log_call_of_a_block_is_rewritten():
+    block = '    LOG_ERROR("insert SQLCODE=%d", SQLCODE);\n    LOG_INFO("retry SQLCODE=%d", SQLCODE);\n'
+    assert transform_text(block) == (
+        '    LOG_ERROR("insert SQLSTATE=%s", SQLSTATE_GET());\n    LOG_INFO("retry SQLSTATE=%s", SQLSTATE_GET());\n')
+    # the line rewrite applied to the block converts the first call only
+    assert transform_line_for_rule22(block) == (
+        '    LOG_ERROR("insert SQLSTATE=%s", SQLSTATE_GET());\n    LOG_INFO("retry SQLCODE=%d", SQLCODE);\n')
+
+
+def test_block_same_as_line_rewrite_per_line():
+    block = ('    if (SQLCODE == -803) {\n        LOG_ERROR("dup SQLCODE=%d", SQLCODE);\n'
+             '    } else if (SQLCODE != -911) {\n        LOG_ERROR("other SQLCODE=%ld", (int)SQLCODE);\n    }\n')
+    assert transform_text(block) == "".join(transform_line_for_rule22(line) for line in block.splitlines(True))
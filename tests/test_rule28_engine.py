@@ -0,0 +1,113 @@
+"""rule28_engine against transform_line_for_rule28 (the reference for one command), for every template."""
+import pytest
+
+from rules.detect_c_rule28 import options_map, transform_line_for_rule28
+from rules.rule28_engine import TEMPLATES, Rule28Engine, split_commands
+from rules.rule_set import compile_rule
+
+# Rule 28 entries as in the rule files, one per template with the groups the template reads, in rule order
+_EXPORT = r'EXPORT\s+TO\s+(\S+)\s+OF\s+(\w+).*?(SELECT.*?)'
+_IMPORT = r'IMPORT\s+FROM\s+(\S+)\s+OF\s+\w+.*?{mode}\s+INTO\s+(\w+)'
+_LOG = r'(?:>>?\s*(\S+))?'
+RULE_28 = [
+    ("psql_var_block", rf'^(\s*)(\w+)=\$\(db2\s+"?{_EXPORT}"?\s*{_LOG}\)\s*$'),
+    ("psql_var_block_import_replace", rf'^(\s*)(\w+)=\$\(db2\s+"?{_IMPORT.format(mode="REPLACE")}"?\s*\)\s*$'),
+    ("psql_var_block_import", rf'^(\s*)(\w+)=\$\(db2\s+"?{_IMPORT.format(mode="INSERT")}"?\s*\)\s*$'),
+    ("psql_block_xo", rf'^(\s*)db2\s+-x\s+-o\s+"?{_EXPORT}"?\s*$'),
+    ("psql_block", rf'^(\s*)db2\s+"?{_EXPORT}"?\s*{_LOG}\s*$'),
+    ("psql_block_import_replace", rf'^(\s*)db2\s+"?{_IMPORT.format(mode="REPLACE")}"?\s*{_LOG}\s*$'),
+    ("psql_block_import", rf'^(\s*)db2\s+"?{_IMPORT.format(mode="INSERT")}"?\s*{_LOG}\s*$'),
+    ("psql_block_short", r'"db2\s+EXPORT\s+TO\s+(\S+)\s+OF\s+(\w+)[^"]*?(SELECT[^"]*)"'),
+]
+RULES = [compile_rule({"rule_no": 28, "pattern_detect": pattern, "replace_template": template}) for template, pattern in RULE_28]
+ENGINE = Rule28Engine(RULES)
+
+SELECT = "SELECT A, B FROM T_ORDER WHERE DEL_FLG = '0'"
+EXPORT_COMMANDS = [
+    '    db2 "EXPORT TO /w/out.del OF DEL{options} ' + SELECT + '" >> /w/log/e.log\n',
+    'db2 "export to /w/out.del of del{options} select a from t"\n',
+    '    db2 -x -o "EXPORT TO /w/out.del OF DEL{options} ' + SELECT + '"\n',
+    '    RC=$(db2 "EXPORT TO /w/out.del OF DEL{options} ' + SELECT + '" > /w/log/e.log)\n',
+    '    CMD="db2 EXPORT TO /w/out.del OF DEL{options} ' + SELECT + '"\n',
+]
+OTHER_COMMANDS = [
+    '    db2 "IMPORT FROM /w/in.del OF DEL INSERT INTO T_ORDER" > /w/log/i.log\n',
+    '    db2 "IMPORT FROM /w/in.del OF DEL COMMITCOUNT 1000 REPLACE INTO T_ORDER"\n',
+    '    RC=$(db2 "IMPORT FROM /w/in.del OF DEL INSERT INTO T_ORDER")\n',
+    '    RC=$(db2 "IMPORT FROM /w/in.del OF DEL REPLACE INTO T_ORDER")\n',
+    '    db2 "EXPORT TO /w/out.del OF DEL SELECT A,\n        B FROM T_ORDER" >> /w/log/e.log\n',
+    '    db2 connect to ${DB}\n',
+    '    echo "EXPORT done"\n',
+]
+
+
+def _options_text(db2_opt: str) -> str:
+    """Command text matched by an options_map pattern."""
+    return " " + db2_opt.replace('\\"', '"') if db2_opt else ""
+
+
+COMMANDS = [command.format(options=_options_text(db2_opt)) for db2_opt in [*options_map, ""] for command in EXPORT_COMMANDS]
+COMMANDS += OTHER_COMMANDS
+
+
+def _template_of(command: str):
+    return next((rule.template for rule in RULES if rule.template_pattern.search(command)), None)
+
+
+def test_every_template_is_covered():
+    assert {_template_of(command) for command in COMMANDS} >= set(TEMPLATES)
+
+
+@pytest.mark.parametrize("command", COMMANDS)
+def test_command_same_as_line_rewrite(command):
+    assert ENGINE.transform_command(command) == transform_line_for_rule28(command, RULES)
+
+
+def _split(text: str):
+    return [text[start:stop] for start, stop in split_commands(text)]
+
+
+def test_split_quoted_multi_line_command():
+    text = '    db2 "EXPORT TO /w/out.del OF DEL SELECT A,\n        B FROM T_ORDER" >> /w/log/e.log\n    echo done\n'
+    assert _split(text) == [
+        '    db2 "EXPORT TO /w/out.del OF DEL SELECT A,\n        B FROM T_ORDER" >> /w/log/e.log\n',
+        '    echo done\n',
+    ]
+
+
+def test_split_heredocs_stay_with_their_command():
+    text = ("    psql <<EOF\nselect 1;\nEOF\n"
+            "    cat <<-'END' | sort\n\tb\n\tEND\n"
+            '    db2 "IMPORT FROM /w/in.del OF DEL INSERT INTO T_ORDER"\n')
+    assert _split(text) == [
+        "    psql <<EOF\nselect 1;\nEOF\n",
+        "    cat <<-'END' | sort\n\tb\n\tEND\n",
+        '    db2 "IMPORT FROM /w/in.del OF DEL INSERT INTO T_ORDER"\n',
+    ]
+
+
+def test_split_continued_lines():
+    text = ('    db2 "EXPORT TO /w/out.del OF DEL SELECT A FROM T" \\\n      >> /w/log/e.log\n'
+            '    RC=$(db2 "IMPORT FROM /w/in.del OF DEL INSERT INTO T_ORDER"\n    )\n')
+    assert _split(text) == [
+        '    db2 "EXPORT TO /w/out.del OF DEL SELECT A FROM T" \\\n      >> /w/log/e.log\n',
+        '    RC=$(db2 "IMPORT FROM /w/in.del OF DEL INSERT INTO T_ORDER"\n    )\n',
+    ]
+
+
+def test_separator_joined_block():
+    # lines of the source C tool are joined with its separator (source_c.DEFAULT_SEPARATOR)
+    lines = [
+        '    db2 "EXPORT TO /w/out.del OF DEL SELECT A FROM T" >> /w/log/e.log\n',
+        '    echo "a\n', 'b"\n',
+        '    db2 "IMPORT FROM /w/in.del OF DEL INSERT INTO T_ORDER"\n',
+    ]
+    block = "\x1f".join(lines)
+    commands = _split(block)
+    assert commands == [lines[0], "\x1f" + lines[1] + "\x1f" + lines[2], "\x1f" + lines[3]]
+    assert ENGINE.transform_text(block) == "".join(transform_line_for_rule28(command, RULES) for command in commands)
+
+
+def test_script_same_as_line_rewrite_per_command():
+    script = "".join(COMMANDS)
+    assert ENGINE.transform_text(script) == "".join(transform_line_for_rule28(command, RULES) for command in COMMANDS)
@@ -0,0 +1,255 @@
+"""Micro-benchmarks of the text, rule, merge and encoding hot paths of the batch.
+
+Inputs are generated by tools.benchmark_data (deterministic) into the work folder: Shift_JIS
+and EUC-JP sources and an evidence workbook of realistic size, compiled with the evidence
+compiler. The rules are the configured rule files, as in the batch.
+
+Usage:
+    python -m tools.benchmark run [--output results.json] [--filter text.]
+    python -m tools.benchmark baseline                       # store tools/benchmark_baseline.json
+    python -m tools.benchmark compare [results.json] [--threshold 0.2]
+
+compare runs the suite when no results file is given and exits with 1 when a benchmark is
+slower than the baseline by more than the threshold (median time).
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tools import benchmark_data
+
+BASELINE_PATH = str(Path(__file__).with_name("benchmark_baseline.json"))
+DEFAULT_WORK_DIR = os.path.join(tempfile.gettempdir(), "migration_tool_benchmark")
+DEFAULT_THRESHOLD = 0.2
+DEFAULT_MIN_TIME = 0.5   # seconds measured per benchmark
+DEFAULT_MIN_CALLS = 5
+DATA_VERSION = 1         # bump when benchmark_data output changes
+
+ENCODINGS = {"sjis": "cp932", "eucjp": "euc_jp"}
+
+# name -> (setup, call); setup runs untimed before every call
+Benchmark = Tuple[Optional[Callable[[], None]], Callable[[], object]]
+
+
+def _quiet_streamlit():
+    """The logic modules use st.cache_data / st.* outside a Streamlit run, which only logs warnings."""
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+
+def prepare_evidence(work_dir: str):
+    """Generate (once per data version) and compile the benchmark evidence workbook."""
+    from logic import evidence_compiler
+    from logic.evidence_index import build_evidence_index
+
+    excel_path = os.path.join(work_dir, f"evidence_v{DATA_VERSION}.xlsx")
+    if not os.path.exists(excel_path):
+        benchmark_data.write_evidence_workbook(excel_path)
+    compiled = evidence_compiler.compile_evidence(excel_path, excel_path + ".idx")
+    return build_evidence_index(compiled)
+
+
+def _block_mapping(evidence, lines: List[str], encoding: str, system_types: List[int]):
+    """mapping, new column -> (table, data type) and column set of a block, as handler.show_data_type builds them."""
+    from logic.mapping import build_full_mapping
+
+    used_keys, _ = evidence.key_extractor.extract("".join(lines), encoding)
+    mapping, column_set = build_full_mapping(used_keys, evidence.schema_dict, evidence.table_dict, evidence.column_dict, evidence.key_dict)
+    data_types: Dict[str, list] = {}
+    for table_name, col_name, data_type in evidence.type_index(system_types).lookup(set(used_keys)):
+        for new_table in mapping.get(table_name, ()):
+            for new_col in mapping.get(col_name, ()):
+                data_types.setdefault(new_col, []).append((new_table, data_type))
+    return mapping, data_types, column_set
+
+
+def build_benchmarks(work_dir: str) -> Dict[str, Benchmark]:
+    from logic import merge_source, text_processing
+    from rules import detect_c_rule22, detect_c_rule28, detect_c_rules, rule22_engine, rule28_engine
+    from rules.rule_set import get_rule_set
+    from utils import charset_util
+
+    _quiet_streamlit()
+    evidence = prepare_evidence(work_dir)
+    benchmarks: Dict[str, Benchmark] = {}
+
+    c_lines = benchmark_data.c_source_lines()
+    java_lines = benchmark_data.java_source_lines()
+    c_block = c_lines[:200]
+    java_block = java_lines[:200]
+    sql = benchmark_data.sql_text()
+    java_text = "".join(java_lines)
+    c_query = text_processing.extract_sql_fragments("".join(c_block))
+
+    # text processing
+    for label, encoding in ENCODINGS.items():
+        text = "".join(c_lines)
+        benchmarks[f"text.extract_full_keys.c_{label}"] = (
+            None, lambda text=text, encoding=encoding: text_processing.extract_full_keys(text, evidence.valid_columns, encoding))
+    for label, block in (("c", c_block), ("java", java_block)):
+        mapping, data_types, column_set = _block_mapping(evidence, block, "cp932", [1])
+        indexes = list(range(len(block)))
+        benchmarks[f"text.replace_by_mapping.{label}"] = (
+            None, lambda block=block, indexes=indexes, mapping=mapping, data_types=data_types, column_set=column_set:
+            text_processing.replace_by_mapping(block, indexes, mapping, data_types, column_set))
+    benchmarks["text.find_aliases.sql"] = (None, lambda: text_processing.find_aliases(sql))
+    benchmarks["text.extract_query_text.java"] = (None, lambda: text_processing.extract_query_text(java_text))
+
+    # rules
+    c_rules = get_rule_set("c")
+    benchmarks["rules.detect_rules.c"] = (None, lambda: detect_c_rules.detect_rules(c_block, c_rules))
+    active_rules = {rule.rule_no for rule in c_rules}
+    benchmarks["rules.detect_and_apply_rules.c"] = (None, lambda: detect_c_rules.detect_and_apply_rules(c_query, "c", active_rules))
+    benchmarks["rules.rule22.c_lines"] = (None, lambda: [detect_c_rule22.transform_line_for_rule22(line) for line in c_lines])
+    benchmarks["rules.rule22_engine.c_lines"] = (None, lambda: [rule22_engine.transform_text(line) for line in c_lines])
+    c_text = "".join(c_lines)
+    benchmarks["rules.rule22_engine.c_file"] = (None, lambda: rule22_engine.transform_text(c_text))
+    commands = benchmark_data.shell_commands()
+    rule28 = c_rules.by_no(28)
+    benchmarks["rules.rule28.sh_lines"] = (None, lambda: [detect_c_rule28.transform_line_for_rule28(command, rule28) for command in commands])
+    engine28 = rule28_engine.get_engine(rule28)
+    benchmarks["rules.rule28_engine.sh_lines"] = (None, lambda: [engine28.transform_command(command) for command in commands])
+    script = "".join(commands)
+    benchmarks["rules.rule28_engine.sh_file"] = (None, lambda: engine28.transform_text(script))
+
+    # merge
+    changed_lines, dest_lines = benchmark_data.edited_copies(c_lines, 50)
+    for label, encoding in ENCODINGS.items():
+        folder = os.path.join(work_dir, f"merge_{label}")
+        os.makedirs(folder, exist_ok=True)
+        paths = {}
+        for name, lines in (("original", c_lines), ("change", changed_lines), ("dest", dest_lines)):
+            paths[name] = os.path.join(folder, f"{name}.sqc")
+            with open(paths[name], "w", encoding=encoding, newline="") as f:
+                f.writelines(lines)
+        dest_copy = paths["dest"] + ".orig"
+        shutil.copy(paths["dest"], dest_copy)
+        benchmarks[f"merge.merge_source_file.{label}"] = (
+            lambda paths=paths, dest_copy=dest_copy: shutil.copy(dest_copy, paths["dest"]),
+            lambda paths=paths, encoding=encoding: merge_source.merge_source_file(paths["original"], paths["change"], paths["dest"], encoding))
+
+    # encoding detection
+    for label, encoding in ENCODINGS.items():
+        raw = "".join(c_lines).encode(encoding)
+        benchmarks[f"charset.detect_encode.{label}"] = (None, lambda raw=raw: charset_util.detect_encode(raw))
+        benchmarks[f"charset.detect_encode_by_bytes.{label}"] = (None, lambda raw=raw: charset_util.detect_encode_by_bytes(raw))
+    return benchmarks
+
+
+def measure(setup: Optional[Callable[[], None]], call: Callable[[], object], min_time: float, min_calls: int) -> dict:
+    """Time single calls until min_time is spent and min_calls are done. Times are seconds per call."""
+    call()  # warm up caches and compiled patterns
+    times = []
+    spent = 0.0
+    while len(times) < min_calls or spent < min_time:
+        if setup:
+            setup()
+        start = time.perf_counter()
+        call()
+        elapsed = time.perf_counter() - start
+        times.append(elapsed)
+        spent += elapsed
+    return {"median": statistics.median(times), "min": min(times), "calls": len(times)}
+
+
+def run(work_dir: str = DEFAULT_WORK_DIR, name_filter: str = "", min_time: float = DEFAULT_MIN_TIME,
+        min_calls: int = DEFAULT_MIN_CALLS, out=sys.stdout) -> dict:
+    os.makedirs(work_dir, exist_ok=True)
+    benchmarks = build_benchmarks(work_dir)
+    results = {}
+    for name, (setup, call) in benchmarks.items():
+        if name_filter and name_filter not in name:
+            continue
+        results[name] = measure(setup, call, min_time, min_calls)
+        print(f"{name:45s} {results[name]['median'] * 1000:10.3f} ms  ({results[name]['calls']} calls)", file=out)
+    return {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "data_version": DATA_VERSION,
+        },
+        "results": results,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD, out=sys.stdout) -> List[str]:
+    """Print the change of each benchmark against the baseline. Returns the names of the regressions."""
+    regressions = []
+    print(f"{'benchmark':45s} {'baseline':>12s} {'current':>12s} {'change':>8s}", file=out)
+    for name, result in results["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:45s} {'-':>12s} {result['median'] * 1000:9.3f} ms      new", file=out)
+            continue
+        change = result["median"] / base["median"] - 1 if base["median"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:45s} {base['median'] * 1000:9.3f} ms {result['median'] * 1000:9.3f} ms {change:+8.1%}{flag}", file=out)
+    if baseline["meta"].get("data_version") != results["meta"].get("data_version"):
+        print("Warning: baseline was measured on another benchmark data version.", file=out)
+    return regressions
+
+
+def _load(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save(results: dict, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the batch hot paths.")
+    parser.add_argument("command", choices=["run", "baseline", "compare"])
+    parser.add_argument("results", nargs="?", help="compare: results file of an earlier run (default: run now)")
+    parser.add_argument("--output", help="run: write the results to this file")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown of the median, 0.2 = 20%%")
+    parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR)
+    parser.add_argument("--min-time", type=float, default=DEFAULT_MIN_TIME, help="Seconds measured per benchmark")
+    args = parser.parse_args(argv)
+
+    if args.command == "compare" and args.results:
+        results = _load(args.results)
+    else:
+        results = run(args.work_dir, args.filter, args.min_time)
+
+    if args.command == "run":
+        if args.output:
+            _save(results, args.output)
+        return 0
+    if args.command == "baseline":
+        _save(results, args.baseline)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run 'python -m tools.benchmark baseline' first.", file=sys.stderr)
+        return 2
+    regressions = compare(results, _load(args.baseline), args.threshold)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
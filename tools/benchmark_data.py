@@ -0,0 +1,186 @@
+"""Deterministic synthetic inputs for tools.benchmark.
+
+Every generator takes a seed, so two runs (and two machines) benchmark the same inputs.
+Source texts mix ASCII code, Japanese comments and identifiers, embedded SQL and the
+SQLCODE / db2 command shapes handled by rules 22 and 28.
+"""
+import os
+import random
+from typing import Dict, List, Tuple
+
+EVIDENCE_TABLES = 1200
+EVIDENCE_COLUMNS_PER_TABLE = 10
+EVIDENCE_KEYS = 300
+EVIDENCE_TYPE_SHEETS = ["type1.1", "type1.2", "type2.1", "type2.2"]
+
+_ASCII_PARTS = ["CUST", "ACCT", "ORDER", "ITEM", "BRANCH", "TRAN", "RATE", "LOAN", "DEPO", "CARD", "USER", "CODE"]
+_ASCII_SUFFIXES = ["MST", "TBL", "HIST", "WK", "INF", "LOG"]
+_JP_PARTS = ["顧客", "口座", "取引", "店舗", "金額", "利率", "日付", "区分", "番号", "名称", "残高", "契約", "支店", "ｶﾅ"]
+_DATA_TYPES = ["integer", "bigint", "character varying", "character", "numeric", "date", "timestamp without time zone"]
+_JP_COMMENTS = ["顧客情報を取得する", "残高を更新する", "取引履歴を登録する", "エラー処理", "件数をカウントする", "ﾃﾞｰﾀ編集"]
+
+
+def _table_name(rng: random.Random, index: int) -> str:
+    if index % 5 == 0:
+        return f"{rng.choice(_JP_PARTS)}{rng.choice(_JP_PARTS)}{index}"
+    return f"{rng.choice(_ASCII_PARTS)}_{rng.choice(_ASCII_PARTS)}_{rng.choice(_ASCII_SUFFIXES)}{index}"
+
+
+def _column_name(rng: random.Random, table_index: int, column_index: int) -> str:
+    if column_index < 4:
+        # shared by many tables, like the real evidence (e.g. update dates)
+        return ["UPD_DATE", "UPD_USER", "INS_DATE", "DEL_FLG"][column_index]
+    if (table_index + column_index) % 3 == 0:
+        return f"{rng.choice(_JP_PARTS)}{rng.choice(_JP_PARTS)}{column_index}"
+    return f"{rng.choice(_ASCII_PARTS)}_{rng.choice(_ASCII_PARTS)}_{column_index}"
+
+
+def evidence_vocabulary(seed: int = 1) -> Tuple[List[str], Dict[str, List[str]]]:
+    """(table names, table -> column names) of the generated evidence workbook."""
+    rng = random.Random(seed)
+    tables, columns = [], {}
+    for t in range(EVIDENCE_TABLES):
+        table = _table_name(rng, t)
+        tables.append(table)
+        columns[table] = [_column_name(rng, t, c) for c in range(EVIDENCE_COLUMNS_PER_TABLE)]
+    return tables, columns
+
+
+def write_evidence_workbook(excel_path: str, seed: int = 1):
+    """Evidence workbook with the sheet layout read by logic.mapping (two extra header rows per sheet)."""
+    from openpyxl import Workbook
+
+    rng = random.Random(seed + 1)
+    tables, columns = evidence_vocabulary(seed)
+    wb = Workbook(write_only=True)
+
+    def sheet(name: str, width: int):
+        ws = wb.create_sheet(name)
+        for r in range(3):
+            ws.append([f"{name}_h{r}_{c}" for c in range(width)])
+        return ws
+
+    ws = sheet("schema", 8)
+    ws.append([None, None, None, "DB2SCHM", None, "schm_main", None, None])
+    ws.append([None, None, None, "DB2HIST", None, "schm_hist", None, None])
+    ws = sheet("table", 9)
+    for t, table in enumerate(tables):
+        ws.append([None, None, None, None, table, None, None, f"tbl_{t:05d}", None])
+    ws = sheet("column", 10)
+    for table in tables:
+        for column in columns[table]:
+            ws.append([None, None, table, None, table, column, None, None, None, f"col_{column.lower()}"])
+    ws = sheet("key", 9)
+    for k in range(EVIDENCE_KEYS):
+        ws.append([None] * 5 + [f"KEY_{k}", None, None, f"key_{k}"])
+    for name in EVIDENCE_TYPE_SHEETS:
+        ws = wb.create_sheet(name)
+        ws.append(["a", "b", "table_name", "table_type", "column_name", "data_type", "is_nullable"])
+        for table in tables:
+            for column in columns[table]:
+                ws.append(["", "", table.lower(), "BASE TABLE", column.lower(), rng.choice(_DATA_TYPES), "YES"])
+    os.makedirs(os.path.dirname(os.path.abspath(excel_path)), exist_ok=True)
+    wb.save(excel_path)
+
+
+def _sql_select(rng: random.Random, tables: List[str], columns: Dict[str, List[str]]) -> List[str]:
+    table = rng.choice(tables)
+    cols = rng.sample(columns[table], 4)
+    return [
+        "    EXEC SQL SELECT\n",
+        *[f"        {col}{',' if i < len(cols) - 1 else ''}\n" for i, col in enumerate(cols)],
+        f"    INTO :h_{cols[0].lower()}, :h_cnt\n",
+        f"    FROM DB2SCHM.{table} A\n",
+        f"    WHERE A.{cols[1]} = :h_key AND A.DEL_FLG = '0'\n",
+        "    WITH UR;\n",
+    ]
+
+
+def c_source_lines(line_count: int = 3000, seed: int = 2) -> List[str]:
+    """Embedded SQL C (.sqc) source."""
+    rng = random.Random(seed)
+    tables, columns = evidence_vocabulary()
+    lines = ["#include <stdio.h>\n", "#define WCOM_SQLCODE_NOT_FOUND 100\n", "#define ACC_SQLCODE_DUP -803\n"]
+    while len(lines) < line_count:
+        kind = rng.randrange(6)
+        if kind == 0:
+            lines.extend(_sql_select(rng, tables, columns))
+        elif kind == 1:
+            lines.append(f"    /* {rng.choice(_JP_COMMENTS)} */\n")
+        elif kind == 2:
+            lines.append(f"    if (SQLCODE == {rng.choice(['-803', '-911', '100', '0'])}) {{\n")
+            lines.append(f'        LOG_PRINT(LOG_ERR, "SELECT {rng.choice(tables)} ERROR SQLCODE=%d KEY=%s", SQLCODE, h_key);\n')
+            lines.append("    }\n")
+        elif kind == 3:
+            lines.append(f"    rc = func_{rng.randrange(100)}(&h_{rng.randrange(50)}, {rng.randrange(1000)});\n")
+        elif kind == 4:
+            lines.append(f"    strcpy(h_key, \"{rng.choice(_JP_PARTS)}\");  // {rng.choice(_JP_COMMENTS)}\n")
+        else:
+            lines.append("\n")
+    return lines[:line_count]
+
+
+def java_source_lines(line_count: int = 3000, seed: int = 3) -> List[str]:
+    """Java DAO source building SQL with StringBuilder.append and string concatenation."""
+    rng = random.Random(seed)
+    tables, columns = evidence_vocabulary()
+    lines = ["package jp.example.dao;\n", "\n", "public class SampleDao {\n"]
+    while len(lines) < line_count - 1:
+        table = rng.choice(tables)
+        cols = rng.sample(columns[table], 3)
+        kind = rng.randrange(4)
+        if kind == 0:
+            lines.append("        StringBuilder sql = new StringBuilder();\n")
+            lines.append(f'        sql.append(" SELECT {cols[0]}, {cols[1]} AS VAL ");\n')
+            lines.append(f'        sql.append(" FROM {table} T ");\n')
+            lines.append(f'        sql.append(" WHERE T.{cols[2]} = ? ");\n')
+        elif kind == 1:
+            lines.append(f'        String sql = "UPDATE {table} SET {cols[0]} = ? " + "WHERE {cols[1]} = ?";\n')
+        elif kind == 2:
+            lines.append(f"        // {rng.choice(_JP_COMMENTS)}\n")
+            lines.append(f'        System.out.println("{rng.choice(_JP_COMMENTS)}");\n')
+        else:
+            lines.append(f"        int count{rng.randrange(100)} = dao.count(param);\n")
+    return lines[:line_count - 1] + ["}\n"]
+
+
+def sql_text(statement_count: int = 200, seed: int = 4) -> str:
+    """Plain SQL statements with table and column aliases."""
+    rng = random.Random(seed)
+    tables, columns = evidence_vocabulary()
+    statements = []
+    for _ in range(statement_count):
+        t1, t2 = rng.sample(tables, 2)
+        c1, c2 = rng.choice(columns[t1]), rng.choice(columns[t2])
+        statements.append(
+            f"SELECT A.{c1} AS V1, COUNT(B.{c2}) CNT FROM {t1} AS A JOIN {t2} B ON A.UPD_USER = B.UPD_USER "
+            f"WHERE A.DEL_FLG = '0' GROUP BY A.{c1} ORDER BY V1;"
+        )
+    return "\n".join(statements) + "\n"
+
+
+def shell_commands(command_count: int = 200, seed: int = 5) -> List[str]:
+    """db2 EXPORT / IMPORT lines of the .sh files handled by rule 28."""
+    rng = random.Random(seed)
+    tables, columns = evidence_vocabulary()
+    commands = []
+    for i in range(command_count):
+        table = rng.choice(tables)
+        cols = ", ".join(rng.sample(columns[table], 3))
+        if i % 2 == 0:
+            commands.append(
+                f'    db2 "EXPORT TO /work/out{i}.del OF DEL MODIFIED BY codepage=943 '
+                f'SELECT {cols} FROM {table} WHERE DEL_FLG = \'0\'" >> /work/log/export{i}.log\n'
+            )
+        else:
+            commands.append(f'    db2 "IMPORT FROM /work/in{i}.del OF DEL INSERT INTO {table}" > /work/log/import{i}.log\n')
+    return commands
+
+
+def edited_copies(lines: List[str], edit_count: int, seed: int = 6) -> Tuple[List[str], List[str]]:
+    """(changed, dest) copies of lines for a merge: changed has edit_count edited lines, dest is the original."""
+    rng = random.Random(seed)
+    changed = list(lines)
+    for index in rng.sample(range(len(lines)), min(edit_count, len(lines))):
+        changed[index] = changed[index].rstrip("\r\n") + " /* 修正 */\n"
+    return changed, list(lines)
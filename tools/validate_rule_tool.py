@@ -1,58 +1,64 @@
+import io
 import os
 import difflib
+import itertools
 import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
 import openpyxl
 
+XO_STATUS_X = "\u00d7"  # status of the cases to report
+PAIRS_PER_TASK = 50       # file pairs per worker task
+MIN_PARALLEL_PAIRS = 100  # fewer pairs are diffed in the current process
+
+_CAST_RE = re.compile(r'cast', re.IGNORECASE)
+
 def read_excel_data(excel_path):
-    wb = openpyxl.load_workbook(excel_path, data_only=True)
+    wb = openpyxl.load_workbook(excel_path, read_only=True, data_only=True)
     excel_data = {}
-    for sheet_name in ["SELECT", "INSERT", "UPDATE", "DELETE"]:
-        if sheet_name not in wb.sheetnames:
-            continue
-        sheet = wb[sheet_name]
-        data = {}
-        for row in sheet.iter_rows(min_row=2):  # B? header
-            b_val = row[1].value  # C?t B
-            l_val = row[11].value  # C?t L
-
-            if isinstance(b_val, str):
-                match = re.search(r'\d+', b_val)
-                if match:
-                    b_val = int(match.group())
-
-            if isinstance(b_val, int) and b_val >= 1:
-                data[b_val] = l_val
-        excel_data[sheet_name] = data
+    try:
+        for sheet_name in ["SELECT", "INSERT", "UPDATE", "DELETE"]:
+            if sheet_name not in wb.sheetnames:
+                continue
+            data = {}
+            for row in wb[sheet_name].iter_rows(min_row=2, values_only=True):  # B? header
+                b_val = row[1] if len(row) > 1 else None  # C?t B
+                l_val = row[11] if len(row) > 11 else None  # C?t L
+
+                if isinstance(b_val, str):
+                    match = re.search(r'\d+', b_val)
+                    if match:
+                        b_val = int(match.group())
+
+                if isinstance(b_val, int) and b_val >= 1:
+                    data[b_val] = l_val
+            excel_data[sheet_name] = data
+    finally:
+        wb.close()
     return excel_data
 
-def read_file_lines(file_path):
-    encodings = ['cp932', 'shift_jis', 'utf-8', 'euc_jp', 'latin-1']
-    for enc in encodings:
-        try:
-            with open(file_path, 'r', encoding=enc, errors='ignore', newline="") as f:
-                return f.readlines()
-        except Exception:
-            continue
+def decode_lines(content: bytes) -> List[str]:
+    # Lines as read by open(..., encoding='cp932', errors='ignore', newline="")
+    return io.StringIO(content.decode('cp932', errors='ignore'), newline="").readlines()
 
+def read_file_lines(file_path):
     try:
-        with open(file_path, 'rb', newline="") as f:
-            content = f.read()
-        return content.decode('cp932', errors='ignore').splitlines(True)
+        with open(file_path, 'rb') as f:
+            return decode_lines(f.read())
     except Exception:
         print(f"? Kh?ng th? ??c file: {file_path}")
         return []
 
-def find_cast_in_diff(file1_path, file2_path, folder_type, case_number, excel_status):
-    lines1 = read_file_lines(file1_path)
-    lines2 = read_file_lines(file2_path)
+def find_cast_in_lines(lines1, lines2, folder_type, case_number, excel_status):
     if not lines1 or not lines2:
-        return [], None
+        return [], []
 
-    diff = list(difflib.unified_diff(lines1, lines2, fromfile=file1_path, tofile=file2_path, lineterm=''))
     results = []
     result_logs = []
-    for line in diff:
-        if line.startswith(('+', '-')) and re.search(r'cast', line, re.IGNORECASE):
+    diff = difflib.unified_diff(lines1, lines2, lineterm='')
+    for line in itertools.islice(diff, 2, None):  # after the ---/+++ file headers
+        if line.startswith(('+', '-')) and _CAST_RE.search(line):
             clean_line = line[1:].strip()
             results.append(clean_line)
 
@@ -60,13 +66,39 @@ def find_cast_in_diff(file1_path, file2_path, folder_type, case_number, excel_st
 
     return (results, result_logs)
 
+def find_cast_in_diff(file1_path, file2_path, folder_type, case_number, excel_status):
+    return find_cast_in_lines(read_file_lines(file1_path), read_file_lines(file2_path), folder_type, case_number, excel_status)
+
+def find_cast_in_pair(base_path, after_path, folder_type, case_number, excel_status):
+    """find_cast_in_diff, without decoding or diffing a pair that cannot have a changed CAST line."""
+    try:
+        with open(base_path, 'rb') as f:
+            content1 = f.read()
+        with open(after_path, 'rb') as f:
+            content2 = f.read()
+    except OSError:
+        print(f"? Kh?ng th? ??c file: {base_path}")
+        return [], []
+    if content1 == content2:
+        return [], []
+    if b'cast' not in content1.lower() and b'cast' not in content2.lower():
+        return [], []
+    return find_cast_in_lines(decode_lines(content1), decode_lines(content2), folder_type, case_number, excel_status)
+
+def _find_cast_in_pairs(pairs):
+    return [find_cast_in_pair(*pair) for pair in pairs]
+
 def extract_case_number(folder_name):
     # H? tr? c? "No.30" v? "No_30"
     match = re.search(r'No[\._-]?\s*0*(\d+)', folder_name, re.IGNORECASE)
     return int(match.group(1)) if match else None
 
-def scan_folder_for_cast(folder_path, excel_data):
-    cast_reports = {}
+def is_reported_status(status) -> bool:
+    return str(status).strip() == XO_STATUS_X
+
+def list_cast_candidates(folder_path, excel_data) -> List[Tuple[str, str, Optional[str], Optional[int], object]]:
+    """(base path, _after path, folder type, case number, excel status) of the pairs whose status is reported."""
+    pairs = []
     for root, _, files in os.walk(folder_path):
         folder_type = None
         for key in excel_data.keys():
@@ -74,20 +106,39 @@ def scan_folder_for_cast(folder_path, excel_data):
                 folder_type = key
                 break
         case_number = extract_case_number(os.path.basename(root))
+        status = ""
+        if folder_type and case_number:
+            status = excel_data.get(folder_type, {}).get(case_number, "")
+        if not is_reported_status(status):
+            continue
         for file in files:
             if '_after' in file.lower():
                 continue
             base_path = os.path.join(root, file)
             name, ext = os.path.splitext(file)
-            after_file = name + '_after' + ext
-            after_path = os.path.join(root, after_file)
-
+            after_path = os.path.join(root, name + '_after' + ext)
             if os.path.exists(after_path):
-                status = ""
-                if folder_type and case_number:
-                    status = excel_data.get(folder_type, {}).get(case_number, "")
-                (cast_lines, cast_logs) = find_cast_in_diff(base_path, after_path, folder_type, case_number, status)
-                if cast_lines and ord(str(status).strip())== 215:
-                    cast_reports[base_path] = {"lines": cast_lines, "status": status}
-    return (cast_reports, cast_logs)
+                pairs.append((base_path, after_path, folder_type, case_number, status))
+    return pairs
 
+def scan_folder_for_cast(folder_path, excel_data, max_workers: Optional[int] = None):
+    """CAST lines added or removed in the _after files of the cases whose Excel status is x.
+
+    Pairs are diffed on max_workers processes (default: one per CPU) when there are many of them.
+    """
+    pairs = list_cast_candidates(folder_path, excel_data)
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers <= 1 or len(pairs) < MIN_PARALLEL_PAIRS:
+        results = _find_cast_in_pairs(pairs)
+    else:
+        chunks = [pairs[i:i + PAIRS_PER_TASK] for i in range(0, len(pairs), PAIRS_PER_TASK)]
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+            results = [result for chunk_results in executor.map(_find_cast_in_pairs, chunks) for result in chunk_results]
+
+    cast_reports: Dict[str, dict] = {}
+    cast_logs: List[str] = []
+    for (base_path, _, _, _, status), (cast_lines, logs) in zip(pairs, results):
+        if cast_lines:
+            cast_reports[base_path] = {"lines": cast_lines, "status": status}
+            cast_logs.extend(logs)
+    return (cast_reports, cast_logs)
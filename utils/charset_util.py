@@ -1,3 +1,6 @@
+import codecs
+import re
+from typing import Optional
 
 from charset_normalizer import from_bytes
 
@@ -88,10 +91,79 @@ def detect_encode_use_lib(content_bytes: bytes) -> str:
     # If no common encoding match, return best guess
     return normalize_encoding(results[0].encoding)
 
+# Byte structure of each encoding family, a superset of what its codecs decode.
+# Single bytes and lead bytes do not overlap, so the match never backtracks (one pass at C speed).
+SJIS_STRUCTURE = re.compile(rb'(?:[\x00-\x80\xa0-\xdf\xfd-\xff]++|[\x81-\x9f\xe0-\xfc][\x40-\x7e\x80-\xfc])*+')
+EUC_JP_STRUCTURE = re.compile(rb'(?:[\x00-\x7f]++|[\x8e\xa1-\xfe][\xa1-\xfe]|\x8f[\xa1-\xfe][\xa1-\xfe])*+')
+# Any non-ascii byte outside the half-width katakana range (A1-DF, single bytes in Shift_JIS)
+NON_KATAKANA_HIGH_BYTE = re.compile(rb'[\x80-\xa0\xe0-\xff]')
+HIGH_BYTE = re.compile(rb'[\x80-\xff]')
+STRUCTURE_BY_GROUP = {1: SJIS_STRUCTURE, 2: SJIS_STRUCTURE, 3: EUC_JP_STRUCTURE}
+
+SAMPLE_WINDOW_SIZE = 64 * 1024
+
+
+def _decodes(content_bytes: bytes, enc: str) -> bool:
+    try:
+        content_bytes.decode(enc)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def classify_encode(content_bytes: bytes) -> Optional[str]:
+    """
+    Classify bytes as ascii, utf-8(-sig), Shift_JIS family or EUC-JP family without charset_normalizer.
+    Returns None when the bytes are ambiguous (e.g. only half-width katakana) or none of them.
+    """
+    if content_bytes.isascii():
+        return 'ascii'
+    if content_bytes.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return None
+    if content_bytes.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig' if _decodes(content_bytes, 'utf-8-sig') else None
+    if _decodes(content_bytes, 'utf-8'):
+        return 'utf-8'
+
+    is_sjis = SJIS_STRUCTURE.fullmatch(content_bytes) is not None
+    is_euc = EUC_JP_STRUCTURE.fullmatch(content_bytes) is not None
+    if is_sjis and is_euc:
+        # Shift_JIS text valid as EUC-JP has no hiragana/kanji lead bytes (81-9F), only katakana pairs
+        if not NON_KATAKANA_HIGH_BYTE.search(content_bytes):
+            return None
+        is_sjis = False
+    candidates = ['cp932', 'shift_jisx0213'] if is_sjis else ['euc-jp', 'euc_jis_2004'] if is_euc else []
+    return next((enc for enc in candidates if _decodes(content_bytes, enc)), None)
+
+
+def sample_window(content_bytes: bytes, size: int = SAMPLE_WINDOW_SIZE) -> bytes:
+    """Whole lines around the first non-ascii byte, at most size bytes."""
+    if len(content_bytes) <= size or content_bytes.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return content_bytes[:size]
+    first = HIGH_BYTE.search(content_bytes)
+    start = content_bytes.rfind(b'\n', 0, first.start()) + 1 if first else 0
+    end = content_bytes.rfind(b'\n', start, start + size)
+    return content_bytes[start:end + 1] if end > start else content_bytes[start:start + size]
+
+
+def detect_encode_by_bytes(content_bytes: bytes) -> str:
+    """Same result type as detect_encode_use_lib, charset_normalizer only runs on a sample when classify_encode is not sure."""
+    return classify_encode(content_bytes) or detect_encode_use_lib(sample_window(content_bytes))
+
+
 def detect_encode(content_bytes: bytes) -> str:
     encoding = None
+    if content_bytes.isascii():
+        return common_encodings[0]
+    structure_valid = {}
     # Try common encodings first
     for enc in common_encodings:
+        structure = STRUCTURE_BY_GROUP.get(ENCODE_GROUPS.get(enc))
+        if structure is not None:
+            if structure not in structure_valid:
+                structure_valid[structure] = structure.fullmatch(content_bytes) is not None
+            if not structure_valid[structure]:
+                continue
         try:
             _ = content_bytes.decode(enc)
             encoding = enc
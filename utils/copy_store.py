@@ -0,0 +1,163 @@
+"""Content-addressed store used to create the item files.
+
+Each distinct file content is stored once as a blob (named by its sha256) and materialized in
+the item folders as a hardlink (files that are only read) or a reflink (files that are edited,
+copy-on-write on btrfs/xfs). Where the filesystem supports neither, the blob is copied.
+Blobs are read-only, and so are their hardlinks (the mode belongs to the file, not to the link):
+linked files must be unshared with break_link() before they are modified in place, and removed
+with remove_link().
+"""
+import hashlib
+import os
+import shutil
+import stat
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from config import COPY_STORE_PATH
+
+STORE_DIR_NAME = ".copy_store"
+
+METHOD_LINK = "link"
+METHOD_REFLINK = "reflink"
+METHOD_COPY = "copy"
+
+FICLONE = 0x40049409  # linux/fs.h
+
+BLOB_MODE = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+
+
+def _reflink(src: str, dest: str):
+    import fcntl  # POSIX only, ImportError falls back to copy
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdest:
+        try:
+            fcntl.ioctl(fdest.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdest.close()
+            os.remove(dest)
+            raise
+
+
+def _make_writable(file_path: str | Path):
+    os.chmod(file_path, stat.S_IMODE(os.stat(file_path).st_mode) | stat.S_IWUSR)
+
+
+def remove_link(file_path: str | Path):
+    """Remove a file, also a read-only link to a blob (Windows does not delete read-only files)."""
+    try:
+        os.remove(file_path)
+    except PermissionError:
+        if os.name != "nt":
+            raise
+        # this also makes the blob writable, CopyStore.put checks it before using it again
+        _make_writable(file_path)
+        os.remove(file_path)
+
+
+def break_link(file_path: str | Path):
+    """Give a hardlinked file its own writable copy of the content, so writing it does not change the blob and the other links."""
+    try:
+        file_stat = os.stat(file_path)
+    except OSError:
+        return
+    if file_stat.st_nlink <= 1:
+        if not file_stat.st_mode & stat.S_IWUSR:
+            _make_writable(file_path)  # link to a blob that was deleted since
+        return
+    tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    shutil.copy2(file_path, tmp_path)
+    _make_writable(tmp_path)
+    if os.name == "nt":
+        remove_link(file_path)  # a read-only file can not be replaced either
+    os.replace(tmp_path, file_path)
+
+
+class CopyStore:
+    def __init__(self, store_path: str):
+        self.store_path = store_path
+        self._digests: Dict[Tuple[str, int, int], str] = {}  # (path, size, mtime_ns) -> sha256
+        self._lock = threading.Lock()
+
+    def _digest(self, src_path: str) -> str:
+        file_stat = os.stat(src_path)
+        key = (os.path.abspath(src_path), file_stat.st_size, file_stat.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(key)
+        if digest is None:
+            sha256 = hashlib.sha256()
+            with open(src_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    sha256.update(chunk)
+            digest = sha256.hexdigest()
+            with self._lock:
+                self._digests[key] = digest
+        return digest
+
+    def _blob_intact(self, blob_path: str, digest: str, size: int) -> bool:
+        try:
+            blob_stat = os.stat(blob_path)
+        except OSError:
+            return False
+        if blob_stat.st_size != size:
+            return False
+        if blob_stat.st_mode & stat.S_IWUSR:
+            # made writable (e.g. by remove_link on Windows), so it may have been written since
+            if self._digest(blob_path) != digest:
+                return False
+            os.chmod(blob_path, BLOB_MODE)
+        return True
+
+    def put(self, src_path: str) -> str:
+        """Store the content of src_path (once) and return the blob path."""
+        digest = self._digest(src_path)
+        blob_path = os.path.join(self.store_path, digest[:2], digest)
+        if not self._blob_intact(blob_path, digest, os.stat(src_path).st_size):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            tmp_path = f"{blob_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            shutil.copyfile(src_path, tmp_path)
+            os.chmod(tmp_path, BLOB_MODE)
+            if os.name == "nt" and os.path.exists(blob_path):
+                remove_link(blob_path)
+            os.replace(tmp_path, blob_path)
+        return blob_path
+
+    def materialize(self, src_path: str, dest_path: str, editable: bool = False) -> str:
+        """Create dest_path with the content of src_path. Returns the method used (link, reflink or copy).
+
+        Linked files are read-only. editable files are never hardlinked, as editors and tools rewrite
+        them in place, and get the mode of src_path like a copy.
+        """
+        blob_path = self.put(src_path)
+        if os.path.lexists(dest_path):
+            # never write through an existing (possibly linked) file
+            remove_link(dest_path)
+        if not editable:
+            try:
+                os.link(blob_path, dest_path)
+                return METHOD_LINK
+            except OSError:
+                pass
+        try:
+            _reflink(blob_path, dest_path)
+            method = METHOD_REFLINK
+        except (ImportError, OSError):
+            shutil.copyfile(blob_path, dest_path)
+            method = METHOD_COPY
+        shutil.copymode(src_path, dest_path)
+        return method
+
+
+_stores: Dict[str, CopyStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(output_root_path: Optional[str] = None) -> CopyStore:
+    """Store next to the output folder (hardlinks need the same filesystem), or COPY_STORE_PATH if set."""
+    store_path = COPY_STORE_PATH or os.path.join(output_root_path or ".", STORE_DIR_NAME)
+    store_path = str(Path(store_path).resolve())
+    with _stores_lock:
+        store = _stores.get(store_path)
+        if store is None:
+            store = _stores[store_path] = CopyStore(store_path)
+    return store
@@ -0,0 +1,111 @@
+"""Disk cache of detected file encodings, shared by all sessions and worker processes.
+
+Entries are keyed by file path, size, mtime and content sha256. A file whose content was
+already detected under another path (e.g. the item copies of one source file) is found by
+its hash without running the detection again.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+from config import ENCODING_CACHE_PATH
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS file_encoding (
+        path TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        sha256 TEXT NOT NULL,
+        encoding TEXT,
+        detected_encoding TEXT,
+        final_encoding TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS file_encoding_sha256 ON file_encoding (sha256)",
+)
+_COLUMNS = "encoding, detected_encoding, final_encoding"
+
+
+@dataclass(frozen=True)
+class CachedEncoding:
+    encoding: Optional[str]           # charset_util.detect_encode result, None if no common encoding decodes the file
+    detected_encoding: Optional[str]  # charset_util.detect_encode_by_bytes result
+    final_encoding: str               # encoding used to read the file
+
+
+# sqlite connections can not be shared between threads (Streamlit runs each session in its own thread)
+_local = threading.local()
+
+
+def _connection(cache_path: str = ENCODING_CACHE_PATH) -> Optional[sqlite3.Connection]:
+    conn = getattr(_local, "conn", None)
+    if conn is None and not getattr(_local, "disabled", False):
+        try:
+            Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(cache_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            _local.conn = conn
+        except (OSError, sqlite3.Error):
+            # read-only or broken cache location: detect without cache
+            _local.disabled = True
+            conn = None
+    return conn
+
+
+def _fetch(conn: sqlite3.Connection, where: str, params: tuple) -> Optional[CachedEncoding]:
+    try:
+        row = conn.execute(f"SELECT {_COLUMNS} FROM file_encoding WHERE {where} LIMIT 1", params).fetchone()
+    except sqlite3.Error:
+        return None
+    return CachedEncoding(*row) if row else None
+
+
+def _store(conn: sqlite3.Connection, path: str, stat: os.stat_result, sha256: str, result: CachedEncoding):
+    try:
+        with conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO file_encoding (path, size, mtime_ns, sha256, {_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, sha256, result.encoding, result.detected_encoding, result.final_encoding),
+            )
+    except sqlite3.Error:
+        pass
+
+
+def get_or_detect(
+    file_path: str | Path,
+    detect: Callable[[bytes], CachedEncoding],
+    need_raw: bool = False,
+) -> Tuple[CachedEncoding, Optional[bytes]]:
+    """Return (cached or detected encoding, file bytes). The bytes are None when they were not read."""
+    path = str(Path(file_path).resolve())
+    stat = os.stat(path)
+    conn = _connection()
+
+    result = _fetch(conn, "path = ? AND size = ? AND mtime_ns = ?", (path, stat.st_size, stat.st_mtime_ns)) if conn else None
+    if result and not need_raw:
+        return result, None
+
+    raw = Path(path).read_bytes()
+    if result:
+        return result, raw
+
+    sha256 = hashlib.sha256(raw).hexdigest()
+    result = _fetch(conn, "sha256 = ?", (sha256,)) if conn else None
+    if result is None:
+        result = detect(raw)
+    if conn:
+        _store(conn, path, stat, sha256, result)
+    return result, raw
+
+
+def clear():
+    conn = _connection()
+    if conn:
+        with conn:
+            conn.execute("DELETE FROM file_encoding")
@@ -1,11 +1,32 @@
 from typing import List
+import openpyxl
 import pandas as pd
 import xlwings as xw
 from pathlib import Path
-from config import SHEET_CONFIG_MAP
+from config import SHEET_CONFIG_MAP, EXCEL_BACKEND
+from utils import copy_store
 
 SHEET_NAME_DEFAULT = 'Sheet1'
 
+EXCEL_BACKEND_XLWINGS = 'xlwings'
+EXCEL_BACKEND_OPENPYXL = 'openpyxl'
+EXCEL_BACKEND_OPTIONS = [EXCEL_BACKEND_XLWINGS, EXCEL_BACKEND_OPENPYXL]
+
+
+class OpenpyxlApp:
+    """Stand-in for xw.App: filter_excel uses openpyxl instead of a live Excel instance."""
+
+    def quit(self):
+        pass
+
+
+def create_excel_app(backend: str = EXCEL_BACKEND):
+    if backend == EXCEL_BACKEND_OPENPYXL:
+        return OpenpyxlApp()
+    if backend == EXCEL_BACKEND_XLWINGS:
+        return xw.App(visible=False)
+    raise ValueError(f"value backend: {backend}, backend must be one of {EXCEL_BACKEND_OPTIONS}")
+
 def col_letter_to_index(letter):
     return ord(letter.upper()) - ord('A')
 
@@ -19,7 +40,17 @@ def exist_default_sheet_name(sheets) -> bool:
             return True
     return False
 
+def is_dropped_sheet(sheet_name: str, system_types: List[int]) -> bool:
+    sheet_name = sheet_name.lower()
+    if sheet_name.startswith("type") and not any(sheet_name.startswith(f"type{system_type}") for system_type in system_types):
+        return True
+    return sheet_name not in SHEET_CONFIG_MAP and sheet_name != SHEET_NAME_DEFAULT.lower()
+
 def filter_excel(app: xw.App, excel_path, filter_values,  system_types: List[int]):
+    # the item evidence workbook may be a hardlink to the copy store
+    copy_store.break_link(excel_path)
+    if isinstance(app, OpenpyxlApp):
+        return filter_excel_openpyxl(excel_path, filter_values, system_types)
     input_path = Path(excel_path).resolve()
     wb = app.books.open(str(input_path))
     try:
@@ -28,17 +59,7 @@ def filter_excel(app: xw.App, excel_path, filter_values,  system_types: List[int
         # sheets = wb.sheets if sheet_names is None else [wb.sheets[name] for name in sheet_names]
         for sheet in wb.sheets:
             sheet_name: str = sheet.name.lower()
-            if sheet_name.startswith("type"):
-                match = False
-                for system_type in system_types:
-                    if sheet_name.startswith(f"type{system_type}"):
-                        match = True
-                        break
-                if not match:
-                    sheet.delete()
-                    continue
-                
-            if sheet_name not in SHEET_CONFIG_MAP and sheet_name != SHEET_NAME_DEFAULT.lower():
+            if is_dropped_sheet(sheet_name, system_types):
                 sheet.delete()
                 continue
             if sheet_name == SHEET_NAME_DEFAULT.lower():
@@ -83,6 +104,60 @@ def filter_excel(app: xw.App, excel_path, filter_values,  system_types: List[int
         wb.close()
 
 
+def filter_excel_openpyxl(excel_path, filter_values, system_types: List[int]):
+    """Same result as filter_excel without Excel: values are rewritten in place, so cell styles stay as they are.
+
+    Like the xlwings path only the filtered data range is rewritten (with the cell values Excel last calculated);
+    formulas elsewhere in the workbook are kept.
+    """
+    input_path = Path(excel_path).resolve()
+    wb = openpyxl.load_workbook(str(input_path))
+    values_wb = openpyxl.load_workbook(str(input_path), data_only=True, read_only=True)
+    try:
+        if not any(ws.title.lower() == SHEET_NAME_DEFAULT.lower() for ws in wb.worksheets):
+            wb.create_sheet(SHEET_NAME_DEFAULT)
+        for ws in list(wb.worksheets):
+            sheet_name = ws.title.lower()
+            if is_dropped_sheet(sheet_name, system_types):
+                wb.remove(ws)
+                continue
+            if sheet_name == SHEET_NAME_DEFAULT.lower():
+                continue
+
+            cfg = SHEET_CONFIG_MAP[sheet_name]
+            header_rows = cfg["number_header_rows"]
+            max_row = min(cfg["num_rows"], ws.max_row)
+            max_col = min(cfg["num_cols"], ws.max_column)
+            filter_indices = [col_letter_to_index(c) for c in cfg["filter_columns"]]
+
+            # Filter rows
+            data_rows = list(values_wb[ws.title].iter_rows(min_row=header_rows + 1, max_row=max_row, max_col=max_col, values_only=True))
+            filtered_data = [
+                row for row in data_rows
+                if all(str(row[idx] if idx < len(row) else None).strip().upper() in filter_values for idx in filter_indices)
+            ]
+
+            if not filtered_data:
+                # Delete the sheet if no rows match
+                wb.remove(ws)
+                continue
+
+            # Write filtered data right below the headers, clear the remaining rows
+            for row_offset in range(len(data_rows)):
+                values = filtered_data[row_offset] if row_offset < len(filtered_data) else ()
+                for col_idx in range(max_col):
+                    ws.cell(row=header_rows + 1 + row_offset, column=col_idx + 1).value = values[col_idx] if col_idx < len(values) else None
+
+        if len(wb.worksheets) > 1:
+            default_ws = next(ws for ws in wb.worksheets if ws.title.lower() == SHEET_NAME_DEFAULT.lower())
+            wb.remove(default_ws)  # Remove the default sheet if it exists
+        values_wb.close()  # a read-only workbook keeps its file open, which blocks the save on Windows
+        wb.save(str(input_path))
+    finally:
+        values_wb.close()
+        wb.close()
+
+
 def filter_and_copy_evidence_data(app: xw.App, input_excel, output_excel, sheet_names=None, filter_values=set()):
     input_path = Path(input_excel).resolve()
     output_path = Path(output_excel).resolve()
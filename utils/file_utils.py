@@ -1,26 +1,23 @@
 
 
 # === FILE FINDER ===
-from pathlib import Path
 from typing import List, Set
 
+from utils import copy_store, workspace_catalog
+
 def get_target_files(root_path: str, suffixes: List[str]) -> List[str]:
-    root = Path(root_path)
-    return [str(p.resolve()) for p in root.rglob('*') if p.is_file() and any(p.name.lower().endswith(suf) for suf in suffixes)]
+    return workspace_catalog.get_catalog(root_path).files(suffixes)
 
 
 def get_files_by_suffixes(root_path: str,  suffixes: Set[str]) -> List[str]:
-    suffixes = {suf.strip().lower() for suf in suffixes}
-    root = Path(root_path)
-    files = [str(p.resolve()) for p in root.rglob('*') if p.is_file() and p.name.lower().endswith(tuple(suffixes))]
-    return files
+    return workspace_catalog.get_catalog(root_path).files(suffixes)
 
 
 def del_files_by_paths(file_paths: List[str]) ->  List[str]:
     errors = []
     for file_path in file_paths:
         try:
-            Path(file_path).unlink()
+            copy_store.remove_link(file_path)
             # os.remove(file_path)
         except Exception as e:
             errors.append(f"Error deleting file {file_path}: {e}")
@@ -1,4 +1,5 @@
 import re
+from utils import common_util
 
 def parse_item_list(text_area_input):
     """Parses the item list from the text area input.
@@ -18,4 +19,44 @@ def parse_item_list(text_area_input):
             errors.append(f"Line {idx} is invalid: {line}")
             continue
         items.append(parts)
-    return items, errors
\ No newline at end of file
+    return items, errors
+
+def parse_replace_item_list(text_area_input):
+    """Parses the Auto Replace item list (NO, FILE_PATH, FILE_NAME, START_LINE, END_LINE, ..., TABLE_NAMES).
+
+    Args:
+        text_area_input: The raw text input (tab or comma separated).
+
+    Returns:
+        A tuple containing a list of (item_no, file_name, code_block_lines, extra_tables) and a list of errors.
+    """
+    items = []
+    errors = []
+    raw_lines = text_area_input.strip().splitlines()
+    for idx, raw_line in enumerate(raw_lines, start=1):
+        line = raw_line.strip().replace('\t', ',')
+        parts = re.split(r'[,]+', line)
+        if len(parts) < 5:
+            errors.append(f"Line {idx} invalid: {raw_line}")
+            continue
+        item_no = parts[0]
+        file_name = parts[2]
+        code_block_lines = []
+        # parsing line ranges
+        i = 3
+        while i + 1 < len(parts):
+            start_line = common_util.parse_int(parts[i])
+            end_line = common_util.parse_int(parts[i + 1])
+            if start_line == -1 or end_line == -1:
+                break
+            if start_line > end_line:
+                errors.append(f"Line {idx} has invalid, start_line {start_line} > end_line {end_line}: {raw_line}")
+                break
+            code_block_lines.append((start_line, end_line))
+            i += 2
+        if not code_block_lines:
+            errors.append(f"Line {idx} has no valid line ranges: {raw_line}")
+            continue
+        extra_tables = [str(table_name) for table_name in parts[i:]]
+        items.append((item_no, file_name, code_block_lines, extra_tables))
+    return items, errors
@@ -0,0 +1,261 @@
+"""SQLite store of the background jobs, shared by all sessions and processes (see logic.jobs).
+
+A job row holds the tab action, its parameters (JSON) and its progress; every finished item of a
+job is a job_item row, so a job that is resumed knows which items it already did.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Set
+
+from config import JOB_STORE_PATH
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_CANCELLING = "cancelling"
+STATUS_CANCELLED = "cancelled"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"            # the job stopped on an error (not an item error)
+STATUS_INTERRUPTED = "interrupted"  # the process running the job stopped
+
+ITEM_STATUS_ERROR = "error"  # item status counted in Job.errors and run again when the job is resumed
+
+ACTIVE_STATUSES = (STATUS_RUNNING, STATUS_CANCELLING)
+RESUMABLE_STATUSES = (STATUS_CANCELLED, STATUS_FAILED, STATUS_INTERRUPTED)
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS job (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        title TEXT NOT NULL,
+        params TEXT NOT NULL,
+        status TEXT NOT NULL,
+        message TEXT NOT NULL DEFAULT '',
+        total INTEGER NOT NULL DEFAULT 0,
+        done INTEGER NOT NULL DEFAULT 0,
+        errors INTEGER NOT NULL DEFAULT 0,
+        run_done INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL,
+        heartbeat REAL,
+        worker TEXT NOT NULL DEFAULT ''
+    )""",
+    """CREATE TABLE IF NOT EXISTS job_item (
+        job_id INTEGER NOT NULL,
+        item_key TEXT NOT NULL,
+        status TEXT NOT NULL,
+        message TEXT NOT NULL DEFAULT '',
+        elapsed REAL NOT NULL DEFAULT 0,
+        result TEXT NOT NULL DEFAULT '{}',
+        finished_at REAL NOT NULL,
+        PRIMARY KEY (job_id, item_key)
+    )""",
+    "CREATE INDEX IF NOT EXISTS job_status ON job (status)",
+)
+_COLUMNS = "id, kind, title, params, status, message, total, done, errors, run_done, created_at, started_at, finished_at, heartbeat, worker"
+
+
+@dataclass
+class Job:
+    id: int
+    kind: str
+    title: str
+    params: dict
+    status: str
+    message: str
+    total: int
+    done: int        # items finished, over all runs
+    errors: int
+    run_done: int    # items already finished when the current run started
+    created_at: float
+    started_at: Optional[float]
+    finished_at: Optional[float]
+    heartbeat: Optional[float]
+    worker: str
+
+    @property
+    def progress(self) -> float:
+        return min(self.done / self.total, 1.0) if self.total else 0.0
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        """Remaining time at the item rate of the current run, None until an item of the run is finished."""
+        done_in_run = self.done - self.run_done
+        if self.status not in ACTIVE_STATUSES or not self.started_at or done_in_run <= 0 or not self.total:
+            return None
+        rate = done_in_run / max(time.time() - self.started_at, 1e-6)
+        return max(self.total - self.done, 0) / rate
+
+
+@dataclass
+class JobItem:
+    item_key: str
+    status: str
+    message: str
+    elapsed: float
+    result: dict
+    finished_at: float
+
+
+def _job(row) -> Job:
+    values = list(row)
+    values[3] = json.loads(values[3])
+    return Job(*values)
+
+
+# sqlite connections can not be shared between threads (Streamlit runs each session in its own thread)
+_local = threading.local()
+
+
+def _connection(store_path: str = JOB_STORE_PATH) -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        Path(store_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(store_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+        _local.conn = conn
+    return conn
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+
+
+def submit(kind: str, title: str, params: dict) -> int:
+    conn = _connection()
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO job (kind, title, params, status, created_at) VALUES (?, ?, ?, ?, ?)",
+            (kind, title, json.dumps(params, ensure_ascii=False), STATUS_QUEUED, time.time()),
+        )
+    return cursor.lastrowid
+
+
+def get(job_id: int) -> Optional[Job]:
+    row = _connection().execute(f"SELECT {_COLUMNS} FROM job WHERE id = ?", (job_id,)).fetchone()
+    return _job(row) if row else None
+
+
+def list_jobs(limit: int = 50) -> List[Job]:
+    rows = _connection().execute(f"SELECT {_COLUMNS} FROM job ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    return [_job(row) for row in rows]
+
+
+def items(job_id: int) -> List[JobItem]:
+    rows = _connection().execute(
+        "SELECT item_key, status, message, elapsed, result, finished_at FROM job_item WHERE job_id = ? ORDER BY finished_at",
+        (job_id,),
+    ).fetchall()
+    return [JobItem(key, status, message, elapsed, json.loads(result), finished_at) for key, status, message, elapsed, result, finished_at in rows]
+
+
+def finished_keys(job_id: int) -> Set[str]:
+    """Items of the job that do not need to run again (items in error do)."""
+    rows = _connection().execute("SELECT item_key FROM job_item WHERE job_id = ? AND status != ?", (job_id, ITEM_STATUS_ERROR))
+    return {row[0] for row in rows}
+
+
+def mark_interrupted(stale_seconds: float):
+    """Jobs whose runner stopped sending heartbeats can be resumed."""
+    conn = _connection()
+    with conn:
+        conn.execute(
+            "UPDATE job SET status = ?, message = 'runner stopped', finished_at = ? WHERE status IN (?, ?) AND heartbeat < ?",
+            (STATUS_INTERRUPTED, time.time(), *ACTIVE_STATUSES, time.time() - stale_seconds),
+        )
+
+
+def claim_next(worker: str) -> Optional[Job]:
+    """Take the oldest queued job for worker. Returns None when no job is queued."""
+    conn = _connection()
+    while True:
+        row = conn.execute("SELECT id FROM job WHERE status = ? ORDER BY id LIMIT 1", (STATUS_QUEUED,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        with conn:
+            # only one runner wins a job, even across processes
+            claimed = conn.execute(
+                "UPDATE job SET status = ?, worker = ?, started_at = ?, heartbeat = ?, finished_at = NULL, run_done = done, message = '' "
+                "WHERE id = ? AND status = ?",
+                (STATUS_RUNNING, worker, now, now, row[0], STATUS_QUEUED),
+            ).rowcount
+        if claimed:
+            return get(row[0])
+
+
+def heartbeat(job_id: int):
+    conn = _connection()
+    with conn:
+        conn.execute("UPDATE job SET heartbeat = ? WHERE id = ?", (time.time(), job_id))
+
+
+def set_total(job_id: int, total: int):
+    conn = _connection()
+    with conn:
+        conn.execute("UPDATE job SET total = ? WHERE id = ?", (total, job_id))
+
+
+def record_item(job_id: int, item_key: str, status: str, message: str = "", elapsed: float = 0.0, result: Optional[dict] = None):
+    conn = _connection()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO job_item (job_id, item_key, status, message, elapsed, result, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, item_key, status, message, elapsed, json.dumps(result or {}, ensure_ascii=False, default=str), time.time()),
+        )
+        conn.execute(
+            "UPDATE job SET done = (SELECT COUNT(*) FROM job_item WHERE job_id = ?), "
+            "errors = (SELECT COUNT(*) FROM job_item WHERE job_id = ? AND status = ?), heartbeat = ? WHERE id = ?",
+            (job_id, job_id, ITEM_STATUS_ERROR, time.time(), job_id),
+        )
+
+
+def is_cancel_requested(job_id: int) -> bool:
+    row = _connection().execute("SELECT status FROM job WHERE id = ?", (job_id,)).fetchone()
+    return row is None or row[0] == STATUS_CANCELLING
+
+
+def request_cancel(job_id: int) -> bool:
+    """Cancel a queued job now, a running one after its current items. Returns False if the job is not queued or running."""
+    conn = _connection()
+    now = time.time()
+    with conn:
+        changed = conn.execute(
+            "UPDATE job SET status = ?, finished_at = ? WHERE id = ? AND status = ?", (STATUS_CANCELLED, now, job_id, STATUS_QUEUED)
+        ).rowcount
+        changed += conn.execute(
+            "UPDATE job SET status = ? WHERE id = ? AND status = ?", (STATUS_CANCELLING, job_id, STATUS_RUNNING)
+        ).rowcount
+    return bool(changed)
+
+
+def resume(job_id: int) -> bool:
+    """Queue a cancelled, failed or interrupted job again; it skips the items it already finished without error."""
+    conn = _connection()
+    with conn:
+        changed = conn.execute(
+            f"UPDATE job SET status = ?, message = '' WHERE id = ? AND status IN ({', '.join('?' * len(RESUMABLE_STATUSES))})",
+            (STATUS_QUEUED, job_id, *RESUMABLE_STATUSES),
+        ).rowcount
+    return bool(changed)
+
+
+def finish(job_id: int, worker: str, status: str, message: str = "") -> bool:
+    """End the run of worker. Returns False, and changes nothing, when the job is no longer run by worker
+    (it was taken for interrupted, and maybe resumed and claimed by another runner since)."""
+    conn = _connection()
+    with conn:
+        changed = conn.execute(
+            "UPDATE job SET status = ?, message = ?, finished_at = ? WHERE id = ? AND worker = ? AND status IN (?, ?)",
+            (status, message, time.time(), job_id, worker, *ACTIVE_STATUSES),
+        ).rowcount
+    return bool(changed)
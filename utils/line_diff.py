@@ -0,0 +1,78 @@
+"""Line diff on interned line ids (Myers, O((N+M)D) after trimming the common prefix and suffix)."""
+import difflib
+from typing import Dict, List, Sequence, Tuple
+
+# Above this many edits the Myers trace gets large, use SequenceMatcher instead
+MAX_EDIT_DISTANCE = 2000
+
+
+def intern_lines(a_lines: Sequence[str], b_lines: Sequence[str]) -> Tuple[List[int], List[int]]:
+    ids: Dict[str, int] = {}
+    return [ids.setdefault(line, len(ids)) for line in a_lines], [ids.setdefault(line, len(ids)) for line in b_lines]
+
+
+def inserted_indices(a_lines: Sequence[str], b_lines: Sequence[str]) -> List[int]:
+    """Indices (ascending) of the lines of b that are added or changed compared to a, i.e. the '+ ' lines of ndiff."""
+    a, b = intern_lines(a_lines, b_lines)
+    start = 0
+    end_a, end_b = len(a), len(b)
+    while start < end_a and start < end_b and a[start] == b[start]:
+        start += 1
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    a, b = a[start:end_a], b[start:end_b]
+    inserted = _inserted(a, b)
+    if len(a) == len(b):
+        # Lines replaced in place: among diffs of the same size prefer the one pairing line i with line i
+        in_place = [j for j in range(len(b)) if a[j] != b[j]]
+        if len(in_place) <= len(inserted):
+            inserted = in_place
+    return [start + j for j in inserted]
+
+
+def _inserted(a: List[int], b: List[int]) -> List[int]:
+    n, m = len(a), len(b)
+    if n == 0:
+        return list(range(m))
+    if m == 0:
+        return []
+
+    v = {1: 0}
+    trace = []
+    for d in range(min(n + m, MAX_EDIT_DISTANCE) + 1):
+        trace.append(v.copy())
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                return _backtrack(trace, n, m)
+
+    matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    return [j for tag, _, _, j1, j2 in matcher.get_opcodes() if tag in ("replace", "insert") for j in range(j1, j2)]
+
+
+def _backtrack(trace: List[Dict[int, int]], x: int, y: int) -> List[int]:
+    inserted = []
+    for d in range(len(trace) - 1, 0, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k - 1] < v[k + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[prev_k]
+        prev_y = prev_x - prev_k
+        if x - prev_x == y - prev_y - 1:
+            # one step down (insertion of b[prev_y]) followed by the diagonal
+            inserted.append(prev_y)
+        x, y = prev_x, prev_y
+    inserted.reverse()
+    return inserted
@@ -0,0 +1,183 @@
+"""Line access to large source files without reading or rewriting them as text.
+
+Files are memory-mapped, and the start offsets of their lines are indexed once per file version
+(path, size, mtime, inode, ctime). Lines are split like open(..., newline="").readlines() (\\r\\n, \\r and \\n).
+Only the requested lines are decoded. splice_lines copies the unchanged byte ranges as they are
+and encodes only the new lines.
+
+Encodings where a line can not be cut on its raw bytes (BOM or stateful encodings such as
+utf-16 and iso2022-jp) fall back to reading and writing the whole file as text.
+"""
+import codecs
+import io
+import mmap
+import os
+import shutil
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MAX_CACHED_INDEXES = 64
+
+_BYTE_SPLIT_UNSAFE = ("utf-8-sig", "utf-16", "utf-32", "utf-7", "iso2022", "hz")
+
+# path -> (file version, line start offsets)
+_indexes: Dict[str, Tuple[Tuple[int, int, int, int], np.ndarray]] = {}
+_indexes_lock = threading.Lock()
+
+
+def is_byte_splittable(encoding: str) -> bool:
+    """True if the lines of a file in this encoding can be cut on the \\r and \\n bytes and decoded one by one."""
+    try:
+        name = codecs.lookup(encoding).name
+    except LookupError:
+        return False
+    return not name.startswith(_BYTE_SPLIT_UNSAFE) and "\r\n".encode(encoding) == b"\r\n"
+
+
+def _line_starts(data: np.ndarray) -> np.ndarray:
+    size = len(data)
+    ends = np.flatnonzero(data == 0x0A) + 1
+    cr = np.flatnonzero(data == 0x0D)
+    if len(cr):
+        # a \r is a line end unless it is followed by \n
+        next_pos = np.minimum(cr + 1, size - 1)
+        lone_cr = cr[(cr + 1 == size) | (data[next_pos] != 0x0A)]
+        ends = np.union1d(ends, lone_cr + 1)
+    return np.concatenate(([0], ends[ends < size])).astype(np.int64)
+
+
+def _version(stat: os.stat_result) -> Tuple[int, int, int, int]:
+    # inode and ctime change when a file is replaced or rewritten, even where mtimes are coarse (FAT, SMB)
+    return (stat.st_size, stat.st_mtime_ns, stat.st_ino, stat.st_ctime_ns)
+
+
+def _forget(file_path: str):
+    with _indexes_lock:
+        _indexes.pop(os.path.abspath(file_path), None)
+
+
+def _get_line_starts(file_path: str, mm: mmap.mmap, stat: os.stat_result) -> np.ndarray:
+    key = os.path.abspath(file_path)
+    version = _version(stat)
+    with _indexes_lock:
+        cached = _indexes.get(key)
+    if cached and cached[0] == version:
+        return cached[1]
+    starts = _line_starts(np.frombuffer(mm, dtype=np.uint8))
+    with _indexes_lock:
+        _indexes.pop(key, None)
+        while len(_indexes) >= MAX_CACHED_INDEXES:
+            _indexes.pop(next(iter(_indexes)))
+        _indexes[key] = (version, starts)
+    return starts
+
+
+class LineFile:
+    """Read-only line view of a file. Use as a context manager, the file stays mapped until exit."""
+
+    def __init__(self, file_path: str, encoding: str):
+        self.file_path = str(file_path)
+        self.encoding = encoding
+        self._file = None
+        self._mm: Optional[mmap.mmap] = None
+        self._starts: Optional[np.ndarray] = None
+        self._text_lines: Optional[List[str]] = None  # fallback for encodings that can not be cut on bytes
+        self.size = 0
+
+    def __enter__(self) -> "LineFile":
+        if not is_byte_splittable(self.encoding):
+            with open(self.file_path, "r", encoding=self.encoding, newline="") as f:
+                self._text_lines = f.readlines()
+            return self
+        self._file = open(self.file_path, "rb")
+        stat = os.fstat(self._file.fileno())
+        self.size = stat.st_size
+        if self.size == 0:
+            self._starts = np.zeros(0, dtype=np.int64)
+        else:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._starts = _get_line_starts(self.file_path, self._mm, stat)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def line_count(self) -> int:
+        return len(self._text_lines) if self._text_lines is not None else len(self._starts)
+
+    def offset(self, index: int) -> int:
+        """Byte offset where line index starts (the file size past the last line)."""
+        return int(self._starts[index]) if index < len(self._starts) else self.size
+
+    def line(self, index: int) -> str:
+        """Line index (0-based) with its line break. Raises IndexError like a list."""
+        if self._text_lines is not None:
+            return self._text_lines[index]
+        if index < 0:
+            index += self.line_count
+        if not 0 <= index < self.line_count:
+            raise IndexError("line index out of range")
+        return self._mm[self.offset(index):self.offset(index + 1)].decode(self.encoding)
+
+    def lines(self, start: int, stop: int) -> List[str]:
+        """Lines [start, stop), clamped like a list slice."""
+        if self._text_lines is not None:
+            return self._text_lines[start:stop]
+        start, stop, _ = slice(start, stop).indices(self.line_count)
+        if start >= stop:
+            return []
+        text = self._mm[self.offset(start):self.offset(stop)].decode(self.encoding)
+        return io.StringIO(text, newline="").readlines()
+
+
+def read_lines(file_path: str, encoding: str, indexes: Iterable[int]) -> List[str]:
+    """Lines at indexes (0-based), in the given order."""
+    with LineFile(file_path, encoding) as line_file:
+        return [line_file.line(index) for index in indexes]
+
+
+def splice_lines(file_path: str, encoding: str, edits: Sequence[Tuple[int, int, List[str]]]):
+    """Replace the line ranges [start, stop) of the edits by their new lines and write the file.
+
+    Ranges are clamped like list slices and must not overlap. The file is written to a temporary
+    file next to it and moved in place.
+    """
+    edits = sorted(edits, key=lambda edit: edit[0])
+    with LineFile(file_path, encoding) as line_file:
+        if line_file._text_lines is not None:
+            lines = list(line_file._text_lines)
+            for start, stop, new_lines in reversed(edits):
+                lines[start:stop] = new_lines
+            with open(file_path, "w", encoding=encoding, newline="") as f:
+                f.writelines(lines)
+            _forget(file_path)
+            return
+
+        tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as out, memoryview(line_file._mm if line_file._mm is not None else b"") as view:
+                pos = 0
+                for start, stop, new_lines in edits:
+                    start, stop, _ = slice(start, stop).indices(line_file.line_count)
+                    begin, end = line_file.offset(start), line_file.offset(max(start, stop))
+                    if begin < pos:
+                        raise ValueError(f"Overlapping line ranges at line {start + 1}")
+                    out.write(view[pos:begin])
+                    out.write("".join(new_lines).encode(encoding))
+                    pos = end
+                out.write(view[pos:])
+            shutil.copymode(file_path, tmp_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    os.replace(tmp_path, file_path)
+    _forget(file_path)
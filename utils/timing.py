@@ -0,0 +1,115 @@
+"""Per-item timing spans and on-demand profiling.
+
+record_item() starts the recording of one item: span() blocks run inside it add their time to
+the item breakdown, nested spans are keyed by their path ("rules/detect"). Outside of an item
+span() only costs a context variable lookup. At the end of the item the breakdown is appended
+to the timing log (one JSON object per line) and, when profile is set, the cProfile statistics
+of the item are saved next to it as <file>.prof.
+"""
+import contextvars
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from config import TIMING_LOG_PATH
+
+
+@dataclass
+class ItemTiming:
+    item_no: str
+    file_path: str
+    tool: str
+    started_at: str = ""
+    total: float = 0.0
+    stages: Dict[str, float] = field(default_factory=dict)  # span path -> seconds, in first-run order
+    profile_path: str = ""
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def rows(self) -> List[dict]:
+        return breakdown_rows(self.stages, self.total)
+
+
+def breakdown_rows(stages: Dict[str, float], total: float) -> List[dict]:
+    """Breakdown rows for display: stage, seconds and share of the item time."""
+    return [
+        {"stage": stage, "seconds": round(seconds, 4), "share": f"{seconds / total:.1%}" if total else "-"}
+        for stage, seconds in stages.items()
+    ]
+
+
+_current_item: contextvars.ContextVar[Optional[ItemTiming]] = contextvars.ContextVar("current_item", default=None)
+_current_path: contextvars.ContextVar[str] = contextvars.ContextVar("current_span_path", default="")
+_log_lock = threading.Lock()
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    item = _current_item.get()
+    if item is None:
+        yield
+        return
+    parent = _current_path.get()
+    path = f"{parent}/{stage}" if parent else stage
+    token = _current_path.set(path)
+    item.stages.setdefault(path, 0.0)  # parents are listed before their nested spans
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        item.add(path, time.perf_counter() - start)
+        _current_path.reset(token)
+
+
+def profile_path_of(file_path: str) -> str:
+    return str(Path(file_path).with_suffix(".prof"))
+
+
+def append_log(timing: ItemTiming, log_path: str = TIMING_LOG_PATH):
+    if not log_path:
+        return
+    line = json.dumps(asdict(timing), ensure_ascii=False) + "\n"
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+        with _log_lock, open(log_path, "a", encoding="utf-8") as f:
+            f.write(line)
+    except OSError:
+        pass  # timing must never fail the item
+
+
+@contextmanager
+def record_item(item_no: str, file_path: str, tool: str, profile: bool = False, log_path: str = TIMING_LOG_PATH) -> Iterator[ItemTiming]:
+    """Record the spans of one item. The ItemTiming is complete when the block exits."""
+    timing = ItemTiming(str(item_no), str(file_path), tool, started_at=datetime.now().isoformat(timespec="seconds"))
+    item_token = _current_item.set(timing)
+    path_token = _current_path.set("")
+    profiler = cProfile.Profile() if profile else None
+    start = time.perf_counter()
+    try:
+        if profiler:
+            try:
+                profiler.enable()
+            except ValueError:
+                profiler = None  # another profiler is active in this thread
+        yield timing
+    finally:
+        if profiler:
+            profiler.disable()
+        timing.total = time.perf_counter() - start
+        _current_path.reset(path_token)
+        _current_item.reset(item_token)
+        if profiler and file_path:
+            timing.profile_path = profile_path_of(file_path)
+            try:
+                profiler.dump_stats(timing.profile_path)
+            except OSError:
+                timing.profile_path = ""
+        append_log(timing, log_path)
@@ -0,0 +1,147 @@
+"""Catalog of the files under a workspace (daily) folder, shared by the tabs.
+
+Directories are listed with os.scandir and listed again only when their mtime changed, so
+refreshing a large folder costs one stat per directory. Files are indexed by item number
+(the "No.N" folder they are in) and by extension.
+"""
+import os
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+ITEM_FOLDER_PATTERN = re.compile(r'No\.(\d+)')
+
+
+@dataclass(frozen=True)
+class CatalogFile:
+    path: str
+    name: str
+    item_no: Optional[str]  # N of the nearest "No.N" folder
+
+    @property
+    def stem(self) -> str:
+        return Path(self.name).stem
+
+    @property
+    def ext(self) -> str:
+        return os.path.splitext(self.name)[1].lower()
+
+
+@dataclass
+class _Directory:
+    mtime_ns: int
+    files: List[CatalogFile]
+    subdirs: List[str]
+
+
+def _item_no_of(folder_name: str, default: Optional[str]) -> Optional[str]:
+    match = ITEM_FOLDER_PATTERN.fullmatch(folder_name)
+    return match.group(1) if match else default
+
+
+def _normalize_suffixes(suffixes: Iterable[str]) -> tuple:
+    return tuple(suf.strip().lower() for suf in suffixes)
+
+
+class WorkspaceCatalog:
+    def __init__(self, root_path: str):
+        self.root_path = str(Path(root_path).resolve())
+        self._dirs: Dict[str, _Directory] = {}
+        self._files: List[CatalogFile] = []
+        self._by_item: Dict[str, List[CatalogFile]] = {}
+        self._by_ext: Dict[str, List[CatalogFile]] = {}
+        self._lock = threading.Lock()
+
+    def refresh(self) -> bool:
+        """List again the directories whose mtime changed. Returns True if the catalog changed."""
+        with self._lock:
+            dirs: Dict[str, _Directory] = {}
+            root_item_no = None
+            for part in Path(self.root_path).parts:
+                root_item_no = _item_no_of(part, root_item_no)
+            changed = self._scan(self.root_path, root_item_no, dirs)
+            changed = changed or dirs.keys() != self._dirs.keys()
+            self._dirs = dirs
+            if changed:
+                self._rebuild()
+            return changed
+
+    def _scan(self, path: str, item_no: Optional[str], dirs: Dict[str, _Directory]) -> bool:
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return path in self._dirs
+
+        changed = False
+        directory = self._dirs.get(path)
+        if directory is None or directory.mtime_ns != mtime_ns:
+            files, subdirs = [], []
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.is_file():
+                            files.append(CatalogFile(entry.path, entry.name, item_no))
+            except OSError:
+                pass
+            directory = _Directory(mtime_ns, files, sorted(subdirs))
+            changed = True
+        dirs[path] = directory
+
+        for subdir in directory.subdirs:
+            changed |= self._scan(subdir, _item_no_of(os.path.basename(subdir), item_no), dirs)
+        return changed
+
+    def _rebuild(self):
+        self._files = sorted((f for directory in self._dirs.values() for f in directory.files), key=lambda f: f.path)
+        by_item: Dict[str, List[CatalogFile]] = {}
+        by_ext: Dict[str, List[CatalogFile]] = {}
+        for f in self._files:
+            if f.item_no is not None:
+                by_item.setdefault(f.item_no, []).append(f)
+            by_ext.setdefault(f.ext, []).append(f)
+        self._by_item, self._by_ext = by_item, by_ext
+
+    def files(self, suffixes: Optional[Iterable[str]] = None) -> List[str]:
+        """Paths of all files whose (lower case) name ends with one of suffixes, sorted."""
+        if suffixes is None:
+            return [f.path for f in self._files]
+        suffixes = _normalize_suffixes(suffixes)
+        exts = {'.' + suf.rsplit('.', 1)[1] if '.' in suf else None for suf in suffixes}
+        if None in exts:
+            candidates = self._files
+        else:
+            candidates = sorted((f for ext in exts for f in self._by_ext.get(ext, [])), key=lambda f: f.path)
+        return [f.path for f in candidates if f.name.lower().endswith(suffixes)]
+
+    def item_files(self, item_no: str | int, suffixes: Optional[Iterable[str]] = None) -> List[str]:
+        """Paths of the files of item No.{item_no}."""
+        files = self._by_item.get(str(item_no), [])
+        if suffixes is not None:
+            suffixes = _normalize_suffixes(suffixes)
+            files = [f for f in files if f.name.lower().endswith(suffixes)]
+        return [f.path for f in files]
+
+    def find(self, item_no: str | int, file_name: str, suffixes: Optional[Iterable[str]] = None) -> List[str]:
+        """Files of item No.{item_no} whose stem contains the stem of file_name (as common_util.get_files_by_no_and_name)."""
+        name_only = Path(file_name).stem
+        return [path for path in self.item_files(item_no, suffixes) if name_only in Path(path).stem]
+
+
+_catalogs: Dict[str, WorkspaceCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(root_path: str, refresh: bool = True) -> WorkspaceCatalog:
+    """Shared catalog of root_path, refreshed (incrementally) unless refresh is False."""
+    key = str(Path(root_path).resolve())
+    with _catalogs_lock:
+        catalog = _catalogs.get(key)
+        if catalog is None:
+            catalog = _catalogs[key] = WorkspaceCatalog(key)
+    if refresh:
+        catalog.refresh()
+    return catalog